@@ -29,7 +29,7 @@ from mycroft.enclosure.display_manager import \
 from mycroft.client.enclosure.eyes import EnclosureEyes
 from mycroft.client.enclosure.mouth import EnclosureMouth
 from mycroft.configuration import Configuration, LocalConf, USER_CONFIG
-from mycroft.messagebus.client.ws import WebsocketClient
+from mycroft.messagebus.client import create_client
 from mycroft.messagebus.message import Message
 from mycroft.util import play_wav, create_signal, connected, check_for_signal
 from mycroft.util.audio_test import record
@@ -254,7 +254,7 @@ class Enclosure(object):
     _last_internet_notification = 0
 
     def __init__(self):
-        self.bus = WebsocketClient()
+        self.bus = create_client()
 
         Configuration.init(self.bus)
 
@@ -20,7 +20,7 @@ from mycroft.client.speech.listener import RecognizerLoop
 from mycroft.configuration import Configuration
 from mycroft.identity import IdentityManager
 from mycroft.lock import Lock as PIDLock  # Create/Support PID locking file
-from mycroft.messagebus.client.ws import WebsocketClient
+from mycroft.messagebus.client import create_client
 from mycroft.messagebus.message import Message
 from mycroft.util import create_daemon, wait_for_exit_signal, \
     reset_sigint_handler
@@ -144,7 +144,7 @@ def main():
     global loop
     reset_sigint_handler()
     PIDLock("voice")
-    bus = WebsocketClient()  # Mycroft messagebus, see mycroft.messagebus
+    bus = create_client()  # Mycroft messagebus, see mycroft.messagebus
     Configuration.init(bus)
 
     # Register handlers on internal RecognizerLoop bus
@@ -11,3 +11,41 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+#
+
+
+def create_client(local_bus=None):
+    """ Create a messagebus client using the configured transport.
+
+    The "transport" of the websocket config selects a WebsocketClient
+    connecting over TCP ("websocket") or the unix domain socket of the
+    service ("unix"), or a LocalClient ("local"). The local transport only
+    reaches clients connected to the same LocalBus, so it must be passed
+    by the application embedding the services in one process. The shipped
+    services run in their own process and fail to start with it.
+
+    Arguments:
+        local_bus (LocalBus): bus connecting the clients of the process,
+                              required by the local transport
+
+    Returns:
+        messagebus client, call run_forever() to connect
+
+    Raises:
+        ValueError: if the local transport is configured without local_bus
+    """
+    from mycroft.configuration import Configuration
+    config = Configuration.get().get("websocket", {})
+    transport = config.get("transport")
+    if transport == "local":
+        if local_bus is None:
+            raise ValueError('The local messagebus transport only connects '
+                             'services sharing a LocalBus, use "websocket" '
+                             'or "unix" to run the services in their own '
+                             'processes')
+        from mycroft.messagebus.client.local import LocalClient
+        return LocalClient(local_bus)
+    from mycroft.messagebus.client.ws import WebsocketClient
+    if transport == "unix":
+        return WebsocketClient(unix_socket=config.get("unix_socket"))
+    return WebsocketClient()
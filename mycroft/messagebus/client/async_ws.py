@@ -0,0 +1,374 @@
+# Copyright 2018 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Messagebus client running on an asyncio event loop.
+
+Requires python 3.5. Tornado 5 and later run on the asyncio event loop,
+with older versions (like the pinned tornado 4.2) the client runs a
+tornado IOLoop on top of the asyncio loop and converts its futures.
+
+Example:
+    bus = AsyncWebsocketClient()
+
+    async def handle_speak(message):
+        LOG.info(message.data['utterance'])
+
+    bus.on('speak', handle_speak)
+    asyncio.get_event_loop().run_until_complete(bus.run_forever())
+"""
+import asyncio
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+import tornado
+from tornado.websocket import websocket_connect
+
+from mycroft.configuration import Configuration
+from mycroft.messagebus.client.ws import WebsocketClient
+from mycroft.messagebus.codec import BATCH_SEPARATOR, JsonCodec, get_codec
+from mycroft.messagebus.message import Message
+from mycroft.messagebus.router import (SUBSCRIBE, UNSUBSCRIBE,
+                                       matches_patterns)
+from mycroft.util import validate_param
+from mycroft.util.log import LOG
+
+if tornado.version_info < (5, 0):
+    from tornado.platform.asyncio import BaseAsyncIOLoop, to_asyncio_future
+else:
+    BaseAsyncIOLoop = None
+
+
+class AsyncWebsocketClient(object):
+    """ Messagebus client with the interface of WebsocketClient.
+
+    Coroutine handlers are run as tasks on the event loop, other handlers
+    are run on the executor.
+
+    Arguments:
+        host, port, route, ssl, codec: see WebsocketClient
+        executor (concurrent.futures.Executor): executor for handlers that
+                                                aren't coroutines
+        loop (asyncio.AbstractEventLoop): loop to run on, defaults to the
+                                          current event loop
+    """
+
+    def __init__(self, host=None, port=None, route=None, ssl=None,
+                 codec=None, executor=None, loop=None):
+        config = Configuration.get().get("websocket")
+        host = host or config.get("host")
+        port = port or config.get("port")
+        route = route or config.get("route")
+        ssl = ssl or config.get("ssl")
+        codec = codec or config.get("codec")
+        validate_param(host, "websocket.host")
+        validate_param(port, "websocket.port")
+        validate_param(route, "websocket.route")
+
+        self.url = WebsocketClient.build_url(host, port, route, ssl)
+        self.requested_codec = get_codec(codec)
+        self.codec = JsonCodec
+        self.executor = executor or ThreadPoolExecutor(max_workers=10)
+        self.loop = loop or asyncio.get_event_loop()
+        self.handlers = defaultdict(list)  # event -> [(handler, once)]
+        self.subscriptions = set()
+        self.connection = None
+        self.unsent = []  # messages emitted while not connected
+        # Tornado IOLoop running on the asyncio loop, before tornado 5
+        if BaseAsyncIOLoop is not None:
+            self.io_loop = BaseAsyncIOLoop(self.loop)
+        else:
+            self.io_loop = None
+        # Created in the running loop, see connected_event
+        self._connected_event = None
+        self.retry = 5
+        self._running = False
+        self._pending = {}
+        # Reply types subscribed by request() -> number of pending requests
+        self._reply_subscriptions = {}
+
+    @property
+    def connected_event(self):
+        """ Event set while connected.
+
+        Created on first use from the event loop, before python 3.7 it
+        would otherwise be bound to the default loop instead of loop.
+        """
+        if self._connected_event is None:
+            self._connected_event = asyncio.Event()
+        return self._connected_event
+
+    async def connect(self):
+        """ Open the connection to the messagebus. """
+        url = WebsocketClient.build_connection_url(self.url,
+                                                   self.requested_codec)
+        if self.io_loop is None:
+            connection = await websocket_connect(url)
+        else:
+            connection = await to_asyncio_future(
+                websocket_connect(url, io_loop=self.io_loop))
+        self.connection = connection
+        self.codec = JsonCodec
+        self.retry = 5
+        LOG.info("Connected")
+        self.connected_event.set()
+        if self.subscriptions:
+            self.connection.write_message(Message(SUBSCRIBE, {
+                'types': list(self.subscriptions)}).serialize())
+        # Send the messages emitted before the connection was up
+        unsent, self.unsent = self.unsent, []
+        for message in unsent:
+            self._send(message)
+        self._dispatch("open")
+
+    def read_message(self):
+        """ Read the next frame, None when the connection is closed. """
+        future = self.connection.read_message()
+        if self.io_loop is not None:
+            future = to_asyncio_future(future)
+        return future
+
+    async def run_forever(self):
+        """ Receive messages, reconnecting when the connection is lost. """
+        self._running = True
+        while self._running:
+            try:
+                await self.connect()
+                while self._running:
+                    message = await self.read_message()
+                    if message is None:
+                        break  # Connection closed
+                    self.on_message(message)
+            except Exception as e:
+                LOG.exception('=== ' + repr(e) + ' ===')
+                self._dispatch('error', e)
+
+            self.connection = None
+            self.connected_event.clear()
+            self._dispatch("close")
+            if self._running:
+                LOG.warning("WS Client will reconnect in "
+                            "%d seconds." % self.retry)
+                await asyncio.sleep(self.retry)
+                self.retry = min(self.retry * 2, 60)
+
+    def close(self):
+        self._running = False
+        if self.connection:
+            self.connection.close()
+        if self._connected_event:
+            self._connected_event.clear()
+
+    def on_message(self, message):
+        if isinstance(message, bytes):
+            parsed_message = Message.deserialize(message, self.codec)
+            if self.handlers['message']:
+                self._dispatch('message', parsed_message.serialize())
+        elif message.startswith(BATCH_SEPARATOR):
+            # Frame with several coalesced messages
+            for part in message.split(BATCH_SEPARATOR)[1:]:
+                self.on_message(part)
+            return
+        else:
+            self._dispatch('message', message)
+            parsed_message = Message.deserialize(message)
+            if parsed_message.type == 'connected':
+                self.codec = get_codec(parsed_message.data.get('codec'))
+
+        if parsed_message.type in self._pending:
+            self._resolve_pending(parsed_message)
+        self._dispatch(parsed_message.type, parsed_message)
+
+    def _dispatch(self, event, *args):
+        """ Run the handlers of an event. """
+        handlers = self.handlers.get(event)
+        if not handlers:
+            return
+        self.handlers[event] = [h for h in handlers if not h[1]]
+        for handler, _ in handlers:
+            if asyncio.iscoroutinefunction(handler):
+                task = self.loop.create_task(handler(*args))
+            else:
+                task = self.loop.run_in_executor(self.executor, handler,
+                                                 *args)
+            task.add_done_callback(self._log_handler_error)
+
+    @staticmethod
+    def _log_handler_error(task):
+        if not task.cancelled() and task.exception():
+            LOG.error('Messagebus handler failed: ' + repr(task.exception()))
+
+    def emit(self, message):
+        """ Send a message.
+
+        Messages emitted while not connected are sent once the connection
+        is up. Safe to call from other threads, like handlers on the
+        executor.
+        """
+        self.loop.call_soon_threadsafe(self._send, message)
+
+    def _send(self, message):
+        if self.connection is None:
+            self.unsent.append(message)
+            return
+        if self.codec.binary:
+            frame = message.serialize(self.codec)
+        else:
+            frame = message.serialize()
+        try:
+            self.connection.write_message(frame, binary=self.codec.binary)
+        except Exception as e:
+            LOG.warning('Could not send message: ' + repr(e))
+
+    def request(self, message, reply_type=None):
+        """ Send a message and get a future for the response.
+
+        See WebsocketClient.request(), must be called from the event loop.
+
+        Returns:
+            asyncio.Future: resolved with the response message
+        """
+        reply_type = reply_type or message.type + '.response'
+        request_id = str(uuid4())
+        # Tag a copy, the caller's message is left untouched
+        message = Message(message.type, message.data,
+                          dict(message.context or {}, request_id=request_id))
+
+        future = self.loop.create_future()
+        self._pending.setdefault(reply_type, {})[request_id] = future
+        subscribed = self._subscribe_reply(reply_type)
+        future.add_done_callback(
+            lambda _: self._remove_pending(reply_type, request_id,
+                                           subscribed))
+        self.emit(message)
+        return future
+
+    async def wait_for_response(self, message, reply_type=None,
+                                timeout=None):
+        """ Send a message and wait for a response.
+
+        Args:
+            message (Message): message to send
+            reply_type (str): the message type of the expected reply.
+                              Defaults to "<message.type>.response".
+            timeout: seconds to wait before timeout, defaults to 3
+        Returns:
+            The received message or None if the response timed out
+        """
+        await self.connected_event.wait()
+        future = self.request(message, reply_type)
+        try:
+            return await asyncio.wait_for(future, timeout or 3.0)
+        except asyncio.TimeoutError:
+            return None
+
+    def _subscribe_reply(self, reply_type):
+        """ See WebsocketClient._subscribe_reply() """
+        if reply_type in self._reply_subscriptions:
+            self._reply_subscriptions[reply_type] += 1
+            return True
+        if (not self.subscriptions or
+                matches_patterns(reply_type, self.subscriptions)):
+            return False
+        self._reply_subscriptions[reply_type] = 1
+        self.subscriptions.add(reply_type)
+        self.emit(Message(SUBSCRIBE, {'types': [reply_type]}))
+        return True
+
+    def _unsubscribe_reply(self, reply_type):
+        """ See WebsocketClient._unsubscribe_reply() """
+        count = self._reply_subscriptions.get(reply_type)
+        if count is None:
+            return  # Subscribed or unsubscribed by the user since
+        if count > 1:
+            self._reply_subscriptions[reply_type] = count - 1
+            return
+        del self._reply_subscriptions[reply_type]
+        self.subscriptions.discard(reply_type)
+        self.emit(Message(UNSUBSCRIBE, {'types': [reply_type]}))
+
+    def _remove_pending(self, reply_type, request_id, subscribed=False):
+        pending = self._pending.get(reply_type, {})
+        pending.pop(request_id, None)
+        if not pending:
+            self._pending.pop(reply_type, None)
+        if subscribed:
+            self._unsubscribe_reply(reply_type)
+
+    def _resolve_pending(self, message):
+        pending = self._pending.get(message.type)
+        if not pending:
+            return
+        request_id = (message.context or {}).get('request_id')
+        if request_id is None:
+            futures = list(pending.values())
+            pending.clear()
+        else:
+            future = pending.pop(request_id, None)
+            futures = [future] if future else []
+        if not pending:
+            del self._pending[message.type]
+        for future in futures:
+            if not future.done():
+                future.set_result(message)
+
+    def subscribe(self, message_types):
+        """ Only receive messages matching the given types.
+
+        See WebsocketClient.subscribe()
+        """
+        for message_type in message_types:
+            self._reply_subscriptions.pop(message_type, None)
+        self.subscriptions.update(message_types)
+        self.emit(Message(SUBSCRIBE, {'types': list(message_types)}))
+
+    def unsubscribe(self, message_types=None):
+        """ Stop receiving messages matching the given types.
+
+        See WebsocketClient.unsubscribe()
+        """
+        if message_types is None:
+            self._reply_subscriptions.clear()
+            self.subscriptions.clear()
+            self.emit(Message(UNSUBSCRIBE))
+        else:
+            for message_type in message_types:
+                self._reply_subscriptions.pop(message_type, None)
+            self.subscriptions.difference_update(message_types)
+            self.emit(Message(UNSUBSCRIBE, {'types': list(message_types)}))
+
+    def on(self, event_name, func):
+        self.handlers[event_name].append((func, False))
+
+    def once(self, event_name, func):
+        self.handlers[event_name].append((func, True))
+
+    def remove(self, event_name, func):
+        handlers = self.handlers.get(event_name, [])
+        remaining = [h for h in handlers if h[0] != func]
+        if len(remaining) == len(handlers):
+            LOG.warning('Failed to remove event {}: {}'.format(event_name,
+                                                               str(func)))
+        self.handlers[event_name] = remaining
+
+    def remove_all_listeners(self, event_name):
+        '''
+            Remove all listeners connected to event_name.
+
+            Args:
+                event_name: event from which to remove listeners
+        '''
+        if event_name is None:
+            raise ValueError
+        self.handlers.pop(event_name, None)
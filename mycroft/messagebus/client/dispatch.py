@@ -0,0 +1,208 @@
+# Copyright 2018 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Dispatching of received messages to handler threads.
+
+Messages are dispatched on two lanes, each with its own worker threads:
+a priority lane for control messages (ex. mycroft.stop) and a bounded
+normal lane for everything else. This keeps slow handlers from delaying
+control messages and keeps a flood of messages from growing without limit.
+"""
+import time
+from collections import defaultdict, deque
+from threading import Condition, Lock, Thread
+
+from mycroft.util.log import LOG
+
+# Overflow policies of the normal lane. Blocking the receiving thread
+# isn't an option, it also resolves the responses handlers wait for.
+DROP_NEWEST = 'drop_newest'  # discard the received message
+DROP_OLDEST = 'drop_oldest'  # discard the oldest queued message
+
+# Min seconds between warnings about dropped messages
+DROP_LOG_INTERVAL = 10
+
+DEFAULT_PRIORITY_TYPES = [
+    'mycroft.stop',
+    'mycroft.audio.speech.stop',
+    'recognizer_loop:wakeword',
+    'recognizer_loop:record_begin',
+    'recognizer_loop:record_end'
+]
+
+
+class DispatchLane(object):
+    """ Queue of messages handled by a set of worker threads.
+
+    Arguments:
+        name (str): lane name, used for thread names and stats
+        handler (callable): called with (message type, message)
+        workers (int): number of worker threads
+        max_queue (int): max number of queued messages, 0 for no limit
+        overflow (str): policy when the queue is full, DROP_NEWEST or
+                        DROP_OLDEST
+        type_limits (dict): max number of concurrently handled messages
+                            per message type
+    """
+
+    def __init__(self, name, handler, workers, max_queue=0,
+                 overflow=DROP_OLDEST, type_limits=None):
+        if overflow not in (DROP_NEWEST, DROP_OLDEST):
+            LOG.warning('Unknown dispatch overflow policy {}, using '
+                        '{}'.format(overflow, DROP_OLDEST))
+            overflow = DROP_OLDEST
+        self.name = name
+        self.handler = handler
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.type_limits = type_limits or {}
+
+        self.queue = deque()
+        self.deferred = defaultdict(deque)  # messages over their type limit
+        self.active = defaultdict(int)  # messages in progress per type
+        self.cond = Condition(Lock())
+
+        self.queued = 0  # messages in queue or deferred
+        self.max_queued = 0
+        self.handled = 0
+        self.dropped = 0
+        self.dropped_types = defaultdict(int)  # dropped messages per type
+        self._last_drop_log = None
+        self._dropped_since_log = 0
+
+        for i in range(workers):
+            t = Thread(target=self._work, name='{}-{}'.format(name, i))
+            t.daemon = True
+            t.start()
+
+    def put(self, msg_type, message):
+        with self.cond:
+            if self.max_queue and self.queued >= self.max_queue:
+                if self.overflow == DROP_NEWEST or not self.queue:
+                    self._drop(msg_type)
+                    return
+                dropped_type, _ = self.queue.popleft()
+                self.queued -= 1
+                self._drop(dropped_type)
+                self._release(dropped_type)
+
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+            limit = self.type_limits.get(msg_type)
+            if limit and self.active[msg_type] >= limit:
+                self.deferred[msg_type].append(message)
+            else:
+                self.active[msg_type] += 1
+                self.queue.append((msg_type, message))
+                self.cond.notify_all()
+
+    def _drop(self, msg_type):
+        """ Count a dropped message, warning at most every
+        DROP_LOG_INTERVAL seconds. Must be called holding the lock.
+        """
+        self.dropped += 1
+        self.dropped_types[msg_type] += 1
+        self._dropped_since_log += 1
+        now = time.monotonic()
+        if (self._last_drop_log is None or
+                now - self._last_drop_log >= DROP_LOG_INTERVAL):
+            LOG.warning('{} queue full, dropped {} message(s), last {} '
+                        '({} dropped in total)'.format(
+                            self.name, self._dropped_since_log, msg_type,
+                            self.dropped))
+            self._last_drop_log = now
+            self._dropped_since_log = 0
+
+    def _work(self):
+        while True:
+            with self.cond:
+                while not self.queue:
+                    self.cond.wait()
+                msg_type, message = self.queue.popleft()
+                self.queued -= 1
+                self.cond.notify_all()
+
+            try:
+                self.handler(msg_type, message)
+            except Exception:
+                LOG.exception('Error handling {}'.format(msg_type))
+
+            with self.cond:
+                self.handled += 1
+                self._release(msg_type)
+
+    def _release(self, msg_type):
+        """ Mark a message as no longer active, queueing the next message
+        held back by the type limit. Must be called holding the lock.
+        """
+        deferred = self.deferred.get(msg_type)
+        if deferred:
+            self.queue.append((msg_type, deferred.popleft()))
+            self.cond.notify_all()
+            if not deferred:
+                del self.deferred[msg_type]
+        else:
+            self.active[msg_type] -= 1
+            if not self.active[msg_type]:
+                del self.active[msg_type]
+
+    def stats(self):
+        with self.cond:
+            return {
+                'queued': self.queued,
+                'max_queued': self.max_queued,
+                'active': sum(self.active.values()),
+                'handled': self.handled,
+                'dropped': self.dropped,
+                'dropped_types': dict(self.dropped_types)
+            }
+
+
+class MessageDispatcher(object):
+    """ Dispatch messages to handler threads using a priority lane for
+    control messages and a bounded lane for all other messages.
+
+    Arguments:
+        handler (callable): called with (message type, message)
+        config (dict): the "dispatch" section of the websocket config
+    """
+
+    def __init__(self, handler, config=None):
+        config = config or {}
+        self.priority_types = set(config.get('priority_types',
+                                             DEFAULT_PRIORITY_TYPES))
+        self.priority = DispatchLane('BusPriority', handler,
+                                     config.get('priority_workers', 2))
+        self.normal = DispatchLane('BusDispatch', handler,
+                                   config.get('workers', 10),
+                                   config.get('max_queue', 1000),
+                                   config.get('overflow', DROP_OLDEST),
+                                   config.get('type_limits'))
+
+    def dispatch(self, msg_type, message):
+        if msg_type in self.priority_types:
+            self.priority.put(msg_type, message)
+        else:
+            self.normal.put(msg_type, message)
+
+    def stats(self):
+        """ Queue depth and counters of the dispatch lanes.
+
+        Returns:
+            dict: stats per lane
+        """
+        return {
+            'priority': self.priority.stats(),
+            'normal': self.normal.stats()
+        }
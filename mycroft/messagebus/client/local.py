@@ -0,0 +1,154 @@
+# Copyright 2018 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""In-process messagebus transport.
+
+Connects clients living in the same process without a messagebus service.
+Messages are passed to the receiving clients directly, without being
+serialized. Clients in other processes can't be reached, the shipped
+services all run in their own process and need the messagebus service.
+Meant for tests and applications embedding several services in a single
+process, which can select it with "transport": "local" and pass their
+LocalBus to create_client().
+"""
+from threading import Event, Lock
+
+from mycroft.messagebus.client.ws import WebsocketClient
+from mycroft.messagebus.codec import JsonCodec
+from mycroft.messagebus.message import Message
+from mycroft.messagebus.router import (MessageRouter, STATS, SUBSCRIBE,
+                                       UNSUBSCRIBE, subscription_patterns)
+from mycroft.util.log import LOG
+
+
+class LocalBus(object):
+    """ Routes messages between the LocalClients connected to it. """
+
+    def __init__(self):
+        self.router = MessageRouter()
+        self.clients = []
+        self.lock = Lock()
+
+    def connect(self, client):
+        with self.lock:
+            self.clients.append(client)
+            self.router.add(client)
+
+    def disconnect(self, client):
+        with self.lock:
+            if client in self.clients:
+                self.clients.remove(client)
+            self.router.remove(client)
+
+    def emit(self, sender, message):
+        """ Deliver a message to all clients routed the message type.
+
+        Args:
+            sender (LocalClient): the emitting client
+            message (Message): message to deliver
+        """
+        if message.type in (SUBSCRIBE, UNSUBSCRIBE):
+            self.handle_subscription(sender, message)
+            return
+        elif message.type == STATS:
+            self.handle_stats(sender, message)
+            return
+
+        with self.lock:
+            receivers = self.router.route(message.type)
+        for client in receivers:
+            client.deliver(message)
+
+    def handle_subscription(self, client, message):
+        try:
+            patterns = subscription_patterns(message)
+        except ValueError as e:
+            LOG.warning('Invalid subscription: {}'.format(e))
+            return
+        with self.lock:
+            if message.type == SUBSCRIBE:
+                self.router.subscribe(client, patterns or [])
+            else:
+                self.router.unsubscribe(client, patterns)
+
+    def handle_stats(self, client, message):
+        """ Reply with the dispatch stats of all connected clients. """
+        with self.lock:
+            connections = [{
+                'transport': 'local',
+                'dispatch': c.dispatcher.stats(),
+                'subscriptions': sorted(
+                    self.router.subscriptions.get(c, []))
+            } for c in self.clients]
+        client.deliver(message.response({'connections': connections}))
+
+
+# Bus shared by the LocalClients of the process
+LOCAL_BUS = LocalBus()
+
+
+class LocalClient(WebsocketClient):
+    """ Messagebus client connected to an in-process LocalBus.
+
+    Has the interface of WebsocketClient. Each receiving client gets its
+    own Message with shallow copies of the data and context, nested values
+    are shared and shouldn't be modified by handlers.
+
+    Arguments:
+        bus (LocalBus): bus to connect to, defaults to the process wide bus
+    """
+
+    def __init__(self, bus=None):
+        super(LocalClient, self).__init__()
+        self.bus = bus or LOCAL_BUS
+        self.url = 'local://'
+        self.requested_codec = self.codec = JsonCodec
+        self._closed = Event()
+
+    def create_client(self):
+        return None
+
+    def deliver(self, message):
+        """ Receive a message from the bus. """
+        context = message.context
+        message = Message(message.type, dict(message.data),
+                          dict(context) if context is not None else None)
+        if self.emitter.listeners('message'):
+            self.emitter.emit('message', message.serialize())
+        if message.type in self._pending:
+            self._resolve_pending(message)
+        # Only queue messages someone is listening for
+        if self.emitter.listeners(message.type):
+            self.dispatcher.dispatch(message.type, message)
+
+    def emit(self, message):
+        self.bus.emit(self, message)
+
+    def run_forever(self):
+        """ Connect to the bus and block until the client is closed. """
+        self.started_running = True
+        self._closed.clear()
+        self.bus.connect(self)
+        self.connected_event.set()
+        if self.subscriptions:
+            self.emit(Message(SUBSCRIBE, {'types': list(self.subscriptions)}))
+        self.emitter.emit("open")
+        self._closed.wait()
+
+    def close(self):
+        self.bus.disconnect(self)
+        self.connected_event.clear()
+        if not self._closed.is_set():
+            self._closed.set()
+            self.emitter.emit("close")
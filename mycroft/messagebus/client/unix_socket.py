@@ -0,0 +1,131 @@
+# Copyright 2018 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Websocket connections over a unix domain socket.
+
+websocket-client only connects over TCP, these classes open a unix domain
+socket instead and reuse the websocket handshake and framing of the
+library. The url is only used for the handshake (route and Host header).
+
+The handshake and url parsing are only exported by the package in the
+websocket-client version pinned in requirements.txt, check
+test/unittests/messagebus/test_unix_socket.py when updating it.
+"""
+import select
+import socket
+import time
+from threading import Event, Thread
+
+from websocket import (ABNF, WebSocket, WebSocketApp,
+                       WebSocketTimeoutException, handshake, parse_url)
+
+
+class UnixSocketWebSocket(WebSocket):
+    """ WebSocket connecting to a unix domain socket.
+
+    Arguments:
+        path (str): path of the unix domain socket
+    """
+
+    def __init__(self, path, *args, **kwargs):
+        super(UnixSocketWebSocket, self).__init__(*args, **kwargs)
+        self.path = path
+
+    def connect(self, url, **options):
+        hostname, port, resource, _ = parse_url(url)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.sock.connect(self.path)
+            self.handshake_response = handshake(self.sock, hostname, port,
+                                                resource, **options)
+            self.connected = True
+        except:
+            self.sock.close()
+            self.sock = None
+            raise
+
+
+class UnixSocketApp(WebSocketApp):
+    """ WebSocketApp connecting to a unix domain socket.
+
+    Arguments:
+        path (str): path of the unix domain socket
+        url, **kwargs: see WebSocketApp
+    """
+
+    def __init__(self, path, url, **kwargs):
+        super(UnixSocketApp, self).__init__(url, **kwargs)
+        self.path = path
+
+    def _ping(self, interval, stop):
+        while not stop.wait(interval):
+            self.last_ping_tm = time.time()
+            if self.sock:
+                self.sock.ping()
+
+    def run_forever(self, ping_interval=0, ping_timeout=None):
+        """ Run the connection until closed.
+
+        Arguments:
+            ping_interval (float): seconds between pings, 0 to not ping
+            ping_timeout (float): seconds to wait for a pong before failing
+        """
+        if not ping_timeout or ping_timeout <= 0:
+            ping_timeout = None
+        stop_ping = Event()
+        ping_thread = None
+        try:
+            self.sock = UnixSocketWebSocket(self.path, self.get_mask_key)
+            self.sock.connect(self.url, header=self.header)
+            self._callback(self.on_open)
+
+            if ping_interval:
+                ping_thread = Thread(target=self._ping,
+                                     args=(ping_interval, stop_ping))
+                ping_thread.daemon = True
+                ping_thread.start()
+
+            while self.keep_running and self.sock.connected:
+                readable, _, _ = select.select((self.sock.sock,), (), (),
+                                               ping_timeout)
+                if (ping_timeout and self.last_ping_tm and
+                        time.time() - self.last_ping_tm > ping_timeout):
+                    self.last_ping_tm = 0
+                    raise WebSocketTimeoutException('ping timed out')
+                if not readable:
+                    continue
+
+                op_code, frame = self.sock.recv_data_frame(True)
+                if op_code == ABNF.OPCODE_CLOSE:
+                    break
+                elif op_code == ABNF.OPCODE_PING:
+                    self._callback(self.on_ping, frame.data)
+                elif op_code == ABNF.OPCODE_PONG:
+                    self._callback(self.on_pong, frame.data)
+                else:
+                    data = frame.data
+                    if op_code == ABNF.OPCODE_TEXT:
+                        data = data.decode('utf-8')
+                    self._callback(self.on_message, data)
+        except Exception as e:
+            if self.keep_running:  # Not closed by close()
+                self._callback(self.on_error, e)
+        finally:
+            if ping_thread:
+                stop_ping.set()
+                ping_thread.join()
+            if self.sock:
+                self.sock.close()
+            self._callback(self.on_close)
+            self.sock = None
@@ -12,55 +12,102 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import concurrent.futures
 import json
 import time
-from multiprocessing.pool import ThreadPool
-from threading import Event
+from concurrent.futures import Future
+from threading import Event, Lock
+from uuid import uuid4
 import traceback
 
 from pyee import EventEmitter
-from websocket import (WebSocketApp, WebSocketConnectionClosedException,
-                       WebSocketException)
+from websocket import (ABNF, WebSocketApp,
+                       WebSocketConnectionClosedException, WebSocketException)
 
 from mycroft.configuration import Configuration
+from mycroft.messagebus.client.dispatch import MessageDispatcher
+from mycroft.messagebus.client.unix_socket import UnixSocketApp
+from mycroft.messagebus.codec import BATCH_SEPARATOR, JsonCodec, get_codec
 from mycroft.messagebus.message import Message
+from mycroft.messagebus.router import (SUBSCRIBE, UNSUBSCRIBE,
+                                       matches_patterns)
 from mycroft.util import validate_param, create_echo_function
 from mycroft.util.log import LOG
 
 
 class WebsocketClient(object):
-    def __init__(self, host=None, port=None, route=None, ssl=None):
+    def __init__(self, host=None, port=None, route=None, ssl=None,
+                 codec=None, unix_socket=None):
 
         config = Configuration.get().get("websocket")
         host = host or config.get("host")
         port = port or config.get("port")
         route = route or config.get("route")
         ssl = ssl or config.get("ssl")
+        codec = codec or config.get("codec")
         validate_param(host, "websocket.host")
         validate_param(port, "websocket.port")
         validate_param(route, "websocket.route")
 
         self.url = WebsocketClient.build_url(host, port, route, ssl)
+        # Connect over this unix domain socket instead of TCP
+        self.unix_socket = unix_socket
+        # Binary codec to request, json is used until the service agrees
+        self.requested_codec = get_codec(codec)
+        self.codec = JsonCodec
         self.emitter = EventEmitter()
         self.client = self.create_client()
-        self.pool = ThreadPool(10)
+        self.dispatcher = MessageDispatcher(self.emitter.emit,
+                                            config.get("dispatch"))
         self.retry = 5
         self.connected_event = Event()
         self.started_running = False
+        self.subscriptions = set()
+        # Futures of requests waiting for a response, by reply type and id
+        self._pending = {}
+        self._pending_lock = Lock()
+        # Reply types subscribed by request() -> number of pending requests
+        self._reply_subscriptions = {}
+        self._subscription_lock = Lock()
 
     @staticmethod
     def build_url(host, port, route, ssl):
         scheme = "wss" if ssl else "ws"
         return scheme + "://" + host + ":" + str(port) + route
 
+    @staticmethod
+    def build_connection_url(url, codec):
+        """Add the connection options to a messagebus url.
+
+        Args:
+            url (str): messagebus url
+            codec: codec to request from the service
+        Returns:
+            str: url requesting the codec and coalesced frames
+        """
+        url += '?batch=1'
+        if codec.binary:
+            url += '&codec=' + codec.name
+        return url
+
     def create_client(self):
-        return WebSocketApp(self.url,
-                            on_open=self.on_open, on_close=self.on_close,
-                            on_error=self.on_error, on_message=self.on_message)
+        url = self.build_connection_url(self.url, self.requested_codec)
+        callbacks = {
+            'on_open': self.on_open, 'on_close': self.on_close,
+            'on_error': self.on_error, 'on_message': self.on_message
+        }
+        if self.unix_socket:
+            return UnixSocketApp(self.unix_socket, url, **callbacks)
+        return WebSocketApp(url, **callbacks)
 
     def on_open(self, ws):
         LOG.info("Connected")
+        self.codec = JsonCodec
         self.connected_event.set()
+        if self.subscriptions:
+            # Restore the subscriptions of the previous connection
+            self.client.send(Message(SUBSCRIBE, {
+                'types': list(self.subscriptions)}).serialize())
         self.emitter.emit("open")
         # Restore reconnect timer to 5 seconds on sucessful connect
         self.retry = 5
@@ -92,10 +139,25 @@ class WebsocketClient(object):
             pass
 
     def on_message(self, ws, message):
-        self.emitter.emit('message', message)
-        parsed_message = Message.deserialize(message)
-        self.pool.apply_async(
-            self.emitter.emit, (parsed_message.type, parsed_message))
+        if isinstance(message, bytes):
+            parsed_message = Message.deserialize(message, self.codec)
+            if self.emitter.listeners('message'):
+                self.emitter.emit('message', parsed_message.serialize())
+        elif message.startswith(BATCH_SEPARATOR):
+            # Frame with several coalesced messages
+            for part in message.split(BATCH_SEPARATOR)[1:]:
+                self.on_message(ws, part)
+            return
+        else:
+            self.emitter.emit('message', message)
+            parsed_message = Message.deserialize(message)
+            if parsed_message.type == 'connected':
+                self.codec = get_codec(parsed_message.data.get('codec'))
+        if parsed_message.type in self._pending:
+            self._resolve_pending(parsed_message)
+        # Only queue messages someone is listening for
+        if self.emitter.listeners(parsed_message.type):
+            self.dispatcher.dispatch(parsed_message.type, parsed_message)
 
     def emit(self, message):
         if not self.connected_event.wait(10):
@@ -105,7 +167,10 @@ class WebsocketClient(object):
             self.connected_event.wait()
 
         try:
-            if hasattr(message, 'serialize'):
+            if hasattr(message, 'serialize') and self.codec.binary:
+                self.client.send(message.serialize(self.codec),
+                                 ABNF.OPCODE_BINARY)
+            elif hasattr(message, 'serialize'):
                 self.client.send(message.serialize())
             else:
                 self.client.send(json.dumps(message.__dict__))
@@ -113,6 +178,50 @@ class WebsocketClient(object):
             LOG.warning('Could not send {} message because connection '
                         'has been closed'.format(message.type))
 
+    def request(self, message, reply_type=None):
+        """Send a message and get a future for the response.
+
+        A copy of the message is sent, tagged with a unique 'request_id' in
+        its context. Responses created with message.response() carry the
+        id along and only complete the matching request, responses without
+        an id complete all pending requests for the reply type.
+
+        A client with subscriptions not covering the reply type subscribes
+        to it until the last request waiting for it is done.
+
+        Coroutines can await the result using asyncio.wrap_future().
+
+        Args:
+            message (Message): message to send
+            reply_type (str): the message type of the expected reply.
+                              Defaults to "<message.type>.response".
+        Returns:
+            concurrent.futures.Future: resolved with the response message
+        """
+        reply_type = reply_type or message.type + '.response'
+        request_id = str(uuid4())
+        # Tag a copy, the caller's message is left untouched
+        message = Message(message.type, message.data,
+                          dict(message.context or {}, request_id=request_id))
+
+        future = Future()
+        with self._pending_lock:
+            self._pending.setdefault(reply_type, {})[request_id] = future
+        try:
+            subscribed = self._subscribe_reply(reply_type)
+        except Exception:
+            self._remove_pending(reply_type, request_id)
+            raise
+        future.add_done_callback(
+            lambda _: self._remove_pending(reply_type, request_id,
+                                           subscribed))
+        try:
+            self.emit(message)
+        except Exception:
+            future.cancel()
+            raise
+        return future
+
     def wait_for_response(self, message, reply_type=None, timeout=None):
         """Send a message and wait for a response.
 
@@ -124,31 +233,116 @@ class WebsocketClient(object):
         Returns:
             The received message or None if the response timed out
         """
-        response = []
-
-        def handler(message):
-            """Receive response data."""
-            response.append(message)
-
-        # Setup response handler
-        self.once(reply_type or message.type + '.response', handler)
-        # Send request
-        self.emit(message)
-        # Wait for response
-        start_time = time.monotonic()
-        while len(response) == 0:
-            time.sleep(0.2)
-            if time.monotonic() - start_time > (timeout or 3.0):
-                try:
-                    self.remove(reply_type, handler)
-                except (ValueError, KeyError):
-                    # ValueError occurs on pyee 1.0.1 removing handlers
-                    # registered with once.
-                    # KeyError may theoretically occur if the event occurs as
-                    # the handler is removed
-                    pass
+        future = self.request(message, reply_type)
+        try:
+            return future.result(timeout or 3.0)
+        except concurrent.futures.TimeoutError:
+            if future.cancel():
                 return None
-        return response[0]
+            # The response arrived while timing out
+            return future.result()
+
+    def _subscribe_reply(self, reply_type):
+        """Subscribe to the reply type of a request if not received.
+
+        Returns:
+            bool: True if the request holds a reference to the subscription
+        """
+        with self._subscription_lock:
+            if reply_type in self._reply_subscriptions:
+                self._reply_subscriptions[reply_type] += 1
+                return True
+            if (not self.subscriptions or
+                    matches_patterns(reply_type, self.subscriptions)):
+                return False
+            self.emit(Message(SUBSCRIBE, {'types': [reply_type]}))
+            self._reply_subscriptions[reply_type] = 1
+            self.subscriptions.add(reply_type)
+            return True
+
+    def _unsubscribe_reply(self, reply_type):
+        """Drop the reference of a finished request to its subscription."""
+        with self._subscription_lock:
+            count = self._reply_subscriptions.get(reply_type)
+            if count is None:
+                return  # Subscribed or unsubscribed by the user since
+            if count > 1:
+                self._reply_subscriptions[reply_type] = count - 1
+                return
+            del self._reply_subscriptions[reply_type]
+            self.subscriptions.discard(reply_type)
+            self.emit(Message(UNSUBSCRIBE, {'types': [reply_type]}))
+
+    def _remove_pending(self, reply_type, request_id, subscribed=False):
+        with self._pending_lock:
+            pending = self._pending.get(reply_type, {})
+            pending.pop(request_id, None)
+            if not pending:
+                self._pending.pop(reply_type, None)
+        if subscribed:
+            self._unsubscribe_reply(reply_type)
+
+    def _resolve_pending(self, message):
+        """Complete pending requests answered by the message.
+
+        The futures are removed under the lock, each is resolved once even
+        if the message is delivered by several threads.
+        """
+        with self._pending_lock:
+            pending = self._pending.get(message.type)
+            if not pending:
+                return
+            request_id = (message.context or {}).get('request_id')
+            if request_id is None:
+                futures = list(pending.values())
+                pending.clear()
+            else:
+                future = pending.pop(request_id, None)
+                futures = [future] if future else []
+            if not pending:
+                del self._pending[message.type]
+
+        for future in futures:
+            if future.set_running_or_notify_cancel():
+                future.set_result(message)
+
+    def subscribe(self, message_types):
+        """Only receive messages matching the given types.
+
+        Until a client subscribes the messagebus sends it all messages.
+
+        Args:
+            message_types (list): message types to receive, a type ending
+                                  with "*" matches all types starting with
+                                  the preceding string (ex. "mycroft.audio.*")
+        """
+        with self._subscription_lock:
+            # Kept after the requests subscribing to them are done
+            for message_type in message_types:
+                self._reply_subscriptions.pop(message_type, None)
+            self.subscriptions.update(message_types)
+        self.emit(Message(SUBSCRIBE, {'types': list(message_types)}))
+
+    def unsubscribe(self, message_types=None):
+        """Stop receiving messages matching the given types.
+
+        Args:
+            message_types (list): types previously passed to subscribe(),
+                                  if None all subscriptions are removed and
+                                  all messages are received again.
+        """
+        with self._subscription_lock:
+            if message_types is None:
+                self._reply_subscriptions.clear()
+                self.subscriptions.clear()
+            else:
+                for message_type in message_types:
+                    self._reply_subscriptions.pop(message_type, None)
+                self.subscriptions.difference_update(message_types)
+        if message_types is None:
+            self.emit(Message(UNSUBSCRIBE))
+        else:
+            self.emit(Message(UNSUBSCRIBE, {'types': list(message_types)}))
 
     def on(self, event_name, func):
         self.emitter.on(event_name, func)
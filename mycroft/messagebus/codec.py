@@ -0,0 +1,106 @@
+# Copyright 2018 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Encodings of messages sent over the messagebus.
+
+JSON text frames are always understood. A client may request a binary
+codec by connecting with "?codec=<name>" appended to the url. The service
+replies with the codec it agreed to in the data of the "connected" message,
+after which binary frames are encoded with that codec.
+
+Clients connecting with "batch=1" may receive several text messages in a
+frame, each message prefixed with BATCH_SEPARATOR (which can't occur in
+json).
+"""
+import json
+
+from mycroft.util.log import LOG
+
+BATCH_SEPARATOR = '\x1e'
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+
+class JsonCodec(object):
+    """ Default codec, sent as text frames. """
+    name = 'json'
+    binary = False
+
+    @staticmethod
+    def encode(obj):
+        return json.dumps(obj)
+
+    @staticmethod
+    def decode(value):
+        return json.loads(value)
+
+
+class MsgpackCodec(object):
+    """ MessagePack codec, requires the msgpack package. """
+    name = 'msgpack'
+    binary = True
+
+    @staticmethod
+    def encode(obj):
+        return msgpack.packb(obj, use_bin_type=True)
+
+    @staticmethod
+    def decode(value):
+        return msgpack.unpackb(value, raw=False)
+
+
+class CborCodec(object):
+    """ CBOR codec, requires the cbor2 package. """
+    name = 'cbor'
+    binary = True
+
+    @staticmethod
+    def encode(obj):
+        return cbor2.dumps(obj)
+
+    @staticmethod
+    def decode(value):
+        return cbor2.loads(value)
+
+
+CODECS = {JsonCodec.name: JsonCodec}
+if msgpack:
+    CODECS[MsgpackCodec.name] = MsgpackCodec
+if cbor2:
+    CODECS[CborCodec.name] = CborCodec
+
+
+def get_codec(name):
+    """ Get codec from name.
+
+    Args:
+        name (str): codec name, "json", "msgpack" or "cbor"
+
+    Returns:
+        the codec, or the JSON codec if the codec isn't available
+    """
+    name = name or JsonCodec.name
+    if name not in CODECS:
+        LOG.warning('Messagebus codec {} not available, '
+                    'using json'.format(name))
+        return JsonCodec
+    return CODECS[name]
@@ -13,8 +13,31 @@
 # limitations under the License.
 #
 import json
+from threading import Lock
+
 from mycroft.util.parse import normalize
 
+# Start of a message serialized by Message.serialize()
+_TYPE_PREFIX = '{"type": "'
+
+
+def _peek_type(value):
+    """Read the message type from a serialized message without decoding it.
+
+    Args:
+        value (str): serialized message
+
+    Returns:
+        str: the message type or None if it can't be read without decoding
+    """
+    if isinstance(value, str) and value.startswith(_TYPE_PREFIX):
+        start = len(_TYPE_PREFIX)
+        end = value.find('"', start)
+        # Escaped characters requires a real decode
+        if end >= 0 and '\\' not in value[start:end]:
+            return value[start:end]
+    return None
+
 
 class Message(object):
     """Holds and manipulates data sent over the websocket
@@ -27,6 +50,9 @@ class Message(object):
         data (dict): data sent within the message
         context: info about the message not part of data such as source,
             destination or domain.
+
+    Messages created by deserialize() only decode data and context when
+    they're first accessed.
     """
 
     def __init__(self, type, data=None, context=None):
@@ -36,19 +62,74 @@ class Message(object):
         bettween processes of mycroft service, voice, skill and cli
         """
         data = data or {}
+        self._serialized = None
         self.type = type
         self.data = data
         self.context = context
 
-    def serialize(self):
+    @property
+    def data(self):
+        if self._serialized is not None:
+            self._decode()
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        if self._serialized is not None:
+            self._decode()
+        self._data = value
+
+    @property
+    def context(self):
+        if self._serialized is not None:
+            self._decode()
+        return self._context
+
+    @context.setter
+    def context(self, value):
+        if self._serialized is not None:
+            self._decode()
+        self._context = value
+
+    def _decode(self):
+        """Decode data and context from the serialized message.
+
+        A message may be read by several handler threads, the lock of the
+        message (created by deserialize()) makes sure it's decoded once.
+        """
+        with self._decode_lock:
+            if self._serialized is None:
+                return  # Decoded by another thread
+            obj = json.loads(self._serialized[1])
+            self._data = obj.get('data') or {}
+            self._context = obj.get('context')
+            # Cleared last, readers only skip decoding once data is set
+            self._serialized = None
+
+    def serialize(self, codec=None):
         """This returns a string of the message info.
 
         This makes it easy to send over a websocket. This uses
         json dumps to generate the string with type, data and context
 
+        Args:
+            codec: codec from mycroft.messagebus.codec to encode the
+                   message with instead of json
+
         Returns:
-            str: a json string representation of the message.
+            str: a json string representation of the message, or bytes
+                 when a binary codec is used.
         """
+        if codec is not None and codec.binary:
+            return codec.encode({
+                'type': self.type,
+                'data': self.data,
+                'context': self.context
+            })
+        if (self._serialized is not None and
+                self._serialized[0] == self.type):
+            # Unchanged since it was deserialized, reuse the string
+            return self._serialized[1]
         return json.dumps({
             'type': self.type,
             'data': self.data,
@@ -56,23 +137,45 @@ class Message(object):
         })
 
     @staticmethod
-    def deserialize(value):
+    def deserialize(value, codec=None, lazy=True):
         """This takes a string and constructs a message object.
 
         This makes it easy to take strings from the websocket and create
         a message object.  This uses json loads to get the info and generate
         the message object.
 
+        When the type can be read directly from the string and lazy is
+        set, decoding of data and context is postponed until they're
+        accessed. Truncated strings are rejected right away, other errors
+        in the rest of the string are only raised on that first access.
+
         Args:
             value(str): This is the json string received from the websocket
+            codec: codec from mycroft.messagebus.codec the value is encoded
+                   with, defaults to json
+            lazy (bool): postpone decoding of data and context
 
         Returns:
             Message: message object constructed from the json string passed
             int the function.
             value(str): This is the string received from the websocket
         """
-        obj = json.loads(value)
-        return Message(obj.get('type'), obj.get('data'), obj.get('context'))
+        if codec is not None and codec.binary:
+            obj = codec.decode(value)
+            return Message(obj.get('type'), obj.get('data'),
+                           obj.get('context'))
+
+        msg_type = _peek_type(value) if lazy else None
+        # A json object ends with '}', a cheap check for truncated strings
+        if msg_type is None or not value.rstrip().endswith('}'):
+            obj = json.loads(value)
+            return Message(obj.get('type'), obj.get('data'),
+                           obj.get('context'))
+
+        message = Message(msg_type)
+        message._decode_lock = Lock()
+        message._serialized = (msg_type, value)
+        return message
 
     def reply(self, type, data=None, context=None):
         """Construct a reply message for a given message
@@ -84,7 +187,8 @@ class Message(object):
         the data object and add that to the context as a target.  If the
         context has a client name then that will become the target in the
         context.  The new message will then have data passed in plus the
-        new context generated.
+        new context generated.  A 'request_id' isn't copied, only
+        response() answers the request of the message.
 
         Args:
             type (str): type of message
@@ -97,7 +201,8 @@ class Message(object):
         data = data or {}
         context = context or {}
 
-        new_context = self.context if self.context else {}
+        new_context = dict(self.context) if self.context else {}
+        new_context.pop('request_id', None)
         for key in context:
             new_context[key] = context[key]
         if 'target' in data:
@@ -110,7 +215,8 @@ class Message(object):
         """Construct a response message for the message
 
         Constructs a reply with the data and appends the expected
-        ".response" to the message
+        ".response" to the message. The 'request_id' of the message is
+        kept, completing the request the message was sent by.
 
         Args:
             data (dict): message data
@@ -120,6 +226,9 @@ class Message(object):
         """
         response_message = self.reply(self.type, data or {}, context)
         response_message.type += '.response'
+        if self.context and 'request_id' in self.context:
+            response_message.context.setdefault('request_id',
+                                                self.context['request_id'])
         return response_message
 
     def publish(self, type, data, context=None):
@@ -0,0 +1,179 @@
+# Copyright 2018 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Routing of messages to the client connections interested in them.
+
+Clients can subscribe to message type patterns using the messages
+
+    mycroft.messagebus.subscribe    {"types": ["speak", "mycroft.audio.*"]}
+    mycroft.messagebus.unsubscribe  {"types": ["speak"]}
+
+A pattern is either an exact message type or a prefix ending with "*".
+Connections that never subscribe keep receiving every message.
+
+Shared by the messagebus service and the clients.
+"""
+
+SUBSCRIBE = 'mycroft.messagebus.subscribe'
+UNSUBSCRIBE = 'mycroft.messagebus.unsubscribe'
+STATS = 'mycroft.messagebus.stats'
+
+WILDCARD = '*'
+
+# Upper bound on the number of cached message type routes
+MAX_CACHED_ROUTES = 1024
+
+
+def subscription_patterns(message):
+    """ Get the patterns of a subscribe or unsubscribe message.
+
+    A single pattern may be sent as a string instead of a list.
+
+    Args:
+        message (Message): subscribe or unsubscribe message
+
+    Returns:
+        list: the message type patterns, None if not given
+
+    Raises:
+        ValueError: if 'types' isn't a string or list of strings
+    """
+    patterns = message.data.get('types')
+    if patterns is None:
+        return None
+    if isinstance(patterns, str):
+        return [patterns]
+    if (not isinstance(patterns, (list, tuple)) or
+            not all(isinstance(p, str) for p in patterns)):
+        raise ValueError('types must be a list of strings, got '
+                         '{}'.format(repr(patterns)))
+    return list(patterns)
+
+
+def matches_patterns(msg_type, patterns):
+    """ Check if a message type matches any of the patterns.
+
+    Args:
+        msg_type (str): type of the message
+        patterns (iterable): message types, prefixes ending with "*"
+
+    Returns:
+        bool: True if a subscription to the patterns receives the type
+    """
+    return any(msg_type.startswith(pattern[:-1])
+               if pattern.endswith(WILDCARD) else msg_type == pattern
+               for pattern in patterns)
+
+
+class MessageRouter(object):
+    """ Index of client connections keyed on subscribed message types.
+
+    The connections for a message type are resolved once and cached until
+    the next change of connections or subscriptions.
+    """
+
+    def __init__(self):
+        self.broadcast = set()  # connections receiving all messages
+        self.exact = {}  # message type -> connections
+        self.prefixes = {}  # message type prefix -> connections
+        self.subscriptions = {}  # connection -> subscribed patterns
+        self._routes = {}
+
+    def add(self, connection):
+        """ Add a connection receiving all messages until it subscribes. """
+        self.broadcast.add(connection)
+        self._routes.clear()
+
+    def remove(self, connection):
+        """ Remove a connection and all its subscriptions. """
+        self.broadcast.discard(connection)
+        for pattern in self.subscriptions.pop(connection, set()):
+            self._unindex(connection, pattern)
+        self._routes.clear()
+
+    def subscribe(self, connection, patterns):
+        """ Limit a connection to messages matching the patterns.
+
+        Args:
+            connection:     client connection
+            patterns (list): message types, prefixes ending with "*"
+        """
+        self.broadcast.discard(connection)
+        subscribed = self.subscriptions.setdefault(connection, set())
+        for pattern in patterns:
+            if pattern not in subscribed:
+                subscribed.add(pattern)
+                self._index(connection, pattern)
+        self._routes.clear()
+
+    def unsubscribe(self, connection, patterns=None):
+        """ Remove subscribed patterns from a connection.
+
+        Without patterns all subscriptions are removed and the connection
+        goes back to receiving every message.
+
+        Args:
+            connection:     client connection
+            patterns (list): patterns to remove, None for all
+        """
+        subscribed = self.subscriptions.get(connection, set())
+        if patterns is None:
+            patterns = list(subscribed)
+            self.subscriptions.pop(connection, None)
+            self.broadcast.add(connection)
+        for pattern in patterns:
+            if pattern in subscribed:
+                subscribed.discard(pattern)
+            self._unindex(connection, pattern)
+        self._routes.clear()
+
+    def route(self, msg_type):
+        """ Get the connections that should receive a message type.
+
+        Args:
+            msg_type (str): type of the message
+
+        Returns:
+            tuple: connections matching the message type
+        """
+        connections = self._routes.get(msg_type)
+        if connections is None:
+            matches = set(self.broadcast)
+            matches.update(self.exact.get(msg_type, ()))
+            for prefix, subscribers in self.prefixes.items():
+                if msg_type.startswith(prefix):
+                    matches.update(subscribers)
+            connections = tuple(matches)
+            if len(self._routes) >= MAX_CACHED_ROUTES:
+                self._routes.clear()
+            self._routes[msg_type] = connections
+        return connections
+
+    def _index(self, connection, pattern):
+        if pattern.endswith(WILDCARD):
+            index, key = self.prefixes, pattern[:-1]
+        else:
+            index, key = self.exact, pattern
+        index.setdefault(key, set()).add(connection)
+
+    def _unindex(self, connection, pattern):
+        if pattern.endswith(WILDCARD):
+            index, key = self.prefixes, pattern[:-1]
+        else:
+            index, key = self.exact, pattern
+        subscribers = index.get(key)
+        if subscribers is not None:
+            subscribers.discard(connection)
+            if not subscribers:
+                del index[key]
@@ -12,7 +12,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import os
+from os.path import dirname
+
 from tornado import autoreload, web, ioloop
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_unix_socket
 
 from mycroft.configuration import Configuration
 from mycroft.lock import Lock  # creates/supports PID locking file
@@ -47,10 +52,18 @@ def main():
     validate_param(route, "websocket.route")
 
     routes = [
-        (route, WebsocketEventHandler)
+        (route, WebsocketEventHandler, {'outbound': config.get('outbound')})
     ]
     application = web.Application(routes, **settings)
-    application.listen(port, host)
+    server = HTTPServer(application)
+    if config.get("tcp", True):
+        server.listen(port, host)
+    unix_socket = config.get("unix_socket")
+    if unix_socket:
+        # Access is limited to the user and group of the service
+        if dirname(unix_socket):
+            os.makedirs(dirname(unix_socket), exist_ok=True)
+        server.add_socket(bind_unix_socket(unix_socket, mode=0o660))
     create_daemon(ioloop.IOLoop.instance().start)
 
     wait_for_exit_signal()
@@ -0,0 +1,141 @@
+# Copyright 2018 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Outbound message queue of a messagebus connection.
+
+Messages are queued per connection and written when the connection has
+finished writing the previous frame, keeping a slow client's messages in
+the queue (and under its high water mark) instead of the socket's write
+buffer. Clients connecting with "batch=1"
+receive queued text messages coalesced into a single frame, each message
+prefixed with BATCH_SEPARATOR.
+"""
+import time
+from collections import deque
+
+from mycroft.messagebus.codec import BATCH_SEPARATOR
+from mycroft.util.log import LOG
+
+# Policies for connections over the high water mark
+DROP = 'drop'  # drop the oldest queued messages
+DISCONNECT = 'disconnect'  # drop, and disconnect if it persists
+
+
+class OutboundQueue(object):
+    """ Queue of frames waiting to be written to a connection.
+
+    Arguments:
+        write (callable): write(frame, binary) writing a frame, may return
+                          a future resolved when the frame is written
+        close (callable): closes the connection
+        schedule (callable): schedules a callable on the event loop
+        config (dict): the "outbound" section of the websocket config
+        batch (bool): coalesce queued text frames
+    """
+
+    def __init__(self, write, close, schedule, config=None, batch=False):
+        config = config or {}
+        self.write = write
+        self.close = close
+        self.schedule = schedule
+        self.batch = batch
+        self.high_water_mark = config.get('high_water_mark', 1000)
+        self.max_batch = config.get('max_batch', 50)
+        self.slow_policy = config.get('slow_policy', DROP)
+        self.slow_timeout = config.get('slow_timeout', 10)
+
+        self.queue = deque()
+        self.over_since = None  # time the queue reached the high water mark
+        self.closed = False
+        self._scheduled = False
+        self._writing = False
+
+        self.max_queued = 0
+        self.sent_messages = 0
+        self.sent_frames = 0
+        self.dropped = 0
+
+    def put(self, frame, binary=False):
+        """ Queue a frame for writing. """
+        if self.closed:
+            return
+        if len(self.queue) >= self.high_water_mark:
+            now = time.monotonic()
+            self.over_since = self.over_since or now
+            if (self.slow_policy == DISCONNECT and
+                    now - self.over_since > self.slow_timeout):
+                LOG.warning('Closing connection of slow messagebus client')
+                self.closed = True
+                self.queue.clear()
+                self.close()
+                return
+            self.queue.popleft()
+            self.dropped += 1
+
+        self.queue.append((frame, binary))
+        self.max_queued = max(self.max_queued, len(self.queue))
+        if not self._scheduled and not self._writing:
+            self._scheduled = True
+            self.schedule(self.flush)
+
+    def flush(self):
+        """ Write queued frames until the connection is busy. """
+        self._scheduled = False
+        while self.queue and not self._writing:
+            frame, binary, count = self._next_frame()
+            try:
+                future = self.write(frame, binary)
+            except Exception as e:
+                LOG.debug('Could not write to connection: ' + repr(e))
+                self.closed = True
+                self.queue.clear()
+                return
+            self.sent_messages += count
+            self.sent_frames += 1
+            if future is not None and not future.done():
+                self._writing = True
+                future.add_done_callback(self._write_done)
+
+        if len(self.queue) < self.high_water_mark:
+            self.over_since = None
+
+    def _write_done(self, future):
+        self._writing = False
+        self.flush()
+
+    def _next_frame(self):
+        """ Get the next frame, coalescing queued text frames if enabled.
+
+        Returns:
+            tuple: (frame, binary, number of messages in frame)
+        """
+        frame, binary = self.queue.popleft()
+        if not self.batch or binary or not self.queue or self.queue[0][1]:
+            return frame, binary, 1
+
+        frames = [frame]
+        while (self.queue and not self.queue[0][1] and
+               len(frames) < self.max_batch):
+            frames.append(self.queue.popleft()[0])
+        return (BATCH_SEPARATOR + BATCH_SEPARATOR.join(frames), False,
+                len(frames))
+
+    def stats(self):
+        return {
+            'queued': len(self.queue),
+            'max_queued': self.max_queued,
+            'sent_messages': self.sent_messages,
+            'sent_frames': self.sent_frames,
+            'dropped': self.dropped
+        }
@@ -18,14 +18,20 @@ import traceback
 
 import tornado.websocket
 from pyee import EventEmitter
+from tornado.ioloop import IOLoop
 
+from mycroft.messagebus.codec import JsonCodec, get_codec
 from mycroft.messagebus.message import Message
+from mycroft.messagebus.service.outbound import OutboundQueue
+from mycroft.messagebus.router import (MessageRouter, STATS, SUBSCRIBE,
+                                       UNSUBSCRIBE, subscription_patterns)
 from mycroft.util.log import LOG
 
 
 EventBusEmitter = EventEmitter()
 
 client_connections = []
+client_router = MessageRouter()
 
 
 class WebsocketEventHandler(tornado.websocket.WebSocketHandler):
@@ -33,17 +39,44 @@ class WebsocketEventHandler(tornado.websocket.WebSocketHandler):
         tornado.websocket.WebSocketHandler.__init__(
             self, application, request, **kwargs)
         self.emitter = EventBusEmitter
+        self.codec = JsonCodec  # Codec used for binary frames
+        self.outbound = None
+
+    def initialize(self, outbound=None):
+        """ Setup of the handler.
+
+        Args:
+            outbound (dict): settings of the outbound queue, see
+                             OutboundQueue
+        """
+        self.outbound_config = outbound
 
     def on(self, event_name, handler):
         self.emitter.on(event_name, handler)
 
     def on_message(self, message):
         # LOG.debug(message)
+        # Text frames are always json, binary frames use the agreed codec
+        codec = self.codec if isinstance(message, bytes) else JsonCodec
         try:
-            deserialized_message = Message.deserialize(message)
+            # Only the type is decoded, the frame is forwarded as is.
+            # Truncated text frames are rejected.
+            deserialized_message = Message.deserialize(message, codec)
         except:
             return
 
+        try:
+            if deserialized_message.type in (SUBSCRIBE, UNSUBSCRIBE):
+                self.handle_subscription(deserialized_message)
+                return
+            elif deserialized_message.type == STATS:
+                self.handle_stats(deserialized_message)
+                return
+        except ValueError as e:
+            LOG.warning('Malformed {} message: {}'.format(
+                deserialized_message.type, repr(e)))
+            return
+
         try:
             self.emitter.emit(deserialized_message.type, deserialized_message)
         except Exception as e:
@@ -51,22 +84,89 @@ class WebsocketEventHandler(tornado.websocket.WebSocketHandler):
             traceback.print_exc(file=sys.stdout)
             pass
 
+        # Encode the message once for each codec in use by the receivers
+        frames = {codec.name: message}
+        for client in client_router.route(deserialized_message.type):
+            frame = frames.get(client.codec.name)
+            if frame is None:
+                frame = deserialized_message.serialize(client.codec)
+                frames[client.codec.name] = frame
+            client.send(frame, client.codec.binary)
+
+    def handle_subscription(self, message):
+        """ Update the message types forwarded to this connection.
+
+        Args:
+            message (Message): subscribe or unsubscribe request, data
+                               contains a list of message type patterns
+                               under 'types'
+        """
+        try:
+            patterns = subscription_patterns(message)
+        except ValueError as e:
+            LOG.warning('Invalid subscription: {}'.format(e))
+            return
+        if message.type == SUBSCRIBE:
+            client_router.subscribe(self, patterns or [])
+        else:
+            client_router.unsubscribe(self, patterns)
+
+    def handle_stats(self, message):
+        """ Reply with the outbound queue stats of all connections. """
+        connections = []
         for client in client_connections:
-            client.write_message(message)
+            stats = client.outbound.stats()
+            stats['peer'] = client.request.remote_ip
+            stats['codec'] = client.codec.name
+            stats['subscriptions'] = sorted(
+                client_router.subscriptions.get(client, []))
+            connections.append(stats)
+        self.emit(message.response({'connections': connections}))
 
     def open(self):
-        self.write_message(Message("connected").serialize())
+        self.codec = get_codec(self.get_argument('codec', None))
+        self.outbound = OutboundQueue(
+            self.write_frame, self.close, IOLoop.current().add_callback,
+            self.outbound_config, self.get_argument('batch', None) == '1')
+        # Always sent as json, informs the client of the agreed codec
+        self.send(Message("connected", {'codec': self.codec.name})
+                  .serialize())
         client_connections.append(self)
+        client_router.add(self)
 
     def on_close(self):
+        self.outbound.closed = True
         client_connections.remove(self)
+        client_router.remove(self)
+
+    def write_frame(self, frame, binary=False):
+        """ Write a frame to the connection.
+
+        write_message() only returns a future from tornado 4.3, the
+        backpressure is based on the write buffer of the stream instead.
+
+        Returns:
+            Future: resolved when the stream's write buffer is written, None
+                    if it was written right away
+        """
+        self.write_message(frame, binary)
+        stream = self.ws_connection.stream
+        if stream.writing():
+            # Writing nothing gets a future for the buffered data
+            return stream.write(b'')
+        return None
+
+    def send(self, frame, binary=False):
+        """ Queue a frame for sending to the client. """
+        self.outbound.put(frame, binary)
 
     def emit(self, channel_message):
         if (hasattr(channel_message, 'serialize') and
                 callable(getattr(channel_message, 'serialize'))):
-            self.write_message(channel_message.serialize())
+            self.send(channel_message.serialize(self.codec),
+                      self.codec.binary)
         else:
-            self.write_message(json.dumps(channel_message))
+            self.send(json.dumps(channel_message))
 
     def check_origin(self, origin):
         return True
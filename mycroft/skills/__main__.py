@@ -19,7 +19,7 @@ from mycroft import dialog
 from mycroft.api import is_paired, BackendDown
 from mycroft.enclosure.api import EnclosureAPI
 from mycroft.configuration import Configuration
-from mycroft.messagebus.client.ws import WebsocketClient
+from mycroft.messagebus.client import create_client
 from mycroft.messagebus.message import Message
 from mycroft.util import (
     connected, wait_while_speaking, reset_sigint_handler,
@@ -153,7 +153,7 @@ def main():
     # Create PID file, prevent multiple instancesof this service
     mycroft.lock.Lock('skills')
     # Connect this Skill management process to the Mycroft Messagebus
-    bus = WebsocketClient()
+    bus = create_client()
     Configuration.init(bus)
 
     bus.on('message', create_echo_function('SKILLS'))
@@ -168,6 +168,8 @@ def main():
 def shutdown():
     if event_scheduler:
         event_scheduler.shutdown()
+    if PadatiousService.instance:
+        PadatiousService.instance.shutdown()
 
     # Terminate all running threads that update skills
     if skill_manager:
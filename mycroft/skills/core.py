@@ -12,9 +12,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
-import imp
 import collections
+import importlib.util
 import operator
+import resource
 import sys
 import time
 import csv
@@ -41,13 +42,29 @@ from mycroft.messagebus.message import Message
 from mycroft.metrics import report_metric, report_timing, Stopwatch
 from mycroft.skills.settings import SkillSettings
 from mycroft.skills.skill_data import (load_vocabulary, load_regex, to_alnum,
-                                       munge_regex, munge_intent_parser)
+                                       munge_regex, munge_intent_parser,
+                                       read_skill_data)
 from mycroft.util import camel_case_split, resolve_resource_file
 from mycroft.util.log import LOG
 
 MainModule = '__init__'
 
 
+def _rusage_thread_time():
+    """ CPU time of the calling thread from getrusage (Linux). """
+    usage = resource.getrusage(resource.RUSAGE_THREAD)
+    return usage.ru_utime + usage.ru_stime
+
+
+# CPU time of the calling thread, time.thread_time needs python 3.7
+if hasattr(time, 'thread_time'):
+    thread_cpu_time = time.thread_time
+elif hasattr(resource, 'RUSAGE_THREAD'):
+    thread_cpu_time = _rusage_thread_time
+else:
+    thread_cpu_time = time.process_time
+
+
 def dig_for_message():
     """
         Dig Through the stack for message.
@@ -91,6 +108,33 @@ def open_intent_envelope(message):
                   intent_dict.get('optional'))
 
 
+def load_skill_module(path, skill_id):
+    """ Import the main module of a skill.
+
+    The module is loaded with a SourceFileLoader, which caches the compiled
+    bytecode in the __pycache__ directory of the skill and reuses it as long
+    as the source file is unchanged.
+
+    Args:
+        path (str): path of the skill directory
+        skill_id (str): skill identifier, the module is named after it
+
+    Returns:
+        module: the imported module
+    """
+    module_name = skill_id.replace('.', '_')
+    main_file = join(path, MainModule + '.py')
+    spec = importlib.util.spec_from_file_location(module_name, main_file)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[module_name]
+        raise
+    return module
+
+
 def load_skill(skill_descriptor, bus, skill_id, BLACKLISTED_SKILLS=None):
     """ Load skill from skill descriptor.
 
@@ -111,17 +155,16 @@ def load_skill(skill_descriptor, bus, skill_id, BLACKLISTED_SKILLS=None):
     if name in BLACKLISTED_SKILLS:
         LOG.info("SKILL IS BLACKLISTED " + name)
         return None
-    main_file = join(path, MainModule + '.py')
     try:
-        with open(main_file, 'rb') as fp:
-            skill_module = imp.load_module(
-                name.replace('.', '_'), fp, main_file,
-                ('.py', 'rb', imp.PY_SOURCE)
-            )
+        stopwatch = Stopwatch()
+        with stopwatch:
+            skill_module = load_skill_module(path, name)
+        LOG.debug('Imported {} in {:.3f}s'.format(name, stopwatch.time))
         if (hasattr(skill_module, 'create_skill') and
                 callable(skill_module.create_skill)):
             # v2 skills framework
             skill = skill_module.create_skill()
+            skill.import_time = stopwatch.time
             skill.settings.allow_overwrite = True
             skill.settings.load_skill_settings_from_file()
             skill.bind(bus)
@@ -232,6 +275,11 @@ class MycroftSkill(object):
         self.scheduled_repeats = []
         self.skill_id = ''  # will be set from the path, so guaranteed unique
         self.voc_match_cache = {}
+        # CPU time used by the event handlers of the skill
+        self.handler_cpu_time = 0.0
+        self.handler_calls = 0
+        # Seconds taken to import the skill module
+        self.import_time = 0.0
 
     @property
     def enclosure(self):
@@ -320,9 +368,10 @@ class MycroftSkill(object):
             self.events.append((name, func))
 
     def detach(self):
-        for (name, intent) in self.registered_intents:
-            name = str(self.skill_id) + ':' + name
-            self.bus.emit(Message("detach_intent", {"intent_name": name}))
+        names = [str(self.skill_id) + ':' + name
+                 for (name, intent) in self.registered_intents]
+        if names:
+            self.bus.emit(Message("detach_intent", {"intent_names": names}))
 
     def initialize(self):
         """ Perform any final setup needed for the skill.
@@ -721,6 +770,7 @@ class MycroftSkill(object):
         def wrapper(message):
             skill_data = {'name': get_handler_name(handler)}
             stopwatch = Stopwatch()
+            start_cpu = thread_cpu_time()
             try:
                 message = unmunge_message(message, self.skill_id)
                 # Indicate that the skill handler is starting
@@ -751,6 +801,8 @@ class MycroftSkill(object):
                 # append exception information in message
                 skill_data['exception'] = repr(e)
             finally:
+                self.handler_cpu_time += thread_cpu_time() - start_cpu
+                self.handler_calls += 1
                 # Indicate that the skill handler has completed
                 if handler_info:
                     msg_type = handler_info + '.complete'
@@ -1095,28 +1147,51 @@ class MycroftSkill(object):
             LOG.debug('No dialog loaded')
 
     def load_data_files(self, root_directory):
+        """ Load dialog, vocabulary and regex files of the skill.
+
+        The vocabulary and regexes are sent to the intent service in a
+        single register_vocab_batch message.
+        """
         self.root_dir = root_directory
         self.init_dialog(root_directory)
-        self.load_vocab_files(root_directory)
-        self.load_regex_files(root_directory)
+        vocab_dir = self.find_resource_dir(root_directory, 'vocab')
+        regex_dir = self.find_resource_dir(root_directory, 'regex')
+        vocab, regex = read_skill_data(vocab_dir, regex_dir, self.skill_id,
+                                       self.lang)
+        if not vocab_dir:
+            LOG.debug('No vocab loaded')
+        if vocab or regex:
+            self.bus.emit(Message('register_vocab_batch', {
+                'skill_id': self.skill_id, 'vocab': vocab, 'regex': regex}))
+
+    def find_resource_dir(self, root_directory, res_dirname):
+        """ Find the directory of a resource type for the skill language.
+
+        Args:
+            root_directory (str): skill directory
+            res_dirname (str): resource type, ex. 'vocab' or 'regex'
+
+        Returns:
+            str: path of the directory, None if there is none
+        """
+        res_dir = join(root_directory, res_dirname, self.lang)
+        if exists(res_dir):
+            return res_dir
+        elif exists(join(root_directory, 'locale', self.lang)):
+            return join(root_directory, 'locale', self.lang)
+        return None
 
     def load_vocab_files(self, root_directory):
-        vocab_dir = join(root_directory, 'vocab', self.lang)
-        if exists(vocab_dir):
+        vocab_dir = self.find_resource_dir(root_directory, 'vocab')
+        if vocab_dir:
             load_vocabulary(vocab_dir, self.bus, self.skill_id)
-        elif exists(join(root_directory, 'locale', self.lang)):
-            load_vocabulary(join(root_directory, 'locale', self.lang),
-                            self.bus, self.skill_id)
         else:
             LOG.debug('No vocab loaded')
 
     def load_regex_files(self, root_directory):
-        regex_dir = join(root_directory, 'regex', self.lang)
-        if exists(regex_dir):
+        regex_dir = self.find_resource_dir(root_directory, 'regex')
+        if regex_dir:
             load_regex(regex_dir, self.bus, self.skill_id)
-        elif exists(join(root_directory, 'locale', self.lang)):
-            load_regex(join(root_directory, 'locale', self.lang),
-                       self.bus, self.skill_id)
 
     def __handle_stop(self, event):
         """
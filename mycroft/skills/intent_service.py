@@ -13,6 +13,10 @@
 # limitations under the License.
 #
 import time
+from collections import OrderedDict, defaultdict
+from threading import Event, Lock
+from uuid import uuid4
+
 from adapt.context import ContextManagerFrame
 from adapt.engine import IntentDeterminationEngine
 from adapt.intent import IntentBuilder
@@ -45,23 +49,209 @@ def workaround_one_of_context(best_intent):
     return best_intent
 
 
+class ConverseRound(object):
+    """ Responses of the active skills to a converse request.
+
+    Args:
+        skill_ids (list): skills asked to converse, highest priority first
+    """
+
+    def __init__(self, skill_ids):
+        self.skill_ids = skill_ids
+        self.results = {}  # skill_id -> result
+        self.event = Event()
+
+    def add_result(self, skill_id, result):
+        self.results[skill_id] = result
+        self.event.set()
+
+    def winner(self, final=False):
+        """ Find the highest priority skill handling the utterance.
+
+        Args:
+            final (bool): True when no more responses will be waited for,
+                          skills not responding count as not handling it
+
+        Returns:
+            tuple: (decided, skill_id), skill_id is None if no skill
+                   handled the utterance
+        """
+        for skill_id in self.skill_ids:
+            if skill_id not in self.results:
+                if not final:
+                    # A higher priority skill may still handle it
+                    return False, None
+            elif self.results[skill_id]:
+                return True, skill_id
+        return True, None
+
+
+class IntentCache(object):
+    """ LRU cache of intent matches for repeated utterances.
+
+    clear() starts a new generation, entries computed in an older
+    generation are not stored.
+
+    Args:
+        max_size (int): max number of cached utterances, 0 disables caching
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """ Get a cached match, None if not cached. """
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value, generation):
+        """ Cache a match computed during the given generation. """
+        with self.lock:
+            if generation != self.generation or not self.max_size:
+                return
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.generation += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self.entries),
+                'max_size': self.max_size
+            }
+
+
+class ActiveSkills(object):
+    """ Recently active skills, most recently active first.
+
+    Skills expire when not active for timeout seconds. Expired skills are
+    removed lazily when the skills are read.
+
+    Args:
+        timeout (float): seconds a skill stays active
+    """
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.skills = OrderedDict()  # skill_id -> timestamp, oldest first
+        self.lock = Lock()
+
+    def touch(self, skill_id):
+        """ Make a skill the most recently active skill. """
+        with self.lock:
+            self.skills[skill_id] = time.monotonic()
+            self.skills.move_to_end(skill_id)
+
+    def remove(self, skill_id):
+        with self.lock:
+            self.skills.pop(skill_id, None)
+
+    def _expire(self):
+        now = time.monotonic()
+        while self.skills:
+            skill_id, timestamp = next(iter(self.skills.items()))
+            if now - timestamp <= self.timeout:
+                break
+            del self.skills[skill_id]
+
+    def skill_ids(self):
+        """ Ids of the active skills, most recently active first. """
+        with self.lock:
+            self._expire()
+            return list(reversed(self.skills))
+
+    def get(self):
+        """ Active skills with the seconds since they were active.
+
+        Returns:
+            list: {'skill_id', 'age'} of each skill, most recent first
+        """
+        with self.lock:
+            self._expire()
+            now = time.monotonic()
+            return [{'skill_id': skill_id, 'age': now - timestamp}
+                    for skill_id, timestamp in reversed(self.skills.items())]
+
+    def __contains__(self, skill_id):
+        with self.lock:
+            self._expire()
+            return skill_id in self.skills
+
+    def __len__(self):
+        with self.lock:
+            self._expire()
+            return len(self.skills)
+
+
 class ContextManager(object):
     """
     ContextManager
     Use to track context throughout the course of a conversational session.
     How to manage a session's lifecycle is not captured here.
+
+    Frames are kept oldest first, which is also their expiry order, and are
+    indexed by the entity types and origins they contain. The context list
+    is only rebuilt when the frames change.
     """
 
     def __init__(self, timeout):
-        self.frame_stack = []
         self.timeout = timeout * 60  # minutes to seconds
+        self.lock = Lock()
+        self.clear_context()
 
     def clear_context(self):
-        self.frame_stack = []
+        with self.lock:
+            self.frames = OrderedDict()  # frame id -> (frame, timestamp)
+            self.type_index = defaultdict(set)  # entity type -> frame ids
+            self.origin_index = defaultdict(set)  # origin -> frame ids
+            self.next_frame_id = 0
+            self._context = None  # (context, signature) of the frames
+
+    @property
+    def frame_stack(self):
+        """ List of (frame, timestamp), latest frame first. """
+        with self.lock:
+            return list(reversed(self.frames.values()))
+
+    def signature(self):
+        """ Hashable summary of the entities of the current context.
+
+        Returns:
+            tuple: entities of the frames that haven't timed out
+        """
+        with self.lock:
+            return self._current_context()[1]
 
     def remove_context(self, context_id):
-        self.frame_stack = [(f, t) for (f, t) in self.frame_stack
-                            if context_id in f.entities[0].get('data', [])]
+        """ Remove the frames containing an entity type. """
+        with self.lock:
+            for frame_id in list(self.type_index.get(context_id, [])):
+                self._remove_frame(frame_id)
+
+    def remove_origin_context(self, origin):
+        """ Remove the frames containing entities from an origin. """
+        with self.lock:
+            for frame_id in list(self.origin_index.get(origin, [])):
+                self._remove_frame(frame_id)
 
     def inject_context(self, entity, metadata=None):
         """
@@ -75,57 +265,89 @@ class ContextManager(object):
         """
         metadata = metadata or {}
         try:
-            if len(self.frame_stack) > 0:
-                top_frame = self.frame_stack[0]
-            else:
-                top_frame = None
-            if top_frame and top_frame[0].metadata_matches(metadata):
-                top_frame[0].merge_context(entity, metadata)
-            else:
-                frame = ContextManagerFrame(entities=[entity],
-                                            metadata=metadata.copy())
-                self.frame_stack.insert(0, (frame, time.time()))
-        except (IndexError, KeyError):
+            entity_type = entity['data'][0][1]
+            with self.lock:
+                self._expire()
+                top_id = next(reversed(self.frames), None)
+                if top_id is not None and \
+                        self.frames[top_id][0].metadata_matches(metadata):
+                    self.frames[top_id][0].merge_context(entity, metadata)
+                    frame_id = top_id
+                else:
+                    frame = ContextManagerFrame(entities=[entity],
+                                                metadata=metadata.copy())
+                    frame_id = self.next_frame_id
+                    self.next_frame_id += 1
+                    self.frames[frame_id] = (frame, time.monotonic())
+                self.type_index[entity_type].add(frame_id)
+                self.origin_index[entity.get('origin', '')].add(frame_id)
+                self._context = None
+        except (IndexError, KeyError, TypeError):
             pass
 
-    def get_context(self, max_frames=None, missing_entities=None):
-        """ Constructs a list of entities from the context.
-
-        Args:
-            max_frames(int): maximum number of frames to look back
-            missing_entities(list of str): a list or set of tag names,
-            as strings
-
-        Returns:
-            list: a list of entities
+    def _remove_frame(self, frame_id):
+        frame, _ = self.frames.pop(frame_id)
+        for entity in frame.entities:
+            for index, key in ((self.type_index, entity['data'][0][1]),
+                               (self.origin_index, entity.get('origin', ''))):
+                frame_ids = index.get(key)
+                if frame_ids is not None:
+                    frame_ids.discard(frame_id)
+                    if not frame_ids:
+                        del index[key]
+        self._context = None
+
+    def _expire(self):
+        """ Remove the timed out frames, oldest first. """
+        now = time.monotonic()
+        while self.frames:
+            frame_id, (_, timestamp) = next(iter(self.frames.items()))
+            if now - timestamp < self.timeout:
+                break
+            self._remove_frame(frame_id)
+
+    def _current_context(self):
+        """ Context and signature of the frames, rebuilt if changed. """
+        self._expire()
+        if self._context is None:
+            frame_contexts = self._frame_contexts()
+            context = self._select(frame_contexts, None, None)
+            signature = tuple(
+                tuple((e.get('key'), repr(e.get('data')), e.get('origin'))
+                      for e in frame.entities)
+                for frame, _ in reversed(self.frames.values()))
+            self._context = (context, signature)
+        return self._context
+
+    def _frame_contexts(self):
+        """ Entities of each frame, latest first, with confidence
+        decreasing with the depth of the frame.
         """
-        missing_entities = missing_entities or []
-
-        relevant_frames = [frame[0] for frame in self.frame_stack if
-                           time.time() - frame[1] < self.timeout]
-        if not max_frames or max_frames > len(relevant_frames):
-            max_frames = len(relevant_frames)
-
-        missing_entities = list(missing_entities)
-        context = []
+        frame_contexts = []
         last = ''
         depth = 0
-        for i in range(max_frames):
-            frame_entities = [entity.copy() for entity in
-                              relevant_frames[i].entities]
+        for frame, _ in reversed(self.frames.values()):
+            frame_entities = [entity.copy() for entity in frame.entities]
             for entity in frame_entities:
                 entity['confidence'] = entity.get('confidence', 1.0) \
                     / (2.0 + depth)
-            context += frame_entities
+            frame_contexts.append(frame_entities)
 
             # Update depth
-            if entity['origin'] != last or entity['origin'] == '':
+            origin = frame_entities[-1].get('origin', '')
+            if origin != last or origin == '':
                 depth += 1
-            last = entity['origin']
-            print(depth)
-
+            last = origin
+        return frame_contexts
+
+    @staticmethod
+    def _select(frame_contexts, max_frames, missing_entities):
+        """ Pick the context entities from the frame contexts. """
+        context = [entity for frame_entities in frame_contexts[:max_frames]
+                   for entity in frame_entities]
         result = []
-        if len(missing_entities) > 0:
+        if missing_entities:
+            missing_entities = list(missing_entities)
             for entity in context:
                 if entity.get('data') in missing_entities:
                     result.append(entity)
@@ -139,14 +361,31 @@ class ContextManager(object):
 
         # Only use the latest instance of each keyword
         stripped = []
-        processed = []
+        processed = set()
         for f in result:
             keyword = f['data'][0][1]
             if keyword not in processed:
                 stripped.append(f)
-                processed.append(keyword)
-        result = stripped
-        return result
+                processed.add(keyword)
+        return stripped
+
+    def get_context(self, max_frames=None, missing_entities=None):
+        """ Constructs a list of entities from the context.
+
+        Args:
+            max_frames(int): maximum number of frames to look back
+            missing_entities(list of str): a list or set of tag names,
+            as strings
+
+        Returns:
+            list: a list of entities
+        """
+        with self.lock:
+            if not max_frames and not missing_entities:
+                return list(self._current_context()[0])
+            self._expire()
+            return self._select(self._frame_contexts(), max_frames or None,
+                                missing_entities)
 
 
 class IntentService(object):
@@ -162,8 +401,15 @@ class IntentService(object):
         self.context_timeout = self.config.get('timeout', 2)
         self.context_greedy = self.config.get('greedy', False)
         self.context_manager = ContextManager(self.context_timeout)
+        # Registered Adapt intent parsers by name and names by skill id,
+        # the engine is updated from these before matching
+        self.intent_parsers = OrderedDict()
+        self.skill_intents = defaultdict(set)
+        self.intent_parsers_changed = False
+        self.intent_lock = Lock()
         self.bus = bus
         self.bus.on('register_vocab', self.handle_register_vocab)
+        self.bus.on('register_vocab_batch', self.handle_register_vocab_batch)
         self.bus.on('register_intent', self.handle_register_intent)
         self.bus.on('recognizer_loop:utterance', self.handle_utterance)
         self.bus.on('detach_intent', self.handle_detach_intent)
@@ -180,8 +426,18 @@ class IntentService(object):
         def add_active_skill_handler(message):
             self.add_active_skill(message.data['skill_id'])
         self.bus.on('active_skill_request', add_active_skill_handler)
-        self.active_skills = []  # [skill_id , timestamp]
         self.converse_timeout = 5  # minutes to prune active_skills
+        self.active_skills = ActiveSkills(self.converse_timeout * 60)
+        self.bus.on('intent.service.active_skills.get',
+                    self.handle_get_active_skills)
+        self.converse_deadline = 5  # seconds to wait for converse responses
+        # Pending converse requests, request_id -> (ConverseRound, skill_id)
+        self.converse_requests = {}
+        self.converse_lock = Lock()
+        skills_config = Configuration.get().get('skills', {})
+        self.intent_cache = IntentCache(
+            skills_config.get('intent_cache_size', 256))
+        self.bus.on('intent.service.cache.stats', self.handle_cache_stats)
 
     def update_skill_name_dict(self, message):
         """
@@ -204,41 +460,78 @@ class IntentService(object):
     def reset_converse(self, message):
         """Let skills know there was a problem with speech recognition"""
         lang = message.data.get('lang', "en-us")
-        for skill in self.active_skills:
-            self.do_converse(None, skill[0], lang)
+        self.converse_round(None, self.active_skills.skill_ids(), lang)
 
     def do_converse(self, utterances, skill_id, lang):
-        self.waiting = True
-        self.result = False
-        self.bus.emit(Message("skill.converse.request", {
-            "skill_id": skill_id, "utterances": utterances, "lang": lang}))
-        start_time = time.time()
-        t = 0
-        while self.waiting and t < 5:
-            t = time.time() - start_time
-            time.sleep(0.1)
-        self.waiting = False
-        return self.result
+        """ Ask a single skill to converse.
+
+        Returns:
+            bool: True if the skill handled the utterances
+        """
+        return self.converse_round(utterances, [skill_id], lang) is not None
+
+    def converse_round(self, utterances, skill_ids, lang):
+        """ Ask skills to converse, sending all requests at once.
+
+        Each request is tagged with a request_id the response is matched
+        on. Responses are waited for until the highest priority skill
+        handling the utterances is known or the converse deadline passes.
+
+        Args:
+            utterances (list): utterances to handle
+            skill_ids (list): skills to ask, highest priority first
+            lang (str): language of the utterances
+
+        Returns:
+            str: id of the highest priority skill handling the utterances,
+                 None if no skill handled them
+        """
+        if not skill_ids:
+            return None
+        converse = ConverseRound(skill_ids)
+        request_ids = [str(uuid4()) for _ in skill_ids]
+        with self.converse_lock:
+            for request_id, skill_id in zip(request_ids, skill_ids):
+                self.converse_requests[request_id] = (converse, skill_id)
+        try:
+            for request_id, skill_id in zip(request_ids, skill_ids):
+                self.bus.emit(Message("skill.converse.request", {
+                    "skill_id": skill_id, "utterances": utterances,
+                    "lang": lang}, {'request_id': request_id}))
+
+            deadline = time.monotonic() + self.converse_deadline
+            while True:
+                with self.converse_lock:
+                    converse.event.clear()
+                    decided, skill_id = converse.winner()
+                if decided:
+                    return skill_id
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not converse.event.wait(remaining):
+                    with self.converse_lock:
+                        return converse.winner(final=True)[1]
+        finally:
+            with self.converse_lock:
+                for request_id in request_ids:
+                    self.converse_requests.pop(request_id, None)
 
     def handle_converse_response(self, message):
-        # id = message.data["skill_id"]
-        # no need to crosscheck id because waiting before new request is made
-        # no other skill will make this request is safe assumption
-        result = message.data["result"]
-        self.result = result
-        self.waiting = False
+        request_id = (message.context or {}).get('request_id')
+        with self.converse_lock:
+            request = self.converse_requests.pop(request_id, None)
+            if request:
+                converse, skill_id = request
+                converse.add_result(skill_id, message.data["result"])
 
     def remove_active_skill(self, skill_id):
-        for skill in self.active_skills:
-            if skill[0] == skill_id:
-                self.active_skills.remove(skill)
+        self.active_skills.remove(skill_id)
 
     def add_active_skill(self, skill_id):
-        # search the list for an existing entry that already contains it
-        # and remove that reference
-        self.remove_active_skill(skill_id)
-        # add skill with timestamp to start of skill_list
-        self.active_skills.insert(0, [skill_id, time.time()])
+        self.active_skills.touch(skill_id)
+
+    def handle_get_active_skills(self, message):
+        """ Reply with the active skills, most recently active first. """
+        self.bus.emit(message.response({'skills': self.active_skills.get()}))
 
     def update_context(self, intent):
         """ Updates context with keyword from the intent.
@@ -259,13 +552,21 @@ class IntentService(object):
             elif context_entity['data'][0][1] in self.context_keywords:
                 self.context_manager.inject_context(context_entity)
 
-    def send_metrics(self, intent, context, stopwatch):
+    def send_metrics(self, intent, context, stopwatch, engine_timing=None):
         """
         Send timing metrics to the backend.
 
         NOTE: This only applies to those with Opt In.
+
+        Args:
+            intent: the matched Adapt intent or None
+            context (dict): context of the utterance message
+            stopwatch (Stopwatch): timing of the intent service
+            engine_timing (dict): Stopwatch of each intent engine run
         """
         ident = context['ident'] if context else None
+        for engine, engine_stopwatch in (engine_timing or {}).items():
+            report_timing(ident, engine, engine_stopwatch)
         if intent:
             # Recreate skill name from skill id
             parts = intent.get('intent_type', '').split(':')
@@ -300,15 +601,15 @@ class IntentService(object):
             utterances = message.data.get('utterances', '')
 
             stopwatch = Stopwatch()
+            engine_timing = {}
             with stopwatch:
                 # Give active skills an opportunity to handle the utterance
                 converse = self._converse(utterances, lang)
 
                 if not converse:
                     # No conversation, use intent system to handle utterance
-                    intent = self._adapt_intent_match(utterances, lang)
-                    padatious_intent = PadatiousService.instance.calc_intent(
-                                        utterances[0])
+                    intent, padatious_intent = self._intent_match(
+                        utterances, lang, engine_timing)
 
             if converse:
                 # Report that converse handled the intent and return
@@ -328,7 +629,8 @@ class IntentService(object):
                                       {'utterance': utterances[0],
                                        'lang': lang})
             self.bus.emit(reply)
-            self.send_metrics(intent, message.context, stopwatch)
+            self.send_metrics(intent, message.context, stopwatch,
+                              engine_timing)
         except Exception as e:
             LOG.exception(e)
 
@@ -343,20 +645,79 @@ class IntentService(object):
             bool: True if converse handled it, False if  no skill processes it
         """
 
-        # check for conversation time-out
-        self.active_skills = [skill for skill in self.active_skills
-                              if time.time() - skill[
-                                  1] <= self.converse_timeout * 60]
-
-        # check if any skill wants to handle utterance
-        for skill in self.active_skills:
-            if self.do_converse(utterances, skill[0], lang):
-                # update timestamp, or there will be a timeout where
-                # intent stops conversing whether its being used or not
-                self.add_active_skill(skill[0])
-                return True
+        # check if any skill wants to handle utterance, timed out skills
+        # aren't active anymore
+        skill_id = self.converse_round(
+            utterances, self.active_skills.skill_ids(), lang)
+        if skill_id is not None:
+            # update timestamp, or there will be a timeout where
+            # intent stops conversing whether its being used or not
+            self.add_active_skill(skill_id)
+            return True
         return False
 
+    def _intent_match(self, utterances, lang, engine_timing):
+        """ Run the Adapt and Padatious engines
+
+        Padatious matching is started in its matcher process (see
+        PadatiousService.start_calc_intent) before Adapt runs here, both
+        engines are CPU bound so threads wouldn't run them in parallel.
+        After a perfect Adapt match the Padatious result isn't waited for.
+        Matches are cached by normalized utterances, language and context.
+
+        Args:
+            utterances (list):  list of utterances
+            lang (string):      4 letter ISO language code
+            engine_timing (dict): filled with a Stopwatch per engine run
+
+        Returns:
+            tuple: (Adapt intent, Padatious intent), either may be None
+        """
+        generation = self.intent_cache.generation
+        # normalize() changes "it's a boy" to "it is boy", etc.
+        normalized = [normalize(utterance, lang) for utterance in utterances]
+        key = (tuple(normalized), lang, self.context_manager.signature())
+        cached = self.intent_cache.get(key)
+        if cached is not None:
+            intent, index, padatious_intent = cached
+            if intent:
+                intent = dict(intent, utterance=utterances[index])
+                self._activate_adapt_intent(intent)
+            return intent, padatious_intent
+
+        padatious_result = None
+        if PadatiousService.instance:
+            padatious_result = PadatiousService.instance.start_calc_intent(
+                utterances[0])
+        intent, index = self._timed(engine_timing, 'adapt',
+                                    self._adapt_determine_intent,
+                                    utterances, normalized)
+        padatious_intent = None
+        perfect_match = intent and intent.get('confidence', 0.0) >= 1.0
+        if padatious_result and not perfect_match:
+            try:
+                padatious_intent = self._timed(engine_timing, 'padatious',
+                                               padatious_result)
+            except Exception:
+                LOG.exception('Padatious intent matching failed')
+                generation = None  # Don't cache the failure
+
+        self.intent_cache.put(key, (intent, index, padatious_intent),
+                              generation)
+        if intent:
+            intent = dict(intent)
+            self._activate_adapt_intent(intent)
+        return intent, padatious_intent
+
+    @staticmethod
+    def _timed(engine_timing, engine, func, *args):
+        """ Call func, storing its timing in engine_timing[engine]. """
+        stopwatch = Stopwatch()
+        with stopwatch:
+            result = func(*args)
+        engine_timing[engine] = stopwatch
+        return result
+
     def _adapt_intent_match(self, utterances, lang):
         """ Run the Adapt engine to search for an matching intent
 
@@ -367,16 +728,35 @@ class IntentService(object):
         Returns:
             Intent structure, or None if no match was found.
         """
+        normalized = [normalize(utterance, lang) for utterance in utterances]
+        best_intent, _ = self._adapt_determine_intent(utterances, normalized)
+        if best_intent:
+            self._activate_adapt_intent(best_intent)
+        return best_intent
+
+    def _adapt_determine_intent(self, utterances, normalized):
+        """ Find the Adapt intent of the utterances
+
+        Args:
+            utterances (list):  list of utterances
+            normalized (list):  the normalized utterances
+
+        Returns:
+            tuple: (intent structure, index of the matching utterance),
+                   (None, None) if no match was found.
+        """
+        self._update_engine()
         best_intent = None
-        for utterance in utterances:
+        index = None
+        for i, utterance in enumerate(utterances):
             try:
-                # normalize() changes "it's a boy" to "it is boy", etc.
                 best_intent = next(self.engine.determine_intent(
-                    normalize(utterance, lang), 100,
+                    normalized[i], 100,
                     include_tags=True,
                     context_manager=self.context_manager))
                 # TODO - Should Adapt handle this?
                 best_intent['utterance'] = utterance
+                index = i
             except StopIteration:
                 # don't show error in log
                 continue
@@ -385,17 +765,21 @@ class IntentService(object):
                 continue
 
         if best_intent and best_intent.get('confidence', 0.0) > 0.0:
-            self.update_context(best_intent)
-            # update active skills
-            skill_id = best_intent['intent_type'].split(":")[0]
-            self.add_active_skill(skill_id)
             # adapt doesn't handle context injection for one_of keywords
             # correctly. Workaround this issue if possible.
             try:
                 best_intent = workaround_one_of_context(best_intent)
             except LookupError:
                 LOG.error('Error during workaround_one_of_context')
-            return best_intent
+            return best_intent, index
+        return None, None
+
+    def _activate_adapt_intent(self, intent):
+        """ Update context and active skills with a matched intent. """
+        self.update_context(intent)
+        # update active skills
+        skill_id = intent['intent_type'].split(":")[0]
+        self.add_active_skill(skill_id)
 
     def handle_register_vocab(self, message):
         start_concept = message.data.get('start')
@@ -407,23 +791,75 @@ class IntentService(object):
         else:
             self.engine.register_entity(
                 start_concept, end_concept, alias_of=alias_of)
+        self.intent_cache.clear()
+
+    def handle_register_vocab_batch(self, message):
+        """ Register the vocabulary and regexes of a skill.
+
+        Adapt compiles a regex the first time it's registered, regexes
+        registered again (ex. by a reloaded skill) aren't compiled again.
+
+        Args:
+            message: data contains 'vocab', a list of register_vocab data,
+                     and 'regex', a list of regex strings
+        """
+        for regex_str in message.data.get('regex', []):
+            self.engine.register_regex_entity(regex_str)
+        for vocab in message.data.get('vocab', []):
+            self.engine.register_entity(vocab.get('start'), vocab.get('end'),
+                                        alias_of=vocab.get('alias_of'))
+        self.intent_cache.clear()
 
     def handle_register_intent(self, message):
         intent = open_intent_envelope(message)
-        self.engine.register_intent_parser(intent)
+        with self.intent_lock:
+            self.intent_parsers[intent.name] = intent
+            self.skill_intents[intent.name.split(':')[0]].add(intent.name)
+            self.intent_parsers_changed = True
+        self.intent_cache.clear()
 
     def handle_detach_intent(self, message):
-        intent_name = message.data.get('intent_name')
-        new_parsers = [
-            p for p in self.engine.intent_parsers if p.name != intent_name]
-        self.engine.intent_parsers = new_parsers
+        """ Detach intents, by 'intent_name' or a list of 'intent_names'. """
+        names = message.data.get('intent_names') or \
+            [message.data.get('intent_name')]
+        with self.intent_lock:
+            for name in names:
+                if self.intent_parsers.pop(name, None) is not None:
+                    self._unindex_intent(name)
+                    self.intent_parsers_changed = True
+        self.intent_cache.clear()
 
     def handle_detach_skill(self, message):
-        skill_id = message.data.get('skill_id')
-        new_parsers = [
-            p for p in self.engine.intent_parsers if
-            not p.name.startswith(skill_id)]
-        self.engine.intent_parsers = new_parsers
+        skill_id = message.data.get('skill_id').rstrip(':')
+        with self.intent_lock:
+            for name in self.skill_intents.pop(skill_id, ()):
+                self.intent_parsers.pop(name, None)
+                self.intent_parsers_changed = True
+        self.intent_cache.clear()
+
+    def _unindex_intent(self, name):
+        skill_id = name.split(':')[0]
+        names = self.skill_intents.get(skill_id)
+        if names is not None:
+            names.discard(name)
+            if not names:
+                del self.skill_intents[skill_id]
+
+    def _update_engine(self):
+        """ Update the Adapt engine after intents were (de)registered.
+
+        Rebuilding the engine's parser list once before matching keeps
+        bursts of registrations from rebuilding it for every message.
+        """
+        with self.intent_lock:
+            if self.intent_parsers_changed:
+                self.engine.intent_parsers = list(
+                    self.intent_parsers.values())
+                self.intent_parsers_changed = False
+
+    def handle_cache_stats(self, message):
+        """ Reply with the hit/miss counters of the intent cache. """
+        self.bus.emit(message.response(self.intent_cache.stats()))
 
     def handle_add_context(self, message):
         """ Add context
@@ -450,11 +886,15 @@ class IntentService(object):
         """ Remove specific context
 
         Args:
-            message: data contains the 'context' item to remove
+            message: data contains the 'context' item to remove, or the
+                     'origin' of the context to remove
         """
         context = message.data.get('context')
+        origin = message.data.get('origin')
         if context:
             self.context_manager.remove_context(context)
+        elif origin:
+            self.context_manager.remove_origin_context(origin)
 
     def handle_clear_context(self, message):
         """ Clears all keywords from context """
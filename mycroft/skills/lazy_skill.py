@@ -0,0 +1,256 @@
+# Copyright 2018 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Lazy skill activation, importing skills on their first intent match.
+
+Adapt intents are built in skill code, so the vocabulary and intents of a
+skill can't be known without running it. A skill is therefore loaded once
+and the registration messages it sends are recorded in a manifest. While
+the manifest is up to date the skill manager replays it instead of
+importing the skill and the skill is loaded when one of its intents is
+matched.
+"""
+import json
+import os
+from os.path import basename, join
+from threading import Lock, Timer
+
+from mycroft.messagebus.message import Message
+from mycroft.util import get_cache_directory
+from mycroft.util.log import LOG
+
+MANIFEST_VERSION = 1
+REGISTRATION_TYPES = ('register_vocab', 'register_vocab_batch',
+                      'register_intent', 'padatious:register_intent',
+                      'padatious:register_entity')
+INTENT_TYPES = ('register_intent', 'padatious:register_intent')
+
+
+def manifest_path(skill_path):
+    """ Path of the cached manifest of a skill. """
+    return join(get_cache_directory('skill_manifests'),
+                basename(skill_path.rstrip('/')) + '.json')
+
+
+def load_manifest(skill_path, modified):
+    """ Read the manifest of a skill.
+
+    Args:
+        skill_path (str): path of the skill
+        modified (float): last modification time of the skill
+
+    Returns:
+        dict: the manifest, None if missing or recorded for an older
+              version of the skill
+    """
+    try:
+        with open(manifest_path(skill_path), 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (manifest.get('version') != MANIFEST_VERSION or
+            manifest.get('modified') != modified):
+        return None
+    return manifest
+
+
+def save_manifest(skill_path, modified, name, fallback, registrations):
+    """ Store the manifest of a skill.
+
+    Args:
+        skill_path (str): path of the skill
+        modified (float): last modification time of the skill
+        name (str): name of the skill
+        fallback (bool): True for fallback skills, they can't load lazily
+        registrations (list): recorded (type, data) registration messages
+    """
+    path = manifest_path(skill_path)
+    try:
+        # Write to a temporary file first to never leave a partial manifest
+        with open(path + '.tmp', 'w') as f:
+            json.dump({
+                'version': MANIFEST_VERSION,
+                'modified': modified,
+                'name': name,
+                'fallback': fallback,
+                'registrations': registrations
+            }, f)
+        os.replace(path + '.tmp', path)
+    except (OSError, TypeError) as e:
+        LOG.warning('Could not store manifest of {}: {}'.format(
+            name, repr(e)))
+
+
+class RecordingBus(object):
+    """ Messagebus connection recording the registration messages sent.
+
+    Passed to a skill instead of the bus while loading it, everything else
+    is forwarded to the wrapped connection.
+
+    Args:
+        bus: messagebus connection to wrap
+    """
+
+    def __init__(self, bus):
+        self.bus = bus
+        self.recording = True
+        self.registrations = []
+
+    def emit(self, message):
+        if self.recording and message.type in REGISTRATION_TYPES:
+            # Copy, the data may be changed by the skill after sending
+            self.registrations.append(
+                [message.type, json.loads(json.dumps(message.data))])
+        self.bus.emit(message)
+
+    def __getattr__(self, attr):
+        return getattr(self.bus, attr)
+
+
+class LazySkill(object):
+    """ Stand-in in the SkillManager for a skill that isn't loaded yet.
+
+    Sends the registrations of the manifest and listens for the intents of
+    the skill. The first matched intent loads the skill, messages arriving
+    meanwhile wait for the load to finish. The messages are then sent again
+    to be handled by the loaded skill. Skills not handling intents for
+    idle_timeout seconds are unloaded again.
+
+    Args:
+        bus: messagebus connection
+        skill_id (str): skill identifier
+        manifest (dict): manifest of the skill
+        load (callable): loads the skill, returns the instance or None
+        idle_timeout (float): seconds before unloading an idle skill,
+                              0 keeps loaded skills
+    """
+    reload_skill = True
+
+    def __init__(self, bus, skill_id, manifest, load, idle_timeout=0):
+        self.bus = bus
+        self.skill_id = skill_id
+        self.name = manifest['name']
+        self.registrations = manifest['registrations']
+        self.intent_names = [data['name'] for msg_type, data
+                             in self.registrations
+                             if msg_type in INTENT_TYPES]
+        self.load = load
+        self.idle_timeout = idle_timeout
+        self.instance = None
+        self.lock = Lock()
+        self.idle_timer = None
+        self.handler_calls = 0
+        self.register()
+
+    @property
+    def is_loaded(self):
+        return self.instance is not None
+
+    def register(self):
+        """ Register the skill from the manifest. """
+        for msg_type, data in self.registrations:
+            self.bus.emit(Message(msg_type, data))
+        for name in self.intent_names:
+            self.bus.on(name, self.handle_intent)
+
+    def _remove_listeners(self):
+        for name in self.intent_names:
+            self.bus.remove(name, self.handle_intent)
+
+    def handle_intent(self, message):
+        """ Load the skill and send the message again for it. """
+        with self.lock:
+            if self.instance is None:
+                LOG.info('Activating skill ' + self.name)
+                try:
+                    instance = self.load()
+                except Exception:
+                    LOG.exception('Loading skill ' + self.name)
+                    instance = None
+                if instance is None:
+                    return
+                self._remove_listeners()
+                self.instance = instance
+                self.handler_calls = 0
+                self._schedule_idle_check()
+        self.bus.emit(message)
+
+    def _schedule_idle_check(self):
+        if self.idle_timeout:
+            self.idle_timer = Timer(self.idle_timeout, self._check_idle)
+            self.idle_timer.daemon = True
+            self.idle_timer.start()
+
+    def _is_active(self):
+        """ Check if the skill is active, it may be in a conversation. """
+        response = self.bus.wait_for_response(
+            Message('intent.service.active_skills.get'), timeout=1)
+        active = response.data.get('skills', []) if response else []
+        return any(skill['skill_id'] == self.skill_id for skill in active)
+
+    def _check_idle(self):
+        """ Unload the skill if it didn't handle anything since the last
+        check. """
+        with self.lock:
+            instance = self.instance
+            if instance is None:
+                return
+            calls = instance.handler_calls
+            if calls != self.handler_calls:
+                self.handler_calls = calls
+                self._schedule_idle_check()
+                return
+
+        # Not holding the lock, intents of the skill would wait for the
+        # round trip to the intent service
+        active = self._is_active()
+
+        with self.lock:
+            if self.instance is not instance:
+                return  # Shut down or reloaded meanwhile
+            calls = instance.handler_calls
+            if active or calls != self.handler_calls:
+                self.handler_calls = calls
+                self._schedule_idle_check()
+                return
+            LOG.info('Unloading idle skill ' + self.name)
+            self._shutdown_instance()
+            self.register()
+
+    def _shutdown_instance(self):
+        try:
+            self.instance.default_shutdown()
+        except Exception:
+            LOG.exception('Shutting down skill: ' + self.name)
+        self.instance = None
+
+    def converse(self, utterances, lang='en-us'):
+        if self.instance is None:
+            return False
+        return self.instance.converse(utterances, lang)
+
+    def default_shutdown(self):
+        with self.lock:
+            if self.idle_timer:
+                self.idle_timer.cancel()
+            if self.instance is not None:
+                self._shutdown_instance()
+                return
+            self._remove_listeners()
+            self.bus.emit(Message('detach_skill',
+                                  {'skill_id': str(self.skill_id) + ':'}))
+            for msg_type, data in self.registrations:
+                if msg_type == 'padatious:register_intent':
+                    self.bus.emit(Message('detach_intent',
+                                          {'intent_name': data['name']}))
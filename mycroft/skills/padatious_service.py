@@ -12,11 +12,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import multiprocessing
+from functools import partial
+from queue import Empty
 from subprocess import call
-from threading import Event
-from time import time as get_time, sleep
+from threading import Event, Lock, Timer
+from time import monotonic
 
-from os.path import expanduser, isfile
+from os.path import expanduser, getmtime, isfile
 from pkg_resources import get_distribution
 
 from mycroft.configuration import Configuration
@@ -24,8 +27,94 @@ from mycroft.messagebus.message import Message
 from mycroft.skills.core import FallbackSkill
 from mycroft.util.log import LOG
 
+try:
+    from padatious import IntentContainer
+except ImportError:
+    IntentContainer = None
+
+
+def build_container(cache_dir, intents, entities):
+    """ Create an IntentContainer with intents and entities loaded.
+
+    Args:
+        cache_dir (str): padatious intent cache directory
+        intents (dict): intent name -> (file name, modification time)
+        entities (dict): entity name -> (file name, modification time)
+
+    Returns:
+        IntentContainer: the untrained container
+    """
+    container = IntentContainer(cache_dir)
+    for objects, load_func in ((entities, container.load_entity),
+                               (intents, container.load_intent)):
+        for name, (file_name, _) in objects.items():
+            try:
+                load_func(name, file_name)
+            except OSError as e:
+                LOG.warning('Could not load {}: {}'.format(
+                    file_name, repr(e)))
+    return container
+
+
+def train_container(cache_dir, intents, entities, single_thread, progress):
+    """ Train intents and entities into the cache directory.
+
+    Target of the training process. Padatious saves every trained object
+    in the cache directory, containers built from the same files load them
+    from there without training.
+
+    Args:
+        cache_dir, intents, entities: see build_container()
+        single_thread (bool): train without a process pool
+        progress (multiprocessing.Queue): training stages are put here
+    """
+    progress.put('loading')
+    container = build_container(cache_dir, intents, entities)
+    progress.put('training')
+    container.train(single_thread=single_thread)
+
+
+# Container of the matcher process, see load_matcher()
+_matcher_container = None
+
+
+def load_matcher(cache_dir, intents, entities):
+    """ Load the trained container into the matcher process.
+
+    Args:
+        cache_dir, intents, entities: see build_container()
+    """
+    global _matcher_container
+    container = build_container(cache_dir, intents, entities)
+    # Everything was trained already, this only loads from the cache
+    container.train(single_thread=True)
+    _matcher_container = container
+
+
+def match_utterance(utt):
+    """ Match an utterance in the matcher process.
+
+    Returns:
+        MatchData: best match, None if no container is loaded (ex. in a
+                   replaced worker)
+    """
+    if _matcher_container is None:
+        return None
+    return _matcher_container.calc_intent(utt)
+
 
 class PadatiousService(FallbackSkill):
+    """ Fallback matching utterances with the Padatious intent parser.
+
+    Registered intents and entities are kept in a registry. Training runs
+    in a child process writing the models to the intent cache, while the
+    current container keeps answering queries. A container loaded from the
+    cache then replaces it. Padatious only retrains the intents and
+    entities whose data changed, the others are loaded from the cache.
+
+    The trained models are also loaded into a matcher process, letting the
+    intent service run Padatious alongside Adapt instead of after it.
+    """
     instance = None
 
     def __init__(self, bus, service):
@@ -35,11 +124,12 @@ class PadatiousService(FallbackSkill):
 
         self.config = Configuration.get()['padatious']
         self.service = service
-        intent_cache = expanduser(self.config['intent_cache'])
+        self.intent_cache = expanduser(self.config['intent_cache'])
+        self.container = None  # Trained container answering queries
+        self.matcher = None  # Pool with the matcher process
+        self.matcher_loaded = None  # AsyncResult of the last load_matcher
 
-        try:
-            from padatious import IntentContainer
-        except ImportError:
+        if IntentContainer is None:
             LOG.error('Padatious not installed. Please re-run dev_setup.sh')
             try:
                 call(['notify-send', 'Padatious not installed',
@@ -48,7 +138,12 @@ class PadatiousService(FallbackSkill):
                 pass
             return
 
-        self.container = IntentContainer(intent_cache)
+        # name -> (file name, modification time) of registered objects
+        self.intents = {}
+        self.entities = {}
+        self.trained = ({}, {})  # intents and entities of the container
+        self.registry_lock = Lock()
+        self.train_lock = Lock()
 
         self._bus = bus
         self.bus.on('padatious:register_intent', self.register_intent)
@@ -60,38 +155,160 @@ class PadatiousService(FallbackSkill):
         self.finished_initial_train = False
 
         self.train_delay = self.config['train_delay']
-        self.train_time = get_time() + self.train_delay
+        self.train_timer = None
+        self.retry_delay = self.train_delay  # Doubled after each failure
+        self.train_in_subprocess = self.config.get('train_in_subprocess',
+                                                   True)
+
+        self.match_timeout = self.config.get('match_timeout', 2)
+        if self.config.get('match_in_subprocess', True):
+            # Spawn, forking the threaded skills process isn't safe
+            self.matcher = multiprocessing.get_context('spawn').Pool(1)
 
     def train(self, message=None):
+        """ Train a container with the registered intents and entities.
+
+        Skipped if nothing changed since the last training. Queries are
+        answered by the previous container until the new one is trained.
+        A failed training is retried, waiting longer after each failure.
+        """
         if message is None:
             single_thread = False
         else:
             single_thread = message.data.get('single_thread', False)
-        self.finished_training_event.clear()
 
-        LOG.info('Training... (single_thread={})'.format(single_thread))
-        self.container.train(single_thread=single_thread)
+        with self.train_lock:
+            with self.registry_lock:
+                intents, entities = dict(self.intents), dict(self.entities)
+            changed = self.changed_objects(intents, entities)
+            if self.finished_initial_train and not changed:
+                LOG.debug('Padatious intents unchanged, skipping training')
+                return
+
+            LOG.info('Training... (single_thread={}, changed: {})'.format(
+                single_thread, ', '.join(sorted(changed)) or 'none'))
+            self.bus.emit(Message('padatious:training.started', {
+                'changed': sorted(changed)}))
+            start = monotonic()
+            try:
+                success = self._train(intents, entities, single_thread)
+            except Exception:
+                LOG.exception('Padatious training raised')
+                success = False
+            if not success:
+                LOG.error('Padatious training failed, '
+                          'keeping the previous model')
+            self.bus.emit(Message('padatious:training.complete', {
+                'success': success,
+                'duration': monotonic() - start,
+                'intents': len(intents),
+                'entities': len(entities)
+            }))
+
+        if success:
+            self.finished_training_event.set()
+            self.finished_initial_train = True
+            self.retry_delay = self.train_delay
+        else:
+            # Changes aren't scheduled until the initial training succeeds
+            LOG.info('Retrying Padatious training in {} seconds'.format(
+                self.retry_delay))
+            self.schedule_training(self.retry_delay)
+            self.retry_delay = min(self.retry_delay * 2, 60)
+
+    def _train(self, intents, entities, single_thread):
+        """ Train a new container and swap it in.
+
+        Returns:
+            bool: True if the training succeeded
+        """
+        if self.train_in_subprocess:
+            if not self._train_in_subprocess(intents, entities,
+                                             single_thread):
+                return False
+        # Objects trained by the subprocess load from the cache
+        container = build_container(self.intent_cache, intents, entities)
+        container.train(single_thread=single_thread)
+        self.container = container
+        self.trained = (intents, entities)
+        if self.matcher is not None:
+            # Queued after the matches already submitted
+            self.matcher_loaded = self.matcher.apply_async(
+                load_matcher, (self.intent_cache, intents, entities))
         LOG.info('Training complete.')
+        # Cached Padatious matches are from the previous training
+        self.service.intent_cache.clear()
+        return True
 
-        self.finished_training_event.set()
-        self.finished_initial_train = True
+    def _train_in_subprocess(self, intents, entities, single_thread):
+        """ Run train_container() in a child process.
 
-    def wait_and_train(self):
-        if not self.finished_initial_train:
-            return
-        sleep(self.train_delay)
-        if self.train_time < 0.0:
-            return
+        Keeps the training load out of the skills process. Training stages
+        are reported on the bus as padatious:training.progress messages.
+
+        Returns:
+            bool: True if the training succeeded
+        """
+        # Spawn, forking the threaded skills process isn't safe
+        context = multiprocessing.get_context('spawn')
+        progress = context.Queue()
+        process = context.Process(target=train_container, args=(
+            self.intent_cache, intents, entities, single_thread, progress))
+        process.start()
+        while process.is_alive() or not progress.empty():
+            try:
+                stage = progress.get(timeout=0.5)
+            except Empty:
+                continue
+            self.bus.emit(Message('padatious:training.progress',
+                                  {'stage': stage}))
+        process.join()
+        return process.exitcode == 0
+
+    def changed_objects(self, intents, entities):
+        """ Names of the intents and entities changed since the training.
+
+        Args:
+            intents (dict): registered intents
+            entities (dict): registered entities
 
-        if self.train_time <= get_time() + 0.01:
-            self.train_time = -1.0
-            self.train()
+        Returns:
+            set: names of added, removed or modified objects
+        """
+        changed = set()
+        for registered, trained in zip((intents, entities), self.trained):
+            for name in set(registered) | set(trained):
+                if registered.get(name) != trained.get(name):
+                    changed.add(name)
+        return changed
+
+    def schedule_training(self, delay=None):
+        """ Train when there were no changes for train_delay seconds.
+
+        Args:
+            delay (float): seconds to wait instead, also scheduling the
+                           retry of a failed initial training
+        """
+        if not self.finished_initial_train and delay is None:
+            return
+        with self.registry_lock:
+            if self.train_timer:
+                self.train_timer.cancel()
+            self.train_timer = Timer(delay or self.train_delay, self.train)
+            self.train_timer.daemon = True
+            self.train_timer.start()
 
     def handle_detach_intent(self, message):
-        intent_name = message.data.get('intent_name')
-        self.container.remove_intent(intent_name)
+        intent_names = message.data.get('intent_names') or \
+            [message.data.get('intent_name')]
+        with self.registry_lock:
+            removed = [self.intents.pop(name, None) for name in intent_names]
+        if any(removed):
+            # Matches are filtered against the registry until retrained
+            self.service.intent_cache.clear()
+            self.schedule_training()
 
-    def _register_object(self, message, object_name, register_func):
+    def _register_object(self, message, object_name, registry):
         file_name = message.data['file_name']
         name = message.data['name']
 
@@ -101,15 +318,15 @@ class PadatiousService(FallbackSkill):
             LOG.warning('Could not find file ' + file_name)
             return
 
-        register_func(name, file_name)
-        self.train_time = get_time() + self.train_delay
-        self.wait_and_train()
+        with self.registry_lock:
+            registry[name] = (file_name, getmtime(file_name))
+        self.schedule_training()
 
     def register_intent(self, message):
-        self._register_object(message, 'intent', self.container.load_intent)
+        self._register_object(message, 'intent', self.intents)
 
     def register_entity(self, message):
-        self._register_object(message, 'entity', self.container.load_entity)
+        self._register_object(message, 'entity', self.entities)
 
     def handle_fallback(self, message):
         if not self.finished_training_event.is_set():
@@ -119,7 +336,7 @@ class PadatiousService(FallbackSkill):
         utt = message.data.get('utterance')
         LOG.debug("Padatious fallback attempt: " + utt)
         data = self.calc_intent(utt)
-        if data.conf < 0.5:
+        if data is None or data.conf < 0.5:
             return False
 
         data.matches['utterance'] = utt
@@ -129,5 +346,53 @@ class PadatiousService(FallbackSkill):
         self.bus.emit(message.reply(data.name, data=data.matches))
         return True
 
+    def start_calc_intent(self, utt):
+        """ Start matching an utterance in the matcher process.
+
+        The utterance is matched in this process instead while the
+        matcher process is disabled or loading the latest training.
+
+        Returns:
+            callable: returns the result of calc_intent()
+        """
+        loaded = self.matcher_loaded
+        if (loaded is None or not loaded.ready() or
+                not loaded.successful()):
+            return partial(self.calc_intent, utt)
+        result = self.matcher.apply_async(match_utterance, (utt,))
+
+        def get_result():
+            try:
+                data = result.get(self.match_timeout)
+            except Exception as e:
+                LOG.warning('Padatious matcher process failed: ' + repr(e))
+                data = None
+            if data is None or (data.name is not None and
+                                data.name not in self.intents):
+                # Not loaded, or matched an intent detached since training
+                return self.calc_intent(utt)
+            return data
+        return get_result
+
+    def shutdown(self):
+        if self.matcher is not None:
+            self.matcher.terminate()
+
     def calc_intent(self, utt):
-        return self.container.calc_intent(utt)
+        """ Match an utterance against the registered intents.
+
+        The container may still hold intents detached since it was
+        trained, matches of those are skipped.
+
+        Returns:
+            MatchData: the best match, None if there is none
+        """
+        container = self.container
+        if container is None:
+            return None
+        data = container.calc_intent(utt)
+        if data.name is None or data.name in self.intents:
+            return data
+        matches = [match for match in container.calc_intents(utt)
+                   if match.name in self.intents]
+        return max(matches, key=lambda match: match.conf, default=None)
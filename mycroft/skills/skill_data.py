@@ -17,23 +17,31 @@
 data such as dialogs, intents and regular expressions.
 """
 
+import json
+import os
 from os import walk
 from os.path import splitext, join
 import re
 
 from mycroft.messagebus.message import Message
+from mycroft.util import get_cache_directory
+from mycroft.util.log import LOG
 
+# Bump when the format of the cached data changes
+SKILL_DATA_CACHE_VERSION = 1
 
-def load_vocab_from_file(path, vocab_type, bus):
-    """Load Mycroft vocabulary from file
-    The vocab is sent to the intent handler using the message bus
+
+def read_vocab_file(path, vocab_type):
+    """Read Mycroft vocabulary from file
 
     Args:
         path:           path to vocabulary file (*.voc)
         vocab_type:     keyword name
-        bus:            Mycroft messagebus connection
-        skill_id(str):  skill id
+
+    Returns:
+        list: register_vocab data of each vocabulary entry and alias
     """
+    vocab = []
     if path.endswith('.voc'):
         with open(path, 'r') as voc_file:
             for line in voc_file.readlines():
@@ -41,48 +49,193 @@ def load_vocab_from_file(path, vocab_type, bus):
                     continue
                 parts = line.strip().split("|")
                 entity = parts[0]
-                bus.emit(Message("register_vocab", {
-                    'start': entity, 'end': vocab_type
-                }))
+                vocab.append({'start': entity, 'end': vocab_type})
                 for alias in parts[1:]:
-                    bus.emit(Message("register_vocab", {
+                    vocab.append({
                         'start': alias, 'end': vocab_type, 'alias_of': entity
-                    }))
+                    })
+    return vocab
 
 
-def load_regex_from_file(path, bus, skill_id):
-    """Load regex from file
-    The regex is sent to the intent handler using the message bus
+def read_regex_file(path, skill_id):
+    """Read regex from file
 
     Args:
-        path:       path to vocabulary file (*.voc)
-        bus:        Mycroft messagebus connection
+        path:       path to regex file (*.rx)
+        skill_id:   skill identifier
+
+    Returns:
+        list: munged regex strings
     """
+    regexes = []
     if path.endswith('.rx'):
         with open(path, 'r') as reg_file:
             for line in reg_file.readlines():
                 if line.startswith("#"):
                     continue
-                re.compile(munge_regex(line.strip(), skill_id))
-                bus.emit(
-                    Message("register_vocab",
-                            {'regex': munge_regex(line.strip(), skill_id)}))
+                regex = munge_regex(line.strip(), skill_id)
+                re.compile(regex)
+                regexes.append(regex)
+    return regexes
 
 
-def load_vocabulary(basedir, bus, skill_id):
-    """Load vocabulary from all files in the specified directory.
+def load_vocab_from_file(path, vocab_type, bus):
+    """Load Mycroft vocabulary from file
+    The vocab is sent to the intent handler using the message bus
+
+    Args:
+        path:           path to vocabulary file (*.voc)
+        vocab_type:     keyword name
+        bus:            Mycroft messagebus connection
+        skill_id(str):  skill id
+    """
+    for entry in read_vocab_file(path, vocab_type):
+        bus.emit(Message("register_vocab", entry))
+
+
+def load_regex_from_file(path, bus, skill_id):
+    """Load regex from file
+    The regex is sent to the intent handler using the message bus
+
+    Args:
+        path:       path to vocabulary file (*.voc)
+        bus:        Mycroft messagebus connection
+    """
+    for regex in read_regex_file(path, skill_id):
+        bus.emit(Message("register_vocab", {'regex': regex}))
+
+
+def read_vocabulary(basedir, skill_id):
+    """Read vocabulary from all files in the specified directory.
 
     Args:
         basedir (str): path of directory to load from (will recurse)
-        bus (messagebus emitter): messagebus instance used to send the vocab to
-                                  the intent service
         skill_id: skill the data belongs to
+
+    Returns:
+        list: register_vocab data of each vocabulary entry and alias
     """
+    vocab = []
     for path, _, files in walk(basedir):
         for f in files:
             if f.endswith(".voc"):
                 vocab_type = to_alnum(skill_id) + splitext(f)[0]
-                load_vocab_from_file(join(path, f), vocab_type, bus)
+                vocab += read_vocab_file(join(path, f), vocab_type)
+    return vocab
+
+
+def read_regex(basedir, skill_id):
+    """Read regex from all files in the specified directory.
+
+    Args:
+        basedir (str): path of directory to load from
+        skill_id (str): skill identifier
+
+    Returns:
+        list: munged regex strings
+    """
+    regexes = []
+    for path, _, files in walk(basedir):
+        for f in files:
+            if f.endswith(".rx"):
+                regexes += read_regex_file(join(path, f), skill_id)
+    return regexes
+
+
+def data_files_signature(*directories):
+    """ Signature of the vocab and regex files in the directories.
+
+    Changes when a file is added, removed or modified.
+
+    Args:
+        directories (str): directories to look in, None entries are skipped
+
+    Returns:
+        list: [path, mtime, size] of each .voc and .rx file
+    """
+    signature = []
+    for directory in directories:
+        if not directory:
+            continue
+        for path, _, files in walk(directory):
+            for f in sorted(files):
+                if f.endswith('.voc') or f.endswith('.rx'):
+                    file_path = join(path, f)
+                    stat = os.stat(file_path)
+                    signature.append([file_path, stat.st_mtime_ns,
+                                      stat.st_size])
+    return sorted(signature)
+
+
+def skill_data_cache_path(skill_id, lang):
+    """ Path of the cached vocabulary of a skill. """
+    return join(get_cache_directory('skill_data'),
+                '{}.{}.json'.format(to_alnum(skill_id), lang))
+
+
+def read_skill_data(vocab_dir, regex_dir, skill_id, lang):
+    """ Read the vocabulary and regexes of a skill, using the disk cache.
+
+    The parsed vocabulary and munged regexes are cached per skill and
+    language. The cache is used as long as the signature of the data files
+    is unchanged, then only the cache file is read. Regexes in the cache
+    were validated when cached and aren't compiled again by the skill.
+
+    Only the regex strings are cached, compiled patterns can't be sent
+    over the messagebus. The intent service compiles each distinct regex
+    once, registering it again when the skill reloads reuses the pattern.
+
+    Args:
+        vocab_dir (str): vocab directory of the skill, can be None
+        regex_dir (str): regex directory of the skill, can be None
+        skill_id (str): skill identifier
+        lang (str): language of the data
+
+    Returns:
+        tuple: (vocab, regex) as returned by read_vocabulary and read_regex
+    """
+    signature = data_files_signature(vocab_dir, regex_dir)
+    cache_path = skill_data_cache_path(skill_id, lang)
+    try:
+        with open(cache_path, 'r') as f:
+            cached = json.load(f)
+        if (cached.get('version') == SKILL_DATA_CACHE_VERSION and
+                cached.get('skill_id') == str(skill_id) and
+                cached.get('signature') == signature):
+            return cached['vocab'], cached['regex']
+    except (OSError, ValueError, KeyError):
+        pass  # Missing or unreadable cache, read the data files
+
+    vocab = read_vocabulary(vocab_dir, skill_id) if vocab_dir else []
+    regex = read_regex(regex_dir, skill_id) if regex_dir else []
+    try:
+        # Write to a temporary file first to never leave a partial cache
+        tmp_path = cache_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'version': SKILL_DATA_CACHE_VERSION,
+                'skill_id': str(skill_id),
+                'signature': signature,
+                'vocab': vocab,
+                'regex': regex
+            }, f)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        LOG.warning('Could not cache skill data: ' + repr(e))
+    return vocab, regex
+
+
+def load_vocabulary(basedir, bus, skill_id):
+    """Load vocabulary from all files in the specified directory.
+
+    Args:
+        basedir (str): path of directory to load from (will recurse)
+        bus (messagebus emitter): messagebus instance used to send the vocab to
+                                  the intent service
+        skill_id: skill the data belongs to
+    """
+    for entry in read_vocabulary(basedir, skill_id):
+        bus.emit(Message("register_vocab", entry))
 
 
 def load_regex(basedir, bus, skill_id):
@@ -94,10 +247,8 @@ def load_regex(basedir, bus, skill_id):
                                   the intent service
         skill_id (str): skill identifier
     """
-    for path, _, files in walk(basedir):
-        for f in files:
-            if f.endswith(".rx"):
-                load_regex_from_file(join(path, f), bus, skill_id)
+    for regex in read_regex(basedir, skill_id):
+        bus.emit(Message("register_vocab", {'regex': regex}))
 
 
 def to_alnum(skill_id):
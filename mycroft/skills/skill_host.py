@@ -0,0 +1,311 @@
+# Copyright 2018 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Skill hosts, worker processes running skills outside the skills process.
+
+The SkillManager starts a pool of skill hosts connecting to the messagebus
+and asks them to load and unload skills. Skills are loaded with load_skill()
+like in the skills process and talk to the rest of the system over the bus.
+Fallback skills can't be hosted, they're run by the intent failure handler
+of the skills process and are loaded there instead.
+"""
+import multiprocessing
+from threading import Event, Lock
+from time import monotonic
+
+import psutil
+
+from mycroft.messagebus.client import create_client
+from mycroft.messagebus.message import Message
+from mycroft.util import create_daemon
+from mycroft.util.log import LOG
+
+from .core import load_skill, create_skill_descriptor, FallbackSkill
+
+HOST_LOAD = 'mycroft.skills.host.load'
+HOST_UNLOAD = 'mycroft.skills.host.unload'
+HOST_PING = 'mycroft.skills.host.ping'
+HOSTS_STATS = 'mycroft.skills.hosts.stats'
+
+
+def run_skill_host(host_id):
+    """ Entry point of the skill host processes. """
+    bus = create_client()
+    SkillHost(host_id, bus)
+    bus.run_forever()
+
+
+def converse_response(request, skill_id, result):
+    """ Create the response to a skill.converse.request.
+
+    Args:
+        request (Message): the converse request
+        skill_id: id of the answering skill, 0 if no skill answered
+        result (bool): True if the skill handled the utterances
+    """
+    context = {}
+    if request.context and 'request_id' in request.context:
+        context['request_id'] = request.context['request_id']
+    return request.reply('skill.converse.response', {
+        'skill_id': skill_id, 'result': result}, context)
+
+
+class SkillHost(object):
+    """ Runs skills in a skill host process.
+
+    Loads and unloads skills when asked by the SkillManager and answers its
+    health checks and the converse requests of the hosted skills.
+
+    Args:
+        host_id (int): id of the host in the pool
+        bus: messagebus connection of the host
+    """
+
+    def __init__(self, host_id, bus):
+        self.host_id = host_id
+        self.bus = bus
+        self.skills = {}  # skill path -> MycroftSkill
+        self.process = psutil.Process()
+        bus.on(HOST_LOAD, self.handle_load)
+        bus.on(HOST_UNLOAD, self.handle_unload)
+        bus.on(HOST_PING, self.handle_ping)
+        bus.on('skill.converse.request', self.handle_converse_request)
+
+    def _is_addressed(self, message):
+        return message.data.get('host_id') == self.host_id
+
+    def handle_load(self, message):
+        if not self._is_addressed(message):
+            return
+        path = message.data['path']
+        self.unload(path)
+        instance = load_skill(create_skill_descriptor(path), self.bus,
+                              message.data['skill_id'],
+                              message.data.get('blacklist'))
+        fallback = isinstance(instance, FallbackSkill)
+        if fallback:
+            instance.default_shutdown()
+            instance = None
+        elif instance:
+            self.skills[path] = instance
+        self.bus.emit(message.response({
+            'loaded': instance is not None,
+            'name': instance.name if instance else None,
+            'fallback': fallback
+        }))
+
+    def handle_unload(self, message):
+        if self._is_addressed(message):
+            self.unload(message.data['path'])
+            self.bus.emit(message.response())
+
+    def unload(self, path):
+        instance = self.skills.pop(path, None)
+        if instance:
+            try:
+                instance.default_shutdown()
+            except Exception:
+                LOG.exception('Shutting down skill: ' + instance.name)
+
+    def handle_ping(self, message):
+        """ Reply with the resource usage of the host and its skills. """
+        if not self._is_addressed(message):
+            return
+        cpu = self.process.cpu_times()
+        self.bus.emit(message.response({
+            'host_id': self.host_id,
+            'pid': self.process.pid,
+            'cpu_seconds': cpu.user + cpu.system,
+            'rss_mb': self.process.memory_info().rss / 1024 ** 2,
+            'skills': {path: {
+                'name': skill.name,
+                'handler_cpu_seconds': skill.handler_cpu_time,
+                'handler_calls': skill.handler_calls,
+                'import_seconds': skill.import_time
+            } for path, skill in self.skills.items()}
+        }))
+
+    def handle_converse_request(self, message):
+        skill_id = message.data['skill_id']
+        for instance in list(self.skills.values()):
+            if instance.skill_id != skill_id:
+                continue
+            try:
+                result = instance.converse(message.data['utterances'],
+                                           message.data['lang'])
+            except Exception:
+                LOG.exception('Error in converse method for skill ' +
+                              str(skill_id))
+                result = False
+            self.bus.emit(converse_response(message, skill_id, result))
+
+
+class HostedSkill(object):
+    """ Stand-in in the SkillManager for a skill running in a skill host.
+
+    Args:
+        pool (SkillHostPool): pool of the host running the skill
+        path (str): path of the skill
+        name (str): name of the skill
+    """
+    reload_skill = True
+
+    def __init__(self, pool, path, name):
+        self.pool = pool
+        self.path = path
+        self.name = name
+
+    def default_shutdown(self):
+        self.pool.unload(self.path)
+
+
+class SkillHostPool(object):
+    """ Pool of skill host processes.
+
+    Skills are assigned to the host running the fewest skills. Hosts are
+    pinged every ping_interval seconds, hosts that exited or don't answer
+    are restarted and their skills loaded again. The last ping responses
+    are sent in reply to mycroft.skills.hosts.stats messages.
+
+    Args:
+        bus: messagebus connection of the skills process
+        config (dict): the skill_hosts config
+    """
+
+    def __init__(self, bus, config):
+        self.bus = bus
+        self.size = config.get('processes', 2)
+        self.ping_interval = config.get('ping_interval', 10)
+        self.timeout = config.get('timeout', 30)
+        self.hosts = {}  # host id -> Process
+        self.assignments = {}  # skill path -> (host id, load message data)
+        self.stats = {}  # host id -> last ping response data
+        self.lock = Lock()
+        self._stop_event = Event()
+        # Spawn, forking the threaded skills process isn't safe
+        self.context = multiprocessing.get_context('spawn')
+
+    def start(self):
+        self.bus.on(HOSTS_STATS, self.handle_stats)
+        for host_id in range(self.size):
+            self._start_host(host_id)
+        create_daemon(self._monitor)
+
+    def stop(self):
+        self._stop_event.set()
+        for process in self.hosts.values():
+            process.terminate()
+
+    def _start_host(self, host_id):
+        process = self.context.Process(target=run_skill_host,
+                                       args=(host_id,), daemon=True)
+        process.start()
+        self.hosts[host_id] = process
+        LOG.info('Started skill host {} (pid {})'.format(
+            host_id, process.pid))
+        # Wait for the host to connect to the messagebus
+        end = monotonic() + self.timeout
+        while monotonic() < end and process.is_alive():
+            if self.ping(host_id, timeout=1) is not None:
+                return
+        LOG.warning('Skill host {} is not responding'.format(host_id))
+
+    def ping(self, host_id, timeout=None):
+        """ Health check of a host.
+
+        Args:
+            host_id (int): host to check
+            timeout (float): seconds to wait, defaults to the pool timeout
+
+        Returns:
+            dict: the ping response data, None if the host didn't answer
+        """
+        response = self.bus.wait_for_response(
+            Message(HOST_PING, {'host_id': host_id}),
+            timeout=timeout or self.timeout)
+        if response is None:
+            return None
+        self.stats[host_id] = response.data
+        return response.data
+
+    def load(self, skill_path, skill_id, blacklist=None):
+        """ Load a skill in a skill host.
+
+        Returns:
+            dict: load response data with 'loaded', 'name' and 'fallback',
+                  None if the host didn't answer
+        """
+        with self.lock:
+            if skill_path in self.assignments:
+                host_id = self.assignments[skill_path][0]
+            else:
+                counts = {h: 0 for h in self.hosts}
+                for assigned_host, _ in self.assignments.values():
+                    counts[assigned_host] += 1
+                host_id = min(counts, key=counts.get)
+            data = {'host_id': host_id, 'path': skill_path,
+                    'skill_id': skill_id, 'blacklist': blacklist or []}
+            self.assignments[skill_path] = (host_id, data)
+        response = self.bus.wait_for_response(Message(HOST_LOAD, data),
+                                              timeout=self.timeout)
+        if response is None or not response.data.get('loaded'):
+            with self.lock:
+                self.assignments.pop(skill_path, None)
+        return response.data if response else None
+
+    def unload(self, skill_path):
+        with self.lock:
+            assignment = self.assignments.pop(skill_path, None)
+        if assignment:
+            self.bus.wait_for_response(Message(HOST_UNLOAD, {
+                'host_id': assignment[0], 'path': skill_path}),
+                timeout=self.timeout)
+
+    def _monitor(self):
+        """ Restart hosts that exited or stopped answering. """
+        while not self._stop_event.wait(self.ping_interval):
+            for host_id, process in list(self.hosts.items()):
+                if not process.is_alive():
+                    LOG.error('Skill host {} exited with code {}'.format(
+                        host_id, process.exitcode))
+                elif self.ping(host_id) is None:
+                    LOG.error('Skill host {} is not responding'.format(
+                        host_id))
+                    process.terminate()
+                    process.join(5)
+                else:
+                    continue
+                if not self._stop_event.is_set():
+                    self.restart(host_id)
+
+    def restart(self, host_id):
+        """ Restart a host and load its skills again. """
+        self.stats.pop(host_id, None)
+        self._start_host(host_id)
+        with self.lock:
+            skills = [(path, data) for path, (assigned_host, data)
+                      in self.assignments.items() if assigned_host == host_id]
+        for path, data in skills:
+            LOG.info('Reloading {} in skill host {}'.format(path, host_id))
+            response = self.bus.wait_for_response(Message(HOST_LOAD, data),
+                                                  timeout=self.timeout)
+            if response is None or not response.data.get('loaded'):
+                LOG.error('Failed to reload ' + path)
+
+    def handle_stats(self, message):
+        """ Reply with the resource usage of the hosts and their skills. """
+        self.bus.emit(message.response({
+            'hosts': [self.stats.get(h, {'host_id': h, 'pid': p.pid})
+                      for h, p in sorted(self.hosts.items())]
+        }))
@@ -16,11 +16,13 @@ import gc
 import json
 import sys
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from glob import glob
 from itertools import chain
 
 import os
-from os.path import exists, join, basename, dirname, expanduser, isfile
+from os.path import (exists, join, basename, dirname, expanduser, isdir,
+                     isfile)
 from threading import Thread, Event
 
 from msm import MycroftSkillsManager, SkillRepo, MsmException
@@ -31,7 +33,11 @@ from mycroft.messagebus.message import Message
 from mycroft.util import connected
 from mycroft.util.log import LOG
 
-from .core import load_skill, create_skill_descriptor, MainModule
+from .core import (load_skill, create_skill_descriptor, FallbackSkill,
+                   MainModule)
+from .lazy_skill import LazySkill, RecordingBus, load_manifest, save_manifest
+from .skill_host import HostedSkill, SkillHostPool, converse_response
+from .skill_watcher import SkillWatcher
 
 
 DEBUG = Configuration.get().get("debug", False)
@@ -66,6 +72,39 @@ def _get_last_modified_date(path):
     return max(os.path.getmtime(f) for f in all_files)
 
 
+def _is_skill_named(skill_path, names):
+    """ Check if a skill directory is one of the named skills.
+
+    Skill directories are named after the skill, optionally followed by
+    the author (name.author).
+    """
+    dir_name = basename(skill_path.rstrip('/')).lower()
+    return any(dir_name == name.lower() or
+               dir_name.startswith(name.lower() + '.') for name in names)
+
+
+def _get_skill_dependencies(skill_path, skill_paths):
+    """ Skills a skill depends on, from its skill_requirements.txt.
+
+    Entries are skill names or git urls.
+
+    Args:
+        skill_path (str): skill to get the dependencies of
+        skill_paths (list): paths of the skills it can depend on
+
+    Returns:
+        set: paths of the skills depended on
+    """
+    requirements = join(skill_path, 'skill_requirements.txt')
+    if not isfile(requirements):
+        return set()
+    with open(requirements) as f:
+        names = [basename(line.strip().rstrip('/')).replace('.git', '')
+                 for line in f if line.strip()]
+    return {path for path in skill_paths
+            if path != skill_path and _is_skill_named(path, names)}
+
+
 class SkillManager(Thread):
     """ Load, update and manage instances of Skill on this system.
 
@@ -94,6 +133,10 @@ class SkillManager(Thread):
                                  self.update_interval
         else:
             self.next_download = time.time() - 1
+        self.watcher = SkillWatcher(self.msm.skills_dir)
+        self.loader_pool = ThreadPoolExecutor(
+            max_workers=skills_config.get('loader_threads', 4))
+        self.host_pool = self.create_host_pool(bus)
 
         # Conversation management
         bus.on('skill.converse.request', self.handle_converse_request)
@@ -125,6 +168,75 @@ class SkillManager(Thread):
             ), versioned=msm_config['versioned']
         )
 
+    @staticmethod
+    def create_host_pool(bus):
+        """ Create the skill host pool if running skills out of process. """
+        hosts_config = skills_config.get('skill_hosts', {})
+        if not hosts_config.get('processes'):
+            return None
+        transport = Configuration.get()['websocket'].get('transport')
+        if transport == 'local':
+            LOG.warning('Skill hosts need a messagebus service, '
+                        'running all skills in this process')
+            return None
+        return SkillHostPool(bus, hosts_config)
+
+    def _is_hosted(self, skill_path):
+        """ Check if a skill should run in a skill host. """
+        if (not self.host_pool or
+                _is_skill_named(skill_path, PRIORITY_SKILLS)):
+            return False
+        names = skills_config.get('skill_hosts', {}).get('skills')
+        return not names or _is_skill_named(skill_path, names)
+
+    def _is_lazy(self, skill_path):
+        """ Check if a skill should be loaded on its first intent match. """
+        lazy_config = skills_config.get('lazy_loading', {})
+        return (lazy_config.get('enabled', False) and
+                not self._is_hosted(skill_path) and
+                not _is_skill_named(skill_path, PRIORITY_SKILLS) and
+                not _is_skill_named(skill_path,
+                                    lazy_config.get('exclude', [])))
+
+    def _start_skill(self, skill_path, skill_id, modified):
+        """ Load a skill, in a skill host if enabled for the skill.
+
+        Skills loaded lazily are registered from their manifest, they are
+        loaded normally once to record it.
+
+        Returns:
+            the loaded skill, a HostedSkill if running in a skill host, a
+            LazySkill if not loaded yet, or None on failure
+        """
+        if self._is_hosted(skill_path):
+            data = self.host_pool.load(skill_path, skill_id,
+                                       BLACKLISTED_SKILLS)
+            if data and data['loaded']:
+                return HostedSkill(self.host_pool, skill_path, data['name'])
+            elif not (data and data['fallback']):
+                return None
+            # Fallback skills are run by this process
+
+        def load(bus=self.bus):
+            return load_skill(create_skill_descriptor(skill_path), bus,
+                              skill_id, BLACKLISTED_SKILLS)
+
+        if not self._is_lazy(skill_path):
+            return load()
+        manifest = load_manifest(skill_path, modified)
+        if manifest and not manifest['fallback']:
+            return LazySkill(self.bus, skill_id, manifest, load,
+                             skills_config['lazy_loading'].get(
+                                 'idle_timeout', 0))
+        bus = RecordingBus(self.bus)
+        instance = load(bus)
+        bus.recording = False
+        if instance:
+            save_manifest(skill_path, modified, instance.name,
+                          isinstance(instance, FallbackSkill),
+                          bus.registrations)
+        return instance
+
     @staticmethod
     def load_skills_data() -> dict:
         """Contains info on how skills should be updated"""
@@ -313,10 +425,8 @@ class SkillManager(Thread):
                                    "id": skill["id"]}))
 
         skill["loaded"] = True
-        desc = create_skill_descriptor(skill_path)
-        skill["instance"] = load_skill(desc,
-                                       self.bus, skill["id"],
-                                       BLACKLISTED_SKILLS)
+        skill["instance"] = self._start_skill(skill_path, skill["id"],
+                                              modified)
 
         skill["last_modified"] = modified
         if skill['instance'] is not None:
@@ -332,6 +442,51 @@ class SkillManager(Thread):
                                    'id': skill['id']}))
         return False
 
+    def _load_skills(self, skill_paths):
+        """ Load or reload skills on the loader threads.
+
+        Priority skills are loaded before the other skills and a skill is
+        only started once the skills listed in its skill_requirements.txt
+        are done, independent skills are loaded in parallel.
+
+        Args:
+            skill_paths (list): paths of the skills to check
+
+        Returns:
+            bool: True if any skill was loaded/reloaded
+        """
+        skill_paths = [p.rstrip('/') for p in skill_paths]
+        priority = {p for p in skill_paths
+                    if _is_skill_named(p, PRIORITY_SKILLS)}
+        dependencies = {p: _get_skill_dependencies(p, skill_paths)
+                        for p in skill_paths}
+        for skill_path in set(skill_paths) - priority:
+            dependencies[skill_path] |= priority
+        pending = list(skill_paths)
+        running = {}  # future -> skill path
+        done = set()
+        loaded = False
+        while pending or running:
+            ready = [p for p in pending if dependencies[p] <= done]
+            if not ready and not running:
+                LOG.warning('Circular skill dependencies between {}'.format(
+                    ', '.join(basename(p) for p in pending)))
+                ready = pending
+            for skill_path in ready:
+                pending.remove(skill_path)
+                future = self.loader_pool.submit(self._load_or_reload_skill,
+                                                 skill_path)
+                running[future] = skill_path
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                skill_path = running.pop(future)
+                done.add(skill_path)
+                try:
+                    loaded = future.result() or loaded
+                except Exception:
+                    LOG.exception('Failed to load ' + basename(skill_path))
+        return loaded
+
     def load_priority(self):
         skills = {skill.name: skill for skill in self.msm.list()}
         for skill_name in PRIORITY_SKILLS:
@@ -360,6 +515,9 @@ class SkillManager(Thread):
 
         # check if skill updates are enabled
         update = Configuration.get()["skills"]["auto_update"]
+        self.watcher.start()
+        if self.host_pool:
+            self.host_pool.start()
 
         # Scan the file folder that contains Skills.  If a Skill is updated,
         # unload the existing version from memory and reload from the disk.
@@ -368,16 +526,21 @@ class SkillManager(Thread):
             if time.time() >= self.next_download and update:
                 self.download_skills()
 
+            if has_loaded and self.watcher.is_watching:
+                # Only check the skills changed on disk since the last scan
+                changed = self.watcher.wait_for_changes(timeout=2)
+                self._load_skills([p for p in changed if isdir(p)])
+                if changed:
+                    self._unload_removed(
+                        glob(join(self.msm.skills_dir, '*/')))
+                continue
+
             # Look for recently changed skill(s) needing a reload
             # checking skills dir and getting all skills there
             skill_paths = glob(join(self.msm.skills_dir, '*/'))
-            still_loading = False
-            for skill_path in skill_paths:
-                still_loading = (
-                        self._load_or_reload_skill(skill_path) or
-                        still_loading
-                )
-            if not has_loaded and not still_loading and len(skill_paths) > 0:
+            self._load_skills(skill_paths)
+            if not has_loaded and len(skill_paths) > 0:
+                # All skills are loaded once _load_skills() returns
                 has_loaded = True
                 self.bus.emit(Message('mycroft.skills.initialized'))
 
@@ -441,6 +604,7 @@ class SkillManager(Thread):
         if not self.loaded_skills[skill].get('active', True):
             self.loaded_skills[skill]['loaded'] = False
             self.loaded_skills[skill]['active'] = True
+            self.watcher.mark_dirty(skill)
 
     def activate_skill(self, message):
         """ Activate a deactivated skill. """
@@ -461,6 +625,8 @@ class SkillManager(Thread):
     def stop(self):
         """ Tell the manager to shutdown """
         self._stop_event.set()
+        self.watcher.stop()
+        self.loader_pool.shutdown(wait=False)
 
         # Do a clean shutdown of all skills
         for name, skill_info in self.loaded_skills.items():
@@ -470,6 +636,8 @@ class SkillManager(Thread):
                     instance.default_shutdown()
                 except Exception:
                     LOG.exception('Shutting down skill: ' + name)
+        if self.host_pool:
+            self.host_pool.stop()
 
     def handle_converse_request(self, message):
         """ Check if the targeted skill id can handle conversation
@@ -487,18 +655,18 @@ class SkillManager(Thread):
                     self.loaded_skills[skill]["id"] == skill_id):
                 try:
                     instance = self.loaded_skills[skill]["instance"]
+                    if isinstance(instance, HostedSkill):
+                        return  # Answered by the skill host
                 except BaseException:
                     LOG.error("converse requested but skill not loaded")
-                    self.bus.emit(message.reply("skill.converse.response", {
-                        "skill_id": 0, "result": False}))
+                    self.bus.emit(converse_response(message, 0, False))
                     return
                 try:
                     result = instance.converse(utterances, lang)
-                    self.bus.emit(message.reply("skill.converse.response", {
-                        "skill_id": skill_id, "result": result}))
+                    self.bus.emit(converse_response(message, skill_id,
+                                                    result))
                     return
                 except BaseException:
                     LOG.exception(
                         "Error in converse method for skill " + str(skill_id))
-        self.bus.emit(message.reply("skill.converse.response",
-                                    {"skill_id": 0, "result": False}))
+        self.bus.emit(converse_response(message, 0, False))
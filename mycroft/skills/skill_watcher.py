@@ -0,0 +1,148 @@
+# Copyright 2018 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Detection of changed skills using file system events.
+
+Uses the watchdog package (inotify on Linux), listed in requirements.txt.
+Without it the skill manager polls the skill directories for changes
+instead.
+"""
+import os
+from os.path import join, relpath
+from threading import Condition
+from time import monotonic
+
+from mycroft.util.log import LOG
+
+try:
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+
+
+class SkillWatcher(object):
+    """ Watches the skills directory for changed skills.
+
+    File system events are collected per skill, a skill is reported as
+    changed once no events arrived for it for debounce seconds. Like the
+    polling scan, changes of compiled python files, settings.json and
+    hidden files and directories are ignored.
+
+    Args:
+        skills_dir (str): directory containing the skills
+        debounce (float): seconds without events before reporting a change
+    """
+
+    def __init__(self, skills_dir, debounce=1.0):
+        self.skills_dir = skills_dir.rstrip('/')
+        self.debounce = debounce
+        self.observer = None
+        self.dirty = {}  # skill path -> time of the last event
+        self.condition = Condition()
+
+    @property
+    def is_watching(self):
+        return self.observer is not None
+
+    def start(self):
+        """ Start watching the skills directory.
+
+        Returns:
+            bool: False if the directory can't be watched and has to be
+                  polled instead
+        """
+        if Observer is None:
+            LOG.info('watchdog not installed, polling skills for changes')
+            return False
+        observer = Observer()
+        try:
+            observer.schedule(self, self.skills_dir, recursive=True)
+            observer.start()
+        except OSError as e:
+            # ex. the inotify watch limit was reached
+            LOG.warning('Could not watch skills, polling for changes: ' +
+                        repr(e))
+            observer.stop()
+            return False
+        self.observer = observer
+        LOG.info('Watching {} for changed skills'.format(self.skills_dir))
+        return True
+
+    def stop(self):
+        if self.observer:
+            self.observer.stop()
+            self.observer.join()
+            self.observer = None
+
+    def skill_path(self, path):
+        """ Path of the skill a changed file belongs to.
+
+        Args:
+            path (str): path of the changed file or directory
+
+        Returns:
+            str: skill path, None if the change should be ignored
+        """
+        if not path:
+            return None
+        parts = relpath(path, self.skills_dir).split(os.sep)
+        name = parts[-1]
+        if (parts[0] in ('.', '..') or name.endswith('.pyc') or
+                name == 'settings.json' or '__pycache__' in parts or
+                any(part.startswith('.') for part in parts)):
+            return None
+        return join(self.skills_dir, parts[0])
+
+    def dispatch(self, event):
+        """ Handle a watchdog file system event. """
+        if event.is_directory and event.event_type == 'modified':
+            return  # Changes of the files in it are reported separately
+        for path in (event.src_path, getattr(event, 'dest_path', None)):
+            skill_path = self.skill_path(path)
+            if skill_path:
+                self.mark_dirty(skill_path)
+
+    def mark_dirty(self, skill_path):
+        """ Report a skill as changed after the debounce delay. """
+        with self.condition:
+            self.dirty[skill_path.rstrip('/')] = monotonic()
+            self.condition.notify_all()
+
+    def wait_for_changes(self, timeout):
+        """ Wait for skills to change.
+
+        Args:
+            timeout (float): max seconds to wait
+
+        Returns:
+            list: paths of the changed skills, empty on timeout
+        """
+        end = monotonic() + timeout
+        with self.condition:
+            while True:
+                now = monotonic()
+                changed = [path for path, last_event in self.dirty.items()
+                           if now - last_event >= self.debounce]
+                if changed:
+                    for path in changed:
+                        del self.dirty[path]
+                    return changed
+
+                wait = end - now
+                if wait <= 0:
+                    return []
+                if self.dirty:
+                    next_change = min(self.dirty.values()) + self.debounce
+                    wait = min(wait, next_change - now)
+                self.condition.wait(wait)
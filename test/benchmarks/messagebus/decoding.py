@@ -0,0 +1,144 @@
+# Copyright 2018 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Benchmark of message decoding on the messagebus.
+
+Compares decoding every message in full (the previous behaviour) with the
+lazy decoding of Message.deserialize(), first for the decoding alone and
+then end-to-end over a messagebus service on the loopback interface.
+
+Usage:
+    python -m test.benchmarks.messagebus.decoding [-n MESSAGES]
+"""
+import json
+import time
+from argparse import ArgumentParser
+from threading import Event, Thread
+
+from tornado import ioloop, web
+
+from mycroft.messagebus.client.ws import WebsocketClient
+from mycroft.messagebus.message import Message
+from mycroft.messagebus.service.ws import WebsocketEventHandler
+
+HOST = '127.0.0.1'
+ROUTE = '/core'
+
+SAMPLE_MESSAGES = [
+    Message('enclosure.mouth.viseme', {'code': 3, 'until': 1538.25}),
+    Message('recognizer_loop:utterance',
+            {'utterances': ['what time is it'], 'lang': 'en-us'},
+            {'ident': '1538145720.37-1'}),
+    Message('mycroft.skills.list',
+            {'skill-{}'.format(i): {'active': True, 'id': i}
+             for i in range(40)})
+]
+
+
+def decode_eager(serialized):
+    obj = json.loads(serialized)
+    return Message(obj.get('type'), obj.get('data'), obj.get('context'))
+
+
+def decode_lazy(serialized):
+    return Message.deserialize(serialized)
+
+
+def bench_decoding(num_messages):
+    """ Measure messages decoded per second when only the type is read. """
+    serialized = [m.serialize() for m in SAMPLE_MESSAGES]
+    results = {}
+    for name, decode in (('eager', decode_eager), ('lazy', decode_lazy)):
+        start = time.monotonic()
+        for i in range(num_messages):
+            decode(serialized[i % len(serialized)]).type
+        results[name] = num_messages / (time.monotonic() - start)
+    return results
+
+
+def start_service(port):
+    """ Run a messagebus service in a background thread. """
+    started = Event()
+
+    def run():
+        loop = ioloop.IOLoop()
+        loop.make_current()
+        web.Application([(ROUTE, WebsocketEventHandler)]).listen(port, HOST)
+        loop.add_callback(started.set)
+        loop.start()
+
+    Thread(target=run, daemon=True).start()
+    started.wait()
+
+
+def connect_client(port, codec=None):
+    client = WebsocketClient(HOST, port, ROUTE, False, codec)
+    Thread(target=client.run_forever, daemon=True).start()
+    client.connected_event.wait(5)
+    return client
+
+
+def bench_loopback(num_messages, port, read_data):
+    """ Measure end-to-end messages per second through the service.
+
+    Args:
+        num_messages (int): number of messages to send
+        port (int): port of the running messagebus service
+        read_data (bool): access the message data in the handler, forcing
+                          a full decode of every message
+    """
+    publisher = connect_client(port)
+    subscriber = connect_client(port)
+    done = Event()
+    received = [0]
+
+    def handler(message):
+        if read_data:
+            message.data
+        received[0] += 1
+        if received[0] == num_messages:
+            done.set()
+
+    subscriber.on('bench.message', handler)
+    payload = SAMPLE_MESSAGES[-1].data
+    start = time.monotonic()
+    for _ in range(num_messages):
+        publisher.emit(Message('bench.message', payload))
+    done.wait(60)
+    elapsed = time.monotonic() - start
+
+    publisher.close()
+    subscriber.close()
+    return received[0] / elapsed
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-n', '--messages', type=int, default=10000,
+                        help='number of messages per measurement')
+    parser.add_argument('-p', '--port', type=int, default=18181,
+                        help='port for the loopback messagebus service')
+    args = parser.parse_args()
+
+    for name, rate in sorted(bench_decoding(args.messages * 10).items()):
+        print('decode ({}): {:.0f} msgs/sec'.format(name, rate))
+
+    start_service(args.port)
+    for name, read_data in (('eager', True), ('lazy', False)):
+        rate = bench_loopback(args.messages, args.port, read_data)
+        print('loopback ({}): {:.0f} msgs/sec'.format(name, rate))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,340 @@
+# Copyright 2018 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Throughput and latency benchmark of the messagebus.
+
+Starts a messagebus service, publisher and subscriber clients each in
+their own process. Publishers send messages round robin over a number of
+message types, each type is subscribed to by FANOUT subscribers. Reports
+delivered messages per second, end-to-end latency percentiles and the CPU
+time and RSS of every process, and optionally saves the results as json
+to track regressions over time.
+
+Usage:
+    python -m test.benchmarks.messagebus.throughput [-P PUBLISHERS]
+        [-S SUBSCRIBERS] [-f FANOUT] [-n MESSAGES] [-s PAYLOAD] [-r RATE]
+        [-c CODEC] [-o OUTPUT]
+"""
+import json
+import math
+import platform
+import sys
+import time
+from argparse import ArgumentParser
+from multiprocessing import Event, Process, Queue
+from queue import Empty
+from threading import Event as ThreadEvent
+
+import psutil
+from tornado import ioloop, web
+
+from mycroft.configuration import Configuration
+from mycroft.messagebus.message import Message
+from mycroft.messagebus.router import STATS
+from mycroft.messagebus.service.ws import WebsocketEventHandler
+from test.benchmarks.messagebus.decoding import HOST, ROUTE, connect_client
+
+MSG_TYPE = 'bench.{}'
+
+
+def serve(port):
+    """ Run a messagebus service, target of the service process. """
+    loop = ioloop.IOLoop()
+    loop.make_current()
+    outbound = Configuration.get().get('websocket', {}).get('outbound')
+    web.Application([
+        (ROUTE, WebsocketEventHandler, {'outbound': outbound})
+    ]).listen(port, HOST)
+    loop.start()
+
+
+def wait_for_service(port, timeout=10):
+    """ Wait until the service accepts connections. """
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if any(c.laddr.port == port and c.status == psutil.CONN_LISTEN
+               for c in psutil.net_connections('tcp')):
+            return
+        time.sleep(0.1)
+    raise RuntimeError('Messagebus service did not start')
+
+
+def subscribe(client, message_types):
+    """ Subscribe and wait until the service has applied the subscription.
+
+    The service handles messages of a connection in order, so once the
+    stats request is answered the subscription is in place.
+    """
+    client.subscribe(message_types + [STATS + '.response'])
+    if client.wait_for_response(Message(STATS), timeout=10) is None:
+        raise RuntimeError('No response from the messagebus service')
+
+
+def process_usage(process, start_cpu):
+    """ CPU time since start_cpu and current RSS of a process. """
+    cpu = process.cpu_times()
+    return {
+        'cpu_seconds': (cpu.user + cpu.system) - start_cpu,
+        'rss_mb': process.memory_info().rss / 1024 ** 2
+    }
+
+
+def cpu_seconds(process):
+    cpu = process.cpu_times()
+    return cpu.user + cpu.system
+
+
+def publish(index, port, args, ready, go, finish, results):
+    """ Publisher process, sends args.messages messages. """
+    client = connect_client(port, args.codec)
+    subscribe(client, [])
+    payload = 'x' * args.payload
+    num_types = message_types(args)
+    process = psutil.Process()
+    ready.put(index)
+    go.wait()
+
+    start_cpu = cpu_seconds(process)
+    start = time.time()
+    for i in range(args.messages):
+        if args.rate:
+            delay = start + i / args.rate - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        client.emit(Message(MSG_TYPE.format(i % num_types),
+                            {'sent': time.time(), 'payload': payload}))
+    end = time.time()
+
+    results.put(('publisher-{}'.format(index), {
+        'start': start,
+        'end': end,
+        'usage': process_usage(process, start_cpu)
+    }))
+    finish.wait(30)  # Keep the connection for the final stats
+    client.close()
+
+
+def receive(index, port, args, ready, go, finish, results):
+    """ Subscriber process, receives the messages of one message type. """
+    client = connect_client(port, args.codec)
+    msg_type = index % message_types(args)
+    expected = expected_messages(args, msg_type)
+    latencies = []
+    last_arrival = [time.time()]
+    done = ThreadEvent()
+
+    def handler(message):
+        last_arrival[0] = time.time()
+        latencies.append(last_arrival[0] - message.data['sent'])
+        if len(latencies) >= expected:
+            done.set()
+
+    client.on(MSG_TYPE.format(msg_type), handler)
+    subscribe(client, [MSG_TYPE.format(msg_type)])
+    process = psutil.Process()
+    ready.put(index)
+    go.wait()
+
+    start_cpu = cpu_seconds(process)
+    end = time.monotonic() + args.timeout
+    received, last_received = 0, time.monotonic()
+    while not done.wait(0.5) and time.monotonic() < end:
+        # Stop early when messages stop arriving, the rest were dropped
+        if len(latencies) != received:
+            received, last_received = len(latencies), time.monotonic()
+        elif time.monotonic() - last_received > args.idle:
+            break
+    results.put(('subscriber-{}'.format(index), {
+        'end': last_arrival[0],
+        'expected': expected,
+        'latencies': latencies,
+        'dropped': client.dispatcher.stats()['normal']['dropped'],
+        'usage': process_usage(process, start_cpu)
+    }))
+    finish.wait(30)  # Keep the connection for the final stats
+    client.close()
+
+
+def message_types(args):
+    """ Number of message types so each has args.fanout subscribers. """
+    return max(1, math.ceil(args.subscribers / args.fanout))
+
+
+def expected_messages(args, msg_type):
+    """ Number of messages of a type sent by all publishers. """
+    num_types = message_types(args)
+    per_publisher = (args.messages // num_types +
+                     (1 if msg_type < args.messages % num_types else 0))
+    return per_publisher * args.publishers
+
+
+def percentile(values, p):
+    """ Nearest rank percentile of sorted values. """
+    if not values:
+        return None
+    rank = max(0, math.ceil(p / 100 * len(values)) - 1)
+    return values[rank]
+
+
+def run(args):
+    """ Run the benchmark.
+
+    Returns:
+        dict: the benchmark results
+    """
+    service = Process(target=serve, args=(args.port,), daemon=True)
+    service.start()
+    wait_for_service(args.port)
+    service_process = psutil.Process(service.pid)
+
+    ready, results, go, finish = Queue(), Queue(), Event(), Event()
+    workers = [
+        Process(target=receive, daemon=True,
+                args=(i, args.port, args, ready, go, finish, results))
+        for i in range(args.subscribers)
+    ]
+    workers += [
+        Process(target=publish, daemon=True,
+                args=(i, args.port, args, ready, go, finish, results))
+        for i in range(args.publishers)
+    ]
+    for worker in workers:
+        worker.start()
+    for _ in workers:
+        ready.get(timeout=30)
+    monitor = connect_client(args.port)
+    subscribe(monitor, [])
+
+    service_cpu = cpu_seconds(service_process)
+    go.set()
+    reports = {}
+    try:
+        for _ in workers:
+            name, report = results.get(timeout=args.timeout + 30)
+            reports[name] = report
+    except Empty:
+        print('Timed out waiting for benchmark processes', file=sys.stderr)
+    usage = {'service': process_usage(service_process, service_cpu)}
+    stats = monitor.wait_for_response(Message(STATS), timeout=10)
+    service_dropped = sum(c['dropped'] for c in
+                          stats.data['connections']) if stats else None
+    monitor.close()
+
+    finish.set()
+    for worker in workers:
+        worker.join(5)
+        if worker.is_alive():
+            worker.terminate()
+    service.terminate()
+
+    publishers = [r for n, r in reports.items() if n.startswith('publisher')]
+    subscribers = [r for n, r in reports.items()
+                   if n.startswith('subscriber')]
+    latencies = sorted(l for r in subscribers for l in r['latencies'])
+    delivered = len(latencies)
+    start = min((r['start'] for r in publishers), default=0)
+    end = max((r['end'] for r in subscribers), default=start)
+    elapsed = max(end - start, 1e-9)
+    for name, report in sorted(reports.items()):
+        usage[name] = report['usage']
+    for name in usage:
+        usage[name]['cpu_percent'] = 100 * usage[name]['cpu_seconds'] / \
+            elapsed
+
+    def ms(value):
+        return None if value is None else value * 1000
+
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'parameters': {
+            'publishers': args.publishers,
+            'subscribers': args.subscribers,
+            'fanout': args.fanout,
+            'messages': args.messages,
+            'payload': args.payload,
+            'rate': args.rate,
+            'codec': args.codec
+        },
+        'sent': args.messages * args.publishers,
+        'expected': sum(r['expected'] for r in subscribers),
+        'delivered': delivered,
+        'dropped': {
+            'service': service_dropped,
+            'clients': sum(r['dropped'] for r in subscribers)
+        },
+        'elapsed': elapsed,
+        'msgs_per_sec': delivered / elapsed,
+        'latency_ms': {
+            'p50': ms(percentile(latencies, 50)),
+            'p99': ms(percentile(latencies, 99)),
+            'max': ms(latencies[-1] if latencies else None),
+            'mean': ms(sum(latencies) / delivered if delivered else None)
+        },
+        'processes': usage
+    }
+
+
+def print_results(results):
+    latency = results['latency_ms']
+    print('delivered {delivered}/{expected} messages in {elapsed:.2f}s, '
+          '{msgs_per_sec:.0f} msgs/sec'.format(**results))
+    print('dropped by service: {service}, by clients: {clients}'.format(
+        **results['dropped']))
+    if results['delivered']:
+        print('latency p50 {p50:.2f} ms, p99 {p99:.2f} ms, '
+              'max {max:.2f} ms'.format(**latency))
+    for name, usage in sorted(results['processes'].items()):
+        print('{:<16} cpu {:6.2f}s {:5.0f}%  rss {:6.1f} MB'.format(
+            name, usage['cpu_seconds'], usage['cpu_percent'],
+            usage['rss_mb']))
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-P', '--publishers', type=int, default=1,
+                        help='number of publisher processes')
+    parser.add_argument('-S', '--subscribers', type=int, default=1,
+                        help='number of subscriber processes')
+    parser.add_argument('-f', '--fanout', type=int, default=1,
+                        help='number of subscribers receiving each message')
+    parser.add_argument('-n', '--messages', type=int, default=10000,
+                        help='number of messages sent by each publisher')
+    parser.add_argument('-s', '--payload', type=int, default=100,
+                        help='payload size of each message in bytes')
+    parser.add_argument('-r', '--rate', type=float, default=0,
+                        help='messages per second sent by each publisher, '
+                             '0 to send as fast as possible')
+    parser.add_argument('-c', '--codec', default='json',
+                        help='messagebus codec used by the clients')
+    parser.add_argument('-p', '--port', type=int, default=18182,
+                        help='port for the messagebus service')
+    parser.add_argument('-t', '--timeout', type=float, default=120,
+                        help='seconds to wait for the messages to arrive')
+    parser.add_argument('-i', '--idle', type=float, default=5,
+                        help='seconds without messages before a subscriber '
+                             'gives up on the remaining messages')
+    parser.add_argument('-o', '--output', help='save the results as json')
+    args = parser.parse_args()
+    args.fanout = max(1, min(args.fanout, args.subscribers))
+
+    results = run(args)
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+# Copyright 2018 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Benchmark of Adapt and Padatious intent matching latency.
+
+Matches utterances with the Adapt engine of an IntentService and a CPU
+bound stand-in for Padatious inference, comparing
+  sequential  both engines one after the other
+  threads     Padatious on a thread pool while Adapt runs
+  process     Padatious in a worker process while Adapt runs
+  service     IntentService._intent_match(), Padatious in a worker process
+              like PadatiousService.start_calc_intent() and not waited for
+              after a perfect Adapt match
+Once for utterances of which half are perfect Adapt matches and once
+without perfect matches. The intent cache is disabled so every utterance
+is matched.
+
+Usage:
+    python -m test.benchmarks.skills.intent_matching [-n UTTERANCES]
+        [-p PADATIOUS_MS]
+"""
+import multiprocessing
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from adapt.intent import IntentBuilder
+from mock import MagicMock, patch
+
+from mycroft.messagebus.message import Message
+from mycroft.skills.intent_service import IntentService
+from mycroft.util.parse import normalize
+
+MIXED = ['what is the weather', 'tell me a joke about cats',
+         'weather in london', 'play some relaxing music']
+NO_PERFECT = ['tell me a joke about cats', 'play some relaxing music']
+
+
+def busy(iterations):
+    """ Keep the CPU busy in python code, holding the GIL. """
+    total = 0
+    for i in range(iterations):
+        total += i * i
+    return total
+
+
+def calibrate(seconds):
+    """ Number of busy() iterations taking about the given time. """
+    iterations = 100000
+    start = time.perf_counter()
+    busy(iterations)
+    return int(iterations * seconds / (time.perf_counter() - start))
+
+
+def calc_intent(iterations, utterance):
+    """ Padatious stand-in, the confidence is below any Adapt match. """
+    busy(iterations)
+    return 0.2
+
+
+def create_service(padatious_seconds, pool):
+    """ IntentService with a weather intent and a fake Padatious. """
+    bus = MagicMock()
+    bus.wait_for_response.return_value = None
+    service = IntentService(bus)
+    service.intent_cache.max_size = 0
+    service.handle_register_vocab(Message('register_vocab', {
+        'start': 'weather', 'end': 'WeatherKeyword'}))
+    service.handle_register_intent(Message('register_intent', IntentBuilder(
+        'weather:WeatherIntent').require('WeatherKeyword').build().__dict__))
+
+    padatious = MagicMock()
+    iterations = calibrate(padatious_seconds)
+    padatious.calc_intent = partial(calc_intent, iterations)
+
+    def start_calc_intent(utterance):
+        result = pool.apply_async(calc_intent, (iterations, utterance))
+        return lambda: MagicMock(conf=result.get())
+    padatious.start_calc_intent = start_calc_intent
+    return service, padatious
+
+
+def is_perfect(service, utterance):
+    normalized = [normalize(utterance, 'en-us')]
+    intent, _ = service._adapt_determine_intent([utterance], normalized)
+    return intent and intent.get('confidence', 0.0) >= 1.0
+
+
+def match_sequential(service, padatious, executor, pool, utterance):
+    is_perfect(service, utterance)
+    padatious.calc_intent(utterance)
+
+
+def match_threads(service, padatious, executor, pool, utterance):
+    future = executor.submit(padatious.calc_intent, utterance)
+    if is_perfect(service, utterance):
+        future.cancel()
+    else:
+        future.result()
+
+
+def match_process(service, padatious, executor, pool, utterance):
+    result = padatious.start_calc_intent(utterance)
+    if not is_perfect(service, utterance):
+        result()
+
+
+def match_service(service, padatious, executor, pool, utterance):
+    service._intent_match([utterance], 'en-us', {})
+
+
+def bench(utterances, num_utterances, padatious_seconds):
+    """ Measure the mean latency of each strategy in milliseconds. """
+    # Spawned like the PadatiousService matcher process
+    pool = multiprocessing.get_context('spawn').Pool(1)
+    service, padatious = create_service(padatious_seconds, pool)
+    executor = ThreadPoolExecutor(max_workers=2)
+    pool.apply(busy, (1,))  # Wait for the worker to start
+    results = {}
+    with patch('mycroft.skills.intent_service.PadatiousService') as ps:
+        ps.instance = padatious
+        for name, match in (('sequential', match_sequential),
+                            ('threads', match_threads),
+                            ('process', match_process),
+                            ('service', match_service)):
+            start = time.monotonic()
+            for i in range(num_utterances):
+                match(service, padatious, executor, pool,
+                      utterances[i % len(utterances)])
+            results[name] = (time.monotonic() - start) / num_utterances
+    executor.shutdown()
+    pool.terminate()
+    return {name: latency * 1000 for name, latency in results.items()}
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-n', '--utterances', type=int, default=400,
+                        help='number of utterances per strategy')
+    parser.add_argument('-p', '--padatious-ms', type=float, default=10,
+                        help='CPU time of a Padatious match')
+    args = parser.parse_args()
+    for scenario, utterances in (('mixed', MIXED),
+                                 ('no perfect match', NO_PERFECT)):
+        results = bench(utterances, args.utterances, args.padatious_ms / 1000)
+        for name in ('sequential', 'threads', 'process', 'service'):
+            print('{} ({}): {:.2f} ms per utterance'.format(
+                name, scenario, results[name]))
+
+
+if __name__ == '__main__':
+    main()
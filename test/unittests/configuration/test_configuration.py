@@ -1,4 +1,7 @@
 import mock
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
 from unittest import TestCase
 import mycroft.configuration
 
@@ -52,7 +55,11 @@ class TestConfiguration(TestCase):
         self.assertEquals(lc['has_towel'], True)
 
         # test store
-        lc.store('test_conf.json')
+        tmp_dir = mkdtemp()
+        try:
+            lc.store(join(tmp_dir, 'test_conf.json'))
+        finally:
+            rmtree(tmp_dir)
         self.assertEquals(mock_json_dump.call_args[0][0], lc)
         # exists but is not file
         mock_isfile.return_value = False
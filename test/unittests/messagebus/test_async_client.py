@@ -0,0 +1,158 @@
+# Copyright 2018 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import asyncio
+import unittest
+from threading import Event, Thread
+
+from mock import MagicMock
+from tornado import ioloop, web
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_sockets
+
+from mycroft.messagebus.client.async_ws import AsyncWebsocketClient
+from mycroft.messagebus.message import Message
+from mycroft.messagebus.router import SUBSCRIBE, UNSUBSCRIBE
+from mycroft.messagebus.service.ws import WebsocketEventHandler
+
+
+class TestAsyncWebsocketClient(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.client = AsyncWebsocketClient('127.0.0.1', 8181, '/core',
+                                           False, loop=self.loop)
+        self.client.connection = MagicMock()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_dispatch(self):
+        handled = []
+
+        async def coroutine_handler(message):
+            handled.append(('coroutine', message.data['n']))
+
+        def sync_handler(message):
+            handled.append(('sync', message.data['n']))
+
+        self.client.on('test', coroutine_handler)
+        self.client.once('test', sync_handler)
+
+        async def receive():
+            for i in range(2):
+                self.client.on_message(Message('test', {'n': i}).serialize())
+            await asyncio.sleep(0.1)
+
+        self.loop.run_until_complete(receive())
+        self.assertEqual(sorted(handled),
+                         [('coroutine', 0), ('coroutine', 1), ('sync', 0)])
+
+    def test_wait_for_response(self):
+        def write_message(frame, binary):
+            request = Message.deserialize(frame)
+            self.client.on_message(request.response().serialize())
+
+        self.client.connection.write_message.side_effect = write_message
+
+        async def request():
+            self.client.connected_event.set()
+            return await self.client.wait_for_response(Message('test'),
+                                                       timeout=1)
+        response = self.loop.run_until_complete(request())
+        self.assertEqual(response.type, 'test.response')
+
+    def test_reply_subscription_removed(self):
+        sent = []
+
+        def write_message(frame, binary):
+            request = Message.deserialize(frame)
+            sent.append((request.type, request.data.get('types')))
+            if request.type == 'test':
+                self.client.on_message(request.response().serialize())
+
+        self.client.connection.write_message.side_effect = write_message
+
+        async def request():
+            self.client.connected_event.set()
+            self.client.subscribe(['other'])
+            response = await self.client.wait_for_response(Message('test'),
+                                                           timeout=1)
+            await asyncio.sleep(0)  # Let the unsubscription be sent
+            return response
+        self.assertIsNotNone(self.loop.run_until_complete(request()))
+        self.assertEqual(sent, [(SUBSCRIBE, ['other']),
+                                (SUBSCRIBE, ['test.response']),
+                                ('test', None),
+                                (UNSUBSCRIBE, ['test.response'])])
+        self.assertEqual(self.client.subscriptions, {'other'})
+
+    def test_event_created_in_loop(self):
+        """ The connected event belongs to the loop of the client. """
+        default_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(default_loop)
+        self.addCleanup(default_loop.close)
+        self.addCleanup(asyncio.set_event_loop, None)
+        self.assertIsNone(self.client._connected_event)
+
+        async def wait_connected():
+            self.client.connected_event.set()
+            await self.client.connected_event.wait()
+        self.loop.run_until_complete(
+            asyncio.wait_for(wait_connected(), timeout=1))
+
+
+class TestAsyncConnection(unittest.TestCase):
+    """ Client connected to a messagebus service running in a thread. """
+    def setUp(self):
+        sockets = bind_sockets(0, '127.0.0.1')
+        self.port = sockets[0].getsockname()[1]
+        started = Event()
+
+        def run_service():
+            self.service_loop = ioloop.IOLoop()
+            self.service_loop.make_current()
+            server = HTTPServer(web.Application([
+                ('/core', WebsocketEventHandler)
+            ]))
+            server.add_sockets(sockets)
+            self.service_loop.add_callback(started.set)
+            self.service_loop.start()
+
+        Thread(target=run_service, daemon=True).start()
+        started.wait(5)
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.service_loop.add_callback(self.service_loop.stop)
+        self.loop.close()
+
+    def test_request_before_connected(self):
+        client = AsyncWebsocketClient('127.0.0.1', self.port, '/core',
+                                      False, loop=self.loop)
+        client.on('question', lambda message: client.emit(
+            message.response({'answer': 42})))
+
+        async def ask():
+            # Sent when the connection is up
+            future = client.request(Message('question'))
+            running = self.loop.create_task(client.run_forever())
+            try:
+                return await asyncio.wait_for(future, 5)
+            finally:
+                client.close()
+                await asyncio.wait_for(running, 5)
+
+        response = self.loop.run_until_complete(ask())
+        self.assertEqual(response.data, {'answer': 42})
+        client.executor.shutdown()
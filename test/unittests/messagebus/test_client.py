@@ -0,0 +1,192 @@
+# Copyright 2018 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import json
+import time
+import unittest
+from concurrent.futures import Future
+from threading import Barrier, Thread, Timer
+
+from mock import MagicMock, patch
+
+from mycroft.messagebus.client.ws import WebsocketClient
+from mycroft.messagebus.message import Message
+from mycroft.messagebus.router import SUBSCRIBE, UNSUBSCRIBE
+
+
+def create_client():
+    """ Create a client with a mocked connection. """
+    client = WebsocketClient('127.0.0.1', 8181, '/core', False)
+    client.client = MagicMock()
+    client.connected_event.set()
+    return client
+
+
+def sent_message(client, index=-1):
+    """ Decode a message sent by the client. """
+    return Message.deserialize(client.client.send.call_args_list[index][0][0])
+
+
+class SlowFuture(Future):
+    """ Future letting other threads run before it is resolved. """
+    def set_running_or_notify_cancel(self):
+        time.sleep(0.01)
+        return super(SlowFuture, self).set_running_or_notify_cancel()
+
+
+class TestWaitForResponse(unittest.TestCase):
+    def test_response(self):
+        client = create_client()
+
+        def respond():
+            request = sent_message(client)
+            client.on_message(None, request.response({'a': 1}).serialize())
+
+        Timer(0.05, respond).start()
+        response = client.wait_for_response(Message('test'), timeout=2)
+        self.assertEqual(response.type, 'test.response')
+        self.assertEqual(response.data, {'a': 1})
+        self.assertEqual(client._pending, {})
+
+    def test_timeout(self):
+        client = create_client()
+        self.assertIsNone(client.wait_for_response(Message('test'),
+                                                   timeout=0.1))
+        self.assertEqual(client._pending, {})
+
+    def test_concurrent_requests(self):
+        client = create_client()
+        first = client.request(Message('test', {'n': 1}))
+        second = client.request(Message('test', {'n': 2}))
+        # Answer the second request first
+        for index in (1, 0):
+            request = sent_message(client, index)
+            client.on_message(None, request.response(request.data)
+                              .serialize())
+
+        self.assertEqual(first.result(1).data, {'n': 1})
+        self.assertEqual(second.result(1).data, {'n': 2})
+
+    def test_request_copies_message(self):
+        client = create_client()
+        message = Message('test', {'n': 1}, {'source': 'a'})
+        client.request(message)
+        self.assertEqual(message.context, {'source': 'a'})
+        sent = sent_message(client, 0)
+        self.assertEqual(sent.context['source'], 'a')
+        self.assertIn('request_id', sent.context)
+
+    def test_response_for_other_client(self):
+        client = create_client()
+        future = client.request(Message('test'))
+        other = json.dumps({'type': 'test.response', 'data': {},
+                            'context': {'request_id': 'other'}})
+        client.on_message(None, other)
+        self.assertFalse(future.done())
+
+        # Responses without request id are accepted by all requests
+        client.on_message(None, Message('test.response').serialize())
+        self.assertTrue(future.done())
+
+    def test_concurrent_resolution(self):
+        client = create_client()
+        errors = []
+
+        def deliver(barrier, message):
+            barrier.wait()
+            try:
+                client._resolve_pending(message)
+            except Exception as e:
+                errors.append(e)
+
+        # Several threads delivering the same response, like LocalClients
+        # receiving on the threads of the senders
+        for _ in range(5):
+            with patch('mycroft.messagebus.client.ws.Future', SlowFuture):
+                future = client.request(Message('test'))
+            response = sent_message(client).response()
+            barrier = Barrier(4)
+            threads = [Thread(target=deliver, args=(barrier, response))
+                       for _ in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            self.assertIs(future.result(1), response)
+        self.assertEqual(errors, [])
+        self.assertEqual(client._pending, {})
+
+
+def sent_types(client):
+    """ Types and data of the subscription messages sent by the client. """
+    sent = [sent_message(client, i)
+            for i in range(len(client.client.send.call_args_list))]
+    return [(m.type, m.data.get('types')) for m in sent
+            if m.type in (SUBSCRIBE, UNSUBSCRIBE)]
+
+
+class TestReplySubscriptions(unittest.TestCase):
+    def respond(self, client, index):
+        request = sent_message(client, index)
+        client.on_message(None, request.response().serialize())
+
+    def test_unsubscribed_after_last_request(self):
+        client = create_client()
+        client.subscribe(['other'])
+        first = client.request(Message('test'))
+        second = client.request(Message('test'))
+        self.assertEqual(sent_types(client), [(SUBSCRIBE, ['other']),
+                                              (SUBSCRIBE, ['test.response'])])
+        self.assertEqual(client.subscriptions, {'other', 'test.response'})
+
+        self.respond(client, 2)
+        self.assertTrue(first.done())
+        self.assertEqual(len(sent_types(client)), 2)
+        self.respond(client, 3)
+        self.assertTrue(second.done())
+        self.assertEqual(sent_types(client)[-1],
+                         (UNSUBSCRIBE, ['test.response']))
+        self.assertEqual(client.subscriptions, {'other'})
+        self.assertEqual(client._reply_subscriptions, {})
+
+    def test_unsubscribed_after_timeout(self):
+        client = create_client()
+        client.subscribe(['other'])
+        self.assertIsNone(client.wait_for_response(Message('test'),
+                                                   timeout=0.1))
+        self.assertEqual(sent_types(client)[-1],
+                         (UNSUBSCRIBE, ['test.response']))
+        self.assertEqual(client.subscriptions, {'other'})
+
+    def test_covered_by_subscription(self):
+        client = create_client()
+        client.subscribe(['test.*'])
+        client.request(Message('test'))
+        client.request(Message('test'), 'test.done')
+        self.assertEqual(sent_types(client), [(SUBSCRIBE, ['test.*'])])
+
+    def test_no_subscriptions(self):
+        client = create_client()
+        client.request(Message('test'))
+        self.assertEqual(sent_types(client), [])
+
+    def test_user_subscription_kept(self):
+        client = create_client()
+        client.subscribe(['other'])
+        client.request(Message('test'))
+        client.subscribe(['test.response'])
+        self.respond(client, 1)
+        self.assertEqual(sent_types(client)[-1],
+                         (SUBSCRIBE, ['test.response']))
+        self.assertIn('test.response', client.subscriptions)
@@ -0,0 +1,36 @@
+# Copyright 2018 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+
+from mycroft.messagebus.codec import CODECS, JsonCodec, get_codec
+from mycroft.messagebus.message import Message
+
+
+class TestCodec(unittest.TestCase):
+    def test_get_codec(self):
+        self.assertEqual(get_codec(None), JsonCodec)
+        self.assertEqual(get_codec('json'), JsonCodec)
+        self.assertEqual(get_codec('not-a-codec'), JsonCodec)
+
+    def test_round_trip(self):
+        message = Message('mycroft.skills.list', {'skill-a': {'id': 1}},
+                          {'target': 'cli'})
+        for codec in CODECS.values():
+            encoded = message.serialize(codec)
+            self.assertIsInstance(encoded, bytes if codec.binary else str)
+            decoded = Message.deserialize(encoded, codec)
+            self.assertEqual(decoded.type, message.type)
+            self.assertEqual(decoded.data, message.data)
+            self.assertEqual(decoded.context, message.context)
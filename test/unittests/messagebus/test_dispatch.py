@@ -0,0 +1,138 @@
+# Copyright 2018 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import time
+import unittest
+from threading import Event, Lock
+
+from mock import patch
+
+from mycroft.messagebus.client.dispatch import (DispatchLane,
+                                                MessageDispatcher,
+                                                DROP_NEWEST, DROP_OLDEST)
+
+
+class BlockingHandler(object):
+    """ Handler blocking on 'slow' messages until released. """
+    def __init__(self):
+        self.release = Event()
+        self.handled = []
+        self.lock = Lock()
+
+    def __call__(self, msg_type, message):
+        if msg_type == 'slow':
+            self.release.wait(5)
+        with self.lock:
+            self.handled.append(message)
+
+
+def wait_for(condition, timeout=5):
+    """ Wait until condition() is True. """
+    end = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end:
+        time.sleep(0.01)
+
+
+class TestDispatch(unittest.TestCase):
+    def test_priority_lane(self):
+        handler = BlockingHandler()
+        stopped = Event()
+
+        def handle(msg_type, message):
+            if msg_type == 'mycroft.stop':
+                stopped.set()
+            handler(msg_type, message)
+
+        dispatcher = MessageDispatcher(handle, {'workers': 1})
+        dispatcher.dispatch('slow', 1)
+        dispatcher.dispatch('mycroft.stop', 2)
+        self.assertTrue(stopped.wait(2))
+        handler.release.set()
+
+    def test_drop_oldest(self):
+        handler = BlockingHandler()
+        lane = DispatchLane('test', handler, 1, max_queue=2,
+                            overflow=DROP_OLDEST)
+        lane.put('slow', 0)
+        # Wait for the worker to pick up the slow message
+        wait_for(lambda: lane.stats()['queued'] == 0)
+        for i in range(1, 5):
+            lane.put('fast', i)
+        self.assertEqual(lane.stats()['dropped'], 2)
+        self.assertEqual(lane.stats()['dropped_types'], {'fast': 2})
+        handler.release.set()
+        wait_for(lambda: lane.stats()['handled'] >= 3)
+        self.assertEqual(handler.handled, [0, 3, 4])
+
+    def test_put_never_blocks(self):
+        handler = BlockingHandler()
+        # The removed blocking policy falls back to dropping
+        lane = DispatchLane('test', handler, 1, max_queue=1,
+                            overflow='block')
+        self.assertEqual(lane.overflow, DROP_OLDEST)
+        lane.put('slow', 0)
+        wait_for(lambda: lane.stats()['queued'] == 0)
+        start = time.monotonic()
+        for i in range(1, 100):
+            lane.put('fast', i)
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(lane.stats()['dropped'], 98)
+        handler.release.set()
+
+    @patch('mycroft.messagebus.client.dispatch.LOG')
+    def test_drop_logging(self, mock_log):
+        handler = BlockingHandler()
+        lane = DispatchLane('test', handler, 1, max_queue=1,
+                            overflow=DROP_NEWEST)
+        lane.put('slow', 0)
+        wait_for(lambda: lane.stats()['queued'] == 0)
+        for i in range(1, 12):
+            lane.put('fast', i)
+        # Drops are summarized instead of logged one by one
+        self.assertEqual(mock_log.warning.call_count, 1)
+        with patch('mycroft.messagebus.client.dispatch.time.monotonic',
+                   return_value=time.monotonic() + 60):
+            lane.put('fast', 12)
+        self.assertEqual(mock_log.warning.call_count, 2)
+        self.assertIn('dropped 10 message(s)',
+                      mock_log.warning.call_args[0][0])
+        self.assertEqual(lane.stats()['dropped'], 11)
+        handler.release.set()
+
+    def test_drop_newest(self):
+        handler = BlockingHandler()
+        lane = DispatchLane('test', handler, 1, max_queue=2,
+                            overflow=DROP_NEWEST)
+        lane.put('slow', 0)
+        wait_for(lambda: lane.stats()['queued'] == 0)
+        for i in range(1, 5):
+            lane.put('fast', i)
+        handler.release.set()
+        wait_for(lambda: lane.stats()['handled'] >= 3)
+        self.assertEqual(handler.handled, [0, 1, 2])
+        self.assertEqual(lane.stats()['max_queued'], 2)
+
+    def test_type_limit(self):
+        handler = BlockingHandler()
+        lane = DispatchLane('test', handler, 3, type_limits={'slow': 1})
+        lane.put('slow', 0)
+        lane.put('slow', 1)
+        lane.put('fast', 2)
+        wait_for(lambda: lane.stats()['handled'] >= 1)
+        # The second slow message waits for the first one
+        self.assertEqual(handler.handled, [2])
+        self.assertEqual(lane.stats()['queued'], 1)
+        handler.release.set()
+        wait_for(lambda: lane.stats()['handled'] >= 3)
+        self.assertEqual(handler.handled, [2, 0, 1])
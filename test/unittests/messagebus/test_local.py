@@ -0,0 +1,107 @@
+# Copyright 2018 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+from threading import Event, Thread
+
+from mock import patch
+
+from mycroft.messagebus.client import create_client
+from mycroft.messagebus.client.local import LocalBus, LocalClient
+from mycroft.messagebus.message import Message
+
+
+class TestLocalClient(unittest.TestCase):
+    def setUp(self):
+        self.bus = LocalBus()
+        self.clients = [self.connect() for _ in range(2)]
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+
+    def connect(self):
+        client = LocalClient(self.bus)
+        Thread(target=client.run_forever, daemon=True).start()
+        client.connected_event.wait(5)
+        return client
+
+    def test_emit(self):
+        received = []
+        done = Event()
+
+        def handler(message):
+            received.append(message)
+            done.set()
+
+        self.clients[1].on('test', handler)
+        message = Message('test', {'number': 1})
+        self.clients[0].emit(message)
+        self.assertTrue(done.wait(5))
+        self.assertEqual(received[0].data, {'number': 1})
+        # Receivers get their own copy of the message
+        self.assertIsNot(received[0], message)
+
+    def test_subscribe(self):
+        received = []
+        done = Event()
+
+        def handler(message):
+            received.append(message.type)
+            done.set()
+
+        receiver = self.clients[1]
+        receiver.on('test.ignored', handler)
+        receiver.on('test.received', handler)
+        receiver.subscribe(['test.rec*'])
+        self.clients[0].emit(Message('test.ignored'))
+        self.clients[0].emit(Message('test.received'))
+        self.assertTrue(done.wait(5))
+        self.assertEqual(received, ['test.received'])
+
+    def test_wait_for_response(self):
+        def respond(message):
+            self.clients[1].emit(message.response({'answer': 42}))
+
+        self.clients[1].on('question', respond)
+        response = self.clients[0].wait_for_response(Message('question'))
+        self.assertEqual(response.data['answer'], 42)
+
+    def test_close(self):
+        closed = Event()
+        client = self.clients.pop()
+        client.on('close', lambda: closed.set())
+        client.close()
+        self.assertTrue(closed.is_set())
+        self.assertNotIn(client, self.bus.clients)
+
+
+LOCAL_CONFIG = {'websocket': {'host': '0.0.0.0', 'port': 8181,
+                              'route': '/core', 'transport': 'local'}}
+
+
+@patch('mycroft.configuration.Configuration.get')
+class TestCreateClient(unittest.TestCase):
+    def test_local_needs_bus(self, get_config):
+        get_config.return_value = LOCAL_CONFIG
+        # A private bus would silently disconnect the service
+        with self.assertRaises(ValueError):
+            create_client()
+
+    def test_local(self, get_config):
+        get_config.return_value = LOCAL_CONFIG
+        bus = LocalBus()
+        client = create_client(bus)
+        self.assertIsInstance(client, LocalClient)
+        self.assertIs(client.bus, bus)
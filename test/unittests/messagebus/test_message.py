@@ -0,0 +1,104 @@
+# Copyright 2018 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import json
+import sys
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+
+from mycroft.messagebus.message import Message
+
+
+class TestMessage(unittest.TestCase):
+    def test_serialize_deserialize(self):
+        message = Message('speak', {'utterance': 'hello'}, {'ident': 1})
+        copy = Message.deserialize(message.serialize())
+        self.assertEqual(copy.type, 'speak')
+        self.assertEqual(copy.data, {'utterance': 'hello'})
+        self.assertEqual(copy.context, {'ident': 1})
+
+    def test_lazy_decode(self):
+        serialized = Message('speak', {'utterance': 'hello'}).serialize()
+        message = Message.deserialize(serialized)
+        self.assertEqual(message.type, 'speak')
+        self.assertIsNotNone(message._serialized)
+        # Unmodified messages are passed on as is
+        self.assertIs(message.serialize(), serialized)
+
+        self.assertEqual(message.data['utterance'], 'hello')
+        self.assertIsNone(message._serialized)
+
+    def test_modified_message(self):
+        message = Message.deserialize(Message('speak').serialize())
+        message.type = 'recognizer_loop:utterance'
+        self.assertEqual(json.loads(message.serialize())['type'],
+                         'recognizer_loop:utterance')
+
+        message = Message.deserialize(Message('speak').serialize())
+        message.context = {'target': 'cli'}
+        self.assertEqual(message.data, {})
+        self.assertEqual(json.loads(message.serialize())['context'],
+                         {'target': 'cli'})
+
+    def test_fallback(self):
+        escaped = json.dumps({'type': 'say "hi"', 'data': {'a': 1}})
+        message = Message.deserialize(escaped)
+        self.assertEqual(message.type, 'say "hi"')
+        self.assertEqual(message.data, {'a': 1})
+
+        reordered = '{"data": {"a": 1}, "context": null, "type": "speak"}'
+        message = Message.deserialize(reordered)
+        self.assertEqual(message.type, 'speak')
+        self.assertEqual(message.data, {'a': 1})
+
+    def test_concurrent_decode(self):
+        serialized = Message('speak', {'utterance': 'hello'}).serialize()
+        readers = 8
+        # Switch threads as often as possible to expose races
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, switch_interval)
+        with ThreadPoolExecutor(readers) as executor:
+            for _ in range(1000):
+                message = Message.deserialize(serialized)
+                barrier = Barrier(readers)
+
+                def read():
+                    barrier.wait()
+                    return message.data.get('utterance')
+                results = [executor.submit(read) for _ in range(readers)]
+                self.assertEqual([r.result() for r in results],
+                                 ['hello'] * readers)
+
+    def test_malformed(self):
+        truncated = '{"type": "speak", "data": {"utterance": '
+        with self.assertRaises(ValueError):
+            Message.deserialize(truncated)
+        with self.assertRaises(ValueError):
+            Message.deserialize(truncated, lazy=False)
+
+        malformed = '{"type": "speak", "data": {"utterance" "hi"}}'
+        message = Message.deserialize(malformed)
+        self.assertEqual(message.type, 'speak')
+        with self.assertRaises(ValueError):
+            message.data
+
+    def test_request_id(self):
+        message = Message('test', {}, {'request_id': '1234', 'source': 'a'})
+        reply = message.reply('other')
+        self.assertEqual(reply.context, {'source': 'a'})
+        self.assertEqual(message.context['request_id'], '1234')
+        response = message.response()
+        self.assertEqual(response.context['request_id'], '1234')
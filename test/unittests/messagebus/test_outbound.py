@@ -0,0 +1,172 @@
+# Copyright 2018 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import time
+import unittest
+from concurrent.futures import Future
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from threading import Event, Thread
+
+from mock import MagicMock
+from tornado import ioloop, web
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_unix_socket
+
+from mycroft.messagebus.client.unix_socket import UnixSocketWebSocket
+from mycroft.messagebus.codec import BATCH_SEPARATOR
+from mycroft.messagebus.message import Message
+from mycroft.messagebus.router import SUBSCRIBE
+from mycroft.messagebus.service import ws
+from mycroft.messagebus.service.outbound import OutboundQueue, DISCONNECT
+
+
+class TestOutboundQueue(unittest.TestCase):
+    def setUp(self):
+        self.written = []
+        self.pending = None
+        self.scheduled = []
+
+    def write(self, frame, binary):
+        self.written.append(frame)
+        self.pending = Future()
+        return self.pending
+
+    def create_queue(self, config=None, batch=True):
+        return OutboundQueue(self.write, MagicMock(), self.scheduled.append,
+                             config, batch)
+
+    def finish_write(self):
+        self.pending.set_result(None)
+
+    def test_coalesce(self):
+        queue = self.create_queue()
+        for frame in ('a', 'b', 'c'):
+            queue.put(frame)
+        self.assertEqual(len(self.scheduled), 1)
+        self.scheduled[0]()
+        self.assertEqual(self.written, [BATCH_SEPARATOR + 'a' +
+                                        BATCH_SEPARATOR + 'b' +
+                                        BATCH_SEPARATOR + 'c'])
+
+        # Frames queued while writing are sent when the write is done
+        queue.put('d')
+        queue.put(b'e', True)
+        queue.put('f')
+        self.assertEqual(len(self.scheduled), 1)
+        self.finish_write()
+        self.assertEqual(self.written[1:], ['d'])
+        self.finish_write()
+        self.assertEqual(self.written[2:], [b'e'])
+        self.finish_write()
+        self.assertEqual(self.written[3:], ['f'])
+        self.assertEqual(queue.stats()['sent_messages'], 6)
+        self.assertEqual(queue.stats()['sent_frames'], 4)
+
+    def test_no_batching(self):
+        queue = self.create_queue(batch=False)
+        queue.put('a')
+        queue.put('b')
+        self.scheduled[0]()
+        self.finish_write()
+        self.assertEqual(self.written, ['a', 'b'])
+
+    def test_high_water_mark(self):
+        queue = self.create_queue({'high_water_mark': 2})
+        for frame in ('a', 'b', 'c'):
+            queue.put(frame)
+        self.assertEqual(queue.stats()['dropped'], 1)
+        self.scheduled[0]()
+        self.assertEqual(self.written, [BATCH_SEPARATOR + 'b' +
+                                        BATCH_SEPARATOR + 'c'])
+
+    def test_disconnect_slow_client(self):
+        queue = self.create_queue({'high_water_mark': 1,
+                                   'slow_policy': DISCONNECT,
+                                   'slow_timeout': 0})
+        queue.put('a')
+        queue.put('b')
+        self.assertFalse(queue.close.called)
+        queue.put('c')
+        self.assertTrue(queue.close.called)
+        self.assertEqual(queue.stats()['queued'], 0)
+
+
+class PinnedTornadoHandler(ws.WebsocketEventHandler):
+    """ Handler behaving like tornado < 4.3, writes don't return futures. """
+    def write_message(self, message, binary=False):
+        super(PinnedTornadoHandler, self).write_message(message, binary)
+
+
+class TestSlowClient(unittest.TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.path = join(self.directory, 'bus.sock')
+        started = Event()
+
+        def run_service():
+            self.loop = ioloop.IOLoop()
+            self.loop.make_current()
+            server = HTTPServer(web.Application([
+                ('/core', PinnedTornadoHandler,
+                 {'outbound': {'high_water_mark': 10}})
+            ]))
+            server.add_socket(bind_unix_socket(self.path))
+            self.loop.add_callback(started.set)
+            self.loop.start()
+
+        Thread(target=run_service, daemon=True).start()
+        started.wait(5)
+
+    def tearDown(self):
+        self.loop.add_callback(self.loop.stop)
+        rmtree(self.directory)
+
+    def connect(self):
+        client = UnixSocketWebSocket(self.path)
+        client.connect('ws://localhost:8181/core')
+        return client
+
+    def test_queue_bounded(self):
+        connected = len(ws.client_connections)
+        slow = self.connect()  # Never reads
+        end = time.monotonic() + 5
+        while (len(ws.client_connections) == connected and
+               time.monotonic() < end):
+            time.sleep(0.01)
+        handler = ws.client_connections[-1]
+        sender = self.connect()
+        sender.send(Message(SUBSCRIBE, {'types': []}).serialize())
+
+        frame = Message('test', {'payload': 'x' * 100000}).serialize()
+        for _ in range(100):
+            sender.send(frame)
+        end = time.monotonic() + 5
+        while (handler.outbound.stats()['dropped'] == 0 and
+               time.monotonic() < end):
+            time.sleep(0.01)
+
+        # Frames wait in the queue while the socket is busy, not in the
+        # write buffer of the stream
+        stats = handler.outbound.stats()
+        self.assertGreater(stats['dropped'], 0)
+        self.assertLessEqual(stats['max_queued'], 10)
+        self.assertLess(stats['sent_frames'], 100)
+        slow.shutdown()
+        sender.shutdown()
+        end = time.monotonic() + 5
+        while (len(ws.client_connections) > connected and
+               time.monotonic() < end):
+            time.sleep(0.01)
@@ -0,0 +1,80 @@
+# Copyright 2018 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+
+from mycroft.messagebus.message import Message
+from mycroft.messagebus.router import (MessageRouter, SUBSCRIBE,
+                                       subscription_patterns)
+
+
+class TestMessageRouter(unittest.TestCase):
+    def setUp(self):
+        self.router = MessageRouter()
+        self.router.add('client1')
+        self.router.add('client2')
+
+    def test_broadcast(self):
+        self.assertEqual(set(self.router.route('speak')),
+                         {'client1', 'client2'})
+
+    def test_exact_subscription(self):
+        self.router.subscribe('client1', ['speak'])
+        self.assertEqual(set(self.router.route('speak')),
+                         {'client1', 'client2'})
+        self.assertEqual(set(self.router.route('speak.response')),
+                         {'client2'})
+
+    def test_prefix_subscription(self):
+        self.router.subscribe('client1', ['mycroft.audio.*'])
+        self.router.subscribe('client2', ['speak'])
+        self.assertEqual(self.router.route('mycroft.audio.service.play'),
+                         ('client1',))
+        self.assertEqual(self.router.route('mycroft.stop'), ())
+        self.router.subscribe('client2', ['*'])
+        self.assertEqual(self.router.route('mycroft.stop'), ('client2',))
+
+    def test_unsubscribe(self):
+        self.router.subscribe('client1', ['speak', 'mycroft.stop'])
+        self.router.unsubscribe('client1', ['speak'])
+        self.assertEqual(self.router.route('speak'), ('client2',))
+        self.assertEqual(set(self.router.route('mycroft.stop')),
+                         {'client1', 'client2'})
+        # Removing all subscriptions restores receiving all messages
+        self.router.unsubscribe('client1')
+        self.assertEqual(set(self.router.route('speak')),
+                         {'client1', 'client2'})
+
+    def test_remove(self):
+        self.router.subscribe('client1', ['speak'])
+        self.router.remove('client1')
+        self.router.remove('client2')
+        self.assertEqual(self.router.route('speak'), ())
+        self.assertEqual(self.router.exact, {})
+
+
+class TestSubscriptionPatterns(unittest.TestCase):
+    def test_patterns(self):
+        self.assertEqual(subscription_patterns(
+            Message(SUBSCRIBE, {'types': ['speak', 'mycroft.*']})),
+            ['speak', 'mycroft.*'])
+        self.assertIsNone(subscription_patterns(Message(SUBSCRIBE)))
+        # A single pattern isn't split into characters
+        self.assertEqual(subscription_patterns(
+            Message(SUBSCRIBE, {'types': 'speak'})), ['speak'])
+
+    def test_invalid(self):
+        for types in (42, ['speak', 42], {'speak': True}):
+            with self.assertRaises(ValueError):
+                subscription_patterns(Message(SUBSCRIBE, {'types': types}))
@@ -0,0 +1,62 @@
+# Copyright 2018 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+
+from mock import MagicMock, patch
+
+from mycroft.messagebus.codec import JsonCodec
+from mycroft.messagebus.message import Message
+from mycroft.messagebus.service.ws import WebsocketEventHandler
+
+
+class ServiceForwardTest(unittest.TestCase):
+    def setUp(self):
+        self.receiver = MagicMock(codec=JsonCodec)
+        patcher = patch('mycroft.messagebus.service.ws.client_router')
+        router = patcher.start()
+        router.route.return_value = (self.receiver,)
+        self.addCleanup(patcher.stop)
+        self.handler = MagicMock(codec=JsonCodec)
+
+    def test_forwarded(self):
+        frame = Message('speak', {'utterance': 'hello'}).serialize()
+        WebsocketEventHandler.on_message(self.handler, frame)
+        self.receiver.send.assert_called_once_with(frame, False)
+
+    def test_not_decoded(self):
+        frame = Message('speak', {'utterance': 'hello'}).serialize()
+        with patch('mycroft.messagebus.message.json.loads') as loads:
+            WebsocketEventHandler.on_message(self.handler, frame)
+            self.assertFalse(loads.called)
+        self.receiver.send.assert_called_once_with(frame, False)
+
+    def test_malformed_dropped(self):
+        frame = '{"type": "speak", "data": {"utterance": '
+        WebsocketEventHandler.on_message(self.handler, frame)
+        self.assertFalse(self.receiver.send.called)
+        self.assertFalse(self.handler.emitter.emit.called)
+
+    def test_subscription_types(self):
+        with patch('mycroft.messagebus.service.ws.client_router') as router:
+            subscribe = Message('mycroft.messagebus.subscribe',
+                                {'types': 'speak'})
+            WebsocketEventHandler.handle_subscription(self.handler,
+                                                      subscribe)
+            router.subscribe.assert_called_once_with(self.handler,
+                                                     ['speak'])
+            subscribe.data['types'] = ['speak', 42]
+            WebsocketEventHandler.handle_subscription(self.handler,
+                                                      subscribe)
+            self.assertEqual(router.subscribe.call_count, 1)
@@ -0,0 +1,81 @@
+# Copyright 2018 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from threading import Event, Thread
+
+from tornado import ioloop, web
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_unix_socket
+
+from mycroft.messagebus.client.unix_socket import UnixSocketApp
+from mycroft.messagebus.client.ws import WebsocketClient
+from mycroft.messagebus.message import Message
+from mycroft.messagebus.service.ws import WebsocketEventHandler
+
+
+class TestUnixSocket(unittest.TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.path = join(self.directory, 'bus.sock')
+        started = Event()
+
+        def run_service():
+            self.loop = ioloop.IOLoop()
+            self.loop.make_current()
+            server = HTTPServer(web.Application([
+                ('/core', WebsocketEventHandler)
+            ]))
+            server.add_socket(bind_unix_socket(self.path))
+            self.loop.add_callback(started.set)
+            self.loop.start()
+
+        Thread(target=run_service, daemon=True).start()
+        started.wait(5)
+
+    def tearDown(self):
+        self.loop.add_callback(self.loop.stop)
+        rmtree(self.directory)
+
+    def connect(self):
+        client = WebsocketClient('localhost', 8181, '/core', False,
+                                 unix_socket=self.path)
+        Thread(target=client.run_forever, daemon=True).start()
+        self.assertTrue(client.connected_event.wait(5))
+        return client
+
+    def test_wait_for_response(self):
+        sender, responder = self.connect(), self.connect()
+        responder.on('question', lambda message: responder.emit(
+            message.response({'answer': 42})))
+        # The responder's connection must be registered by the service
+        stats = sender.wait_for_response(Message('mycroft.messagebus.stats'))
+        self.assertEqual(len(stats.data['connections']), 2)
+
+        response = sender.wait_for_response(Message('question'))
+        self.assertEqual(response.data['answer'], 42)
+        sender.close()
+        responder.close()
+
+    def test_ping(self):
+        ponged = Event()
+        app = UnixSocketApp(self.path, 'ws://localhost:8181/core',
+                            on_pong=lambda ws, data: ponged.set())
+        Thread(target=app.run_forever, kwargs={'ping_interval': 0.1},
+               daemon=True).start()
+        self.assertTrue(ponged.wait(5))
+        app.close()
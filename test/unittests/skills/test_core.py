@@ -13,21 +13,26 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import importlib.util
+import resource
 import sys
 import unittest
 
 import mock
 from adapt.intent import IntentBuilder
-from os.path import join, dirname, abspath
+from os.path import join, dirname, abspath, exists
 from re import error
 from datetime import datetime
+from shutil import copytree, rmtree
+from tempfile import mkdtemp
 
 from mycroft.configuration import Configuration
 from mycroft.messagebus.message import Message
 from mycroft.skills.skill_data import load_regex_from_file, load_regex, \
-    load_vocab_from_file, load_vocabulary
+    load_vocab_from_file, load_vocabulary, read_skill_data
 from mycroft.skills.core import MycroftSkill, load_skill, \
-    create_skill_descriptor, open_intent_envelope
+    load_skill_module, create_skill_descriptor, open_intent_envelope, \
+    _rusage_thread_time
 
 from test.util import base_config
 
@@ -200,11 +205,51 @@ class MycroftSkillTest(unittest.TestCase):
 
     def test_load_skill(self):
         """ Verify skill load function. """
-        e_path = join(dirname(__file__), 'test_skill')
-        s = load_skill(create_skill_descriptor(e_path), MockEmitter(), 847)
-        self.assertEquals(s._dir, e_path)
-        self.assertEquals(s.skill_id, 847)
-        self.assertEquals(s.name, 'LoadTestSkill')
+        # Loaded from a copy, loading writes the skill's settings.json
+        e_path = join(mkdtemp(), 'test_skill')
+        try:
+            copytree(join(dirname(__file__), 'test_skill'), e_path)
+            s = load_skill(create_skill_descriptor(e_path), MockEmitter(),
+                           847)
+            self.assertEquals(s._dir, e_path)
+            self.assertEquals(s.skill_id, 847)
+            self.assertEquals(s.name, 'LoadTestSkill')
+            self.assertGreater(s.import_time, 0)
+        finally:
+            rmtree(dirname(e_path))
+
+    @mock.patch.object(sys, 'dont_write_bytecode', False)
+    def test_load_skill_module_bytecode(self):
+        """ Verify skill modules are compiled once and cached. """
+        skill_dir = join(mkdtemp(), 'cached-skill.author')
+        try:
+            copytree(join(dirname(__file__), 'test_skill'), skill_dir)
+            main_file = join(skill_dir, '__init__.py')
+            module = load_skill_module(skill_dir, 'cached-skill.author')
+            self.assertIs(sys.modules['cached-skill_author'], module)
+            self.assertTrue(hasattr(module, 'create_skill'))
+            cached = importlib.util.cache_from_source(main_file)
+            self.assertTrue(exists(cached))
+
+            with mock.patch('importlib._bootstrap_external.'
+                            'SourceLoader.source_to_code') as mock_compile:
+                load_skill_module(skill_dir, 'cached-skill.author')
+                self.assertFalse(mock_compile.called)
+        finally:
+            sys.modules.pop('cached-skill_author', None)
+            rmtree(dirname(skill_dir))
+
+    def test_load_skill_module_failure(self):
+        """ Verify failed imports are removed from sys.modules. """
+        skill_dir = mkdtemp()
+        try:
+            with open(join(skill_dir, '__init__.py'), 'w') as f:
+                f.write('raise ImportError("missing dependency")\n')
+            with self.assertRaises(ImportError):
+                load_skill_module(skill_dir, 'broken')
+            self.assertNotIn('broken', sys.modules)
+        finally:
+            rmtree(skill_dir)
 
     def check_detach_intent(self):
         self.assertTrue(len(self.emitter.get_types()) > 0)
@@ -289,6 +334,60 @@ class MycroftSkillTest(unittest.TestCase):
         expected = [{'regex': 'weird (?P<AWeird>.+) stuff'}]
         self.check_register_vocabulary(expected)
 
+    def test_load_data_files(self):
+        """Test vocab and regex are sent in a single batch."""
+        s = SimpleSkill1()
+        s.bind(self.emitter)
+        self.emitter.reset()
+        root = mkdtemp()
+        try:
+            copytree(join(self.vocab_path, 'valid'),
+                     join(root, 'vocab', s.lang))
+            copytree(join(self.regex_path, 'valid'),
+                     join(root, 'regex', s.lang))
+            s.load_data_files(root)
+        finally:
+            rmtree(root)
+
+        self.assertEquals(self.emitter.get_types(), ['register_vocab_batch'])
+        batch = self.emitter.get_results()[0]
+        self.assertIn({'start': 'chairs', 'end': 'Amultiplealias',
+                       'alias_of': 'chair'}, batch['vocab'])
+        self.assertEquals(sorted(batch['regex']),
+                          ['(?P<AMultipleTest1>.*)', '(?P<AMultipleTest2>.*)',
+                           '(?P<ASingleTest>.*)'])
+
+    @mock.patch('mycroft.skills.skill_data.get_cache_directory')
+    def test_read_skill_data_cache(self, mock_cache_dir):
+        """Test unchanged data is read from the cache."""
+        cache_dir, root = mkdtemp(), mkdtemp()
+        mock_cache_dir.return_value = cache_dir
+        vocab_dir = join(root, 'vocab')
+        regex_dir = join(root, 'regex')
+        try:
+            copytree(join(self.vocab_path, 'valid'), vocab_dir)
+            copytree(join(self.regex_path, 'valid'), regex_dir)
+            data = read_skill_data(vocab_dir, regex_dir, 'A', 'en-us')
+            self.assertIn('(?P<ASingleTest>.*)', data[1])
+
+            with mock.patch('mycroft.skills.skill_data.read_vocabulary') \
+                    as mock_read:
+                self.assertEquals(
+                    read_skill_data(vocab_dir, regex_dir, 'A', 'en-us'),
+                    data)
+                self.assertFalse(mock_read.called)
+
+            # A modified file invalidates the cache
+            with open(join(regex_dir, 'single.rx'), 'a') as f:
+                f.write('\n(?P<Extra>.*)\n')
+            vocab, regex = read_skill_data(vocab_dir, regex_dir, 'A',
+                                           'en-us')
+            self.assertIn('(?P<AExtra>.*)', regex)
+            self.assertEquals(vocab, data[0])
+        finally:
+            rmtree(root)
+            rmtree(cache_dir)
+
     def check_register_object_file(self, types_list, result_list):
         self.assertEquals(sorted(self.emitter.get_types()),
                           sorted(types_list))
@@ -429,6 +528,27 @@ class MycroftSkillTest(unittest.TestCase):
         # Check that the handler was stored in the skill
         self.assertTrue('handler1' in [e[0] for e in s.events])
 
+    @mock.patch.dict(Configuration._Configuration__config, BASE_CONF)
+    def test_run_event_handler(self):
+        emitter = mock.MagicMock()
+        s = SimpleSkill1()
+        with mock.patch.object(s, '_settings',
+                               create=True, value=mock.MagicMock()):
+            s.bind(emitter)
+            s.add_event('handler1', s.handler)
+            # Run the wrapper registered with the emitter
+            emitter.on.call_args[0][1](Message('handler1'))
+        self.assertTrue(s.handler_run)
+        self.assertEqual(s.handler_calls, 1)
+        self.assertGreaterEqual(s.handler_cpu_time, 0)
+
+    @unittest.skipUnless(hasattr(resource, 'RUSAGE_THREAD'),
+                         'RUSAGE_THREAD not supported')
+    def test_rusage_thread_time(self):
+        start = _rusage_thread_time()
+        sum(range(1000000))
+        self.assertGreater(_rusage_thread_time(), start)
+
     @mock.patch.dict(Configuration._Configuration__config, BASE_CONF)
     def test_remove_event(self):
         emitter = mock.MagicMock()
@@ -12,9 +12,19 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import time
 import unittest
+from functools import partial
+from threading import Timer
 
-from mycroft.skills.intent_service import ContextManager
+from mock import MagicMock, patch
+
+from adapt.intent import IntentBuilder
+
+from mycroft.messagebus.message import Message
+from mycroft.skills.intent_service import (ActiveSkills, ContextManager,
+                                           IntentService)
+from mycroft.skills.skill_host import converse_response
 
 
 class MockEmitter(object):
@@ -67,6 +77,326 @@ class ContextManagerTest(unittest.TestCase):
         self.context_manager.remove_context('TestContext')
         self.assertEqual(len(self.context_manager.frame_stack), 0)
 
+    def inject(self, word, context, origin=''):
+        self.context_manager.inject_context({
+            'confidence': 1.0, 'data': [(word, context)], 'match': word,
+            'key': word, 'origin': origin})
+
+    def test_remove_context_by_type(self):
+        self.inject('London', 'Location')
+        self.inject('Sunday', 'Day')
+        self.context_manager.remove_context('Location')
+        self.assertEqual([e['key'] for e in
+                          self.context_manager.get_context()], ['Sunday'])
+
+    def test_remove_origin_context(self):
+        self.inject('London', 'Location', 'weather')
+        self.inject('Sunday', 'Day', 'alarm')
+        self.context_manager.remove_origin_context('weather')
+        self.assertEqual([e['key'] for e in
+                          self.context_manager.get_context()], ['Sunday'])
+
+    def test_get_context(self):
+        self.inject('London', 'Location')
+        self.inject('Sunday', 'Day')
+        self.inject('Paris', 'Location')
+        context = self.context_manager.get_context()
+        # Only the latest entity of each type, latest first
+        self.assertEqual([e['key'] for e in context], ['Paris', 'Sunday'])
+        self.assertEqual([e['confidence'] for e in context], [0.5, 1 / 3])
+        self.assertEqual([e['key'] for e in
+                          self.context_manager.get_context(max_frames=1)],
+                         ['Paris'])
+        self.assertEqual(self.context_manager.get_context(), context)
+
+    def test_expiry(self):
+        self.inject('London', 'Location')
+        with patch('mycroft.skills.intent_service.time.monotonic',
+                   return_value=time.monotonic() + 3 * 60):
+            self.assertEqual(self.context_manager.get_context(), [])
+            self.assertEqual(len(self.context_manager.frame_stack), 0)
+            self.assertEqual(dict(self.context_manager.type_index), {})
+
+
+class ConverseBus(object):
+    """ Bus answering converse requests after a per skill delay.
+
+    Args:
+        skills (dict): skill_id -> (delay in seconds, converse result)
+    """
+
+    def __init__(self, skills):
+        self.skills = skills
+        self.handlers = {}
+        self.requests = []
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def emit(self, message):
+        if message.type != 'skill.converse.request':
+            return
+        skill_id = message.data['skill_id']
+        self.requests.append(skill_id)
+        delay, result = self.skills[skill_id]
+        if delay is not None:
+            response = converse_response(message, skill_id, result)
+            Timer(delay, self.handlers['skill.converse.response'],
+                  [response]).start()
+
+
+class ConverseTest(unittest.TestCase):
+    def create_service(self, skills):
+        service = IntentService(ConverseBus(skills))
+        for skill_id in reversed(sorted(skills)):
+            service.add_active_skill(skill_id)
+        return service
+
+    def test_requests_sent_at_once(self):
+        service = self.create_service({'a': (0.3, False), 'b': (0.3, False),
+                                       'c': (0.3, True)})
+        start = time.monotonic()
+        self.assertTrue(service._converse(['hello'], 'en-us'))
+        self.assertLess(time.monotonic() - start, 0.6)
+        self.assertEqual(service.bus.requests, ['a', 'b', 'c'])
+        # The handling skill becomes the most recent active skill
+        self.assertEqual(service.active_skills.skill_ids()[0], 'c')
+
+    def test_highest_priority_wins(self):
+        service = self.create_service({'a': (0.2, True), 'b': (0, True)})
+        self.assertEqual(service.converse_round(['hello'], ['a', 'b'],
+                                                'en-us'), 'a')
+
+    def test_deadline(self):
+        service = self.create_service({'a': (None, None), 'b': (0, True),
+                                       'c': (0, False)})
+        service.converse_deadline = 0.2
+        start = time.monotonic()
+        self.assertEqual(service.converse_round(['hello'], ['a', 'b', 'c'],
+                                                'en-us'), 'b')
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        self.assertEqual(service.converse_requests, {})
+
+    def test_not_handled(self):
+        service = self.create_service({'a': (0, False), 'b': (None, None)})
+        service.converse_deadline = 0.2
+        self.assertFalse(service._converse(['hello'], 'en-us'))
+
+
+def adapt_intent(confidence):
+    return {'intent_type': 'skill:Intent', 'confidence': confidence,
+            '__tags__': []}
+
+
+class ActiveSkillsTest(unittest.TestCase):
+    def test_most_recent_first(self):
+        active = ActiveSkills(60)
+        for skill_id in ('a', 'b', 'c', 'a'):
+            active.touch(skill_id)
+        self.assertEqual(active.skill_ids(), ['a', 'c', 'b'])
+        active.remove('c')
+        self.assertEqual(active.skill_ids(), ['a', 'b'])
+        self.assertIn('b', active)
+        self.assertEqual(len(active), 2)
+
+    def test_expiry(self):
+        active = ActiveSkills(60)
+        active.touch('a')
+        active.touch('b')
+        with patch('mycroft.skills.intent_service.time.monotonic',
+                   return_value=time.monotonic() + 61):
+            self.assertEqual(active.skill_ids(), [])
+        self.assertEqual(len(active.skills), 0)
+
+    def test_bus_query(self):
+        service = IntentService(MagicMock())
+        service.add_active_skill('a')
+        service.add_active_skill('b')
+        service.handle_get_active_skills(
+            Message('intent.service.active_skills.get'))
+        response = service.bus.emit.call_args[0][0]
+        self.assertEqual(response.type,
+                         'intent.service.active_skills.get.response')
+        self.assertEqual([s['skill_id'] for s in response.data['skills']],
+                         ['b', 'a'])
+
+
+def padatious_service():
+    """ PadatiousService mock matching utterances in this process. """
+    padatious = MagicMock()
+    padatious.start_calc_intent.side_effect = \
+        lambda utt: partial(padatious.calc_intent, utt)
+    return padatious
+
+
+class IntentMatchTest(unittest.TestCase):
+    def setUp(self):
+        self.service = IntentService(MagicMock())
+        self.padatious = padatious_service()
+        patcher = patch('mycroft.skills.intent_service.PadatiousService')
+        patcher.start().instance = self.padatious
+        self.addCleanup(patcher.stop)
+
+    def test_both_engines(self):
+        padatious_intent = MagicMock(conf=0.5)
+        self.padatious.calc_intent.return_value = padatious_intent
+        self.service._adapt_determine_intent = MagicMock(
+            return_value=(adapt_intent(0.5), 0))
+        timing = {}
+        intent, padatious = self.service._intent_match(['hello'], 'en-us',
+                                                       timing)
+        self.assertEqual(intent, adapt_intent(0.5))
+        self.assertIs(padatious, padatious_intent)
+        self.padatious.calc_intent.assert_called_once_with('hello')
+        self.assertEqual(sorted(timing), ['adapt', 'padatious'])
+        self.assertEqual(self.service.active_skills.skill_ids()[0], 'skill')
+
+    def test_perfect_adapt_match(self):
+        self.service._adapt_determine_intent = MagicMock(
+            return_value=(adapt_intent(1.0), 0))
+        timing = {}
+        intent, padatious = self.service._intent_match(['hello'], 'en-us',
+                                                       timing)
+        self.assertIsNone(padatious)
+        # Started alongside Adapt, but the result isn't waited for
+        self.padatious.start_calc_intent.assert_called_once_with('hello')
+        self.assertFalse(self.padatious.calc_intent.called)
+        self.assertEqual(list(timing), ['adapt'])
+
+    def test_padatious_error(self):
+        self.padatious.calc_intent.side_effect = AttributeError
+        self.service._adapt_determine_intent = MagicMock(
+            return_value=(None, None))
+        self.assertEqual(self.service._intent_match(['hello'], 'en-us', {}),
+                         (None, None))
+        # Failed matches aren't cached
+        self.assertEqual(self.service.intent_cache.stats()['size'], 0)
+
+
+class IntentCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.service = IntentService(MagicMock())
+        self.service.intent_cache.max_size = 2
+        self.padatious = padatious_service()
+        self.padatious.calc_intent.return_value = MagicMock(conf=0.2)
+        patcher = patch('mycroft.skills.intent_service.PadatiousService')
+        patcher.start().instance = self.padatious
+        self.addCleanup(patcher.stop)
+        self.service._adapt_determine_intent = MagicMock(
+            return_value=(adapt_intent(0.5), 0))
+
+    def match(self, utterance):
+        return self.service._intent_match([utterance], 'en-us', {})
+
+    def test_hit(self):
+        self.match('what time is it')
+        intent, _ = self.match('what time is it')
+        self.assertEqual(self.service._adapt_determine_intent.call_count, 1)
+        self.assertEqual(self.padatious.calc_intent.call_count, 1)
+        self.assertEqual(intent['utterance'], 'what time is it')
+        stats = self.service.intent_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_context_in_key(self):
+        self.match('what time is it')
+        self.service.context_manager.inject_context(
+            {'data': [('London', 'Location')], 'key': 'London',
+             'origin': ''})
+        self.match('what time is it')
+        self.assertEqual(self.service._adapt_determine_intent.call_count, 2)
+
+    def test_lru(self):
+        for utterance in ('one', 'two', 'one', 'three', 'one', 'two'):
+            self.match(utterance)
+        # "two" was evicted by "three"
+        self.assertEqual(self.service.intent_cache.stats()['hits'], 2)
+        self.assertEqual(self.service.intent_cache.stats()['size'], 2)
+
+    def test_invalidation(self):
+        handlers = [
+            (self.service.handle_register_vocab, {'start': 'x', 'end': 'X'}),
+            (self.service.handle_detach_intent, {'intent_name': 'x'}),
+            (self.service.handle_detach_skill, {'skill_id': 'x'})
+        ]
+        for handler, data in handlers:
+            self.match('stop')
+            self.assertEqual(self.service.intent_cache.stats()['size'], 1)
+            handler(Message('test', data))
+            self.assertEqual(self.service.intent_cache.stats()['size'], 0)
+
+
+class IntentRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.service = IntentService(MagicMock())
+        for name in ('1:a', '1:b', '2:a', '12:a'):
+            intent = IntentBuilder(name).require('Keyword').build()
+            self.service.handle_register_intent(
+                Message('register_intent', intent.__dict__))
+
+    def engine_intents(self):
+        self.service._update_engine()
+        return [p.name for p in self.service.engine.intent_parsers]
+
+    def test_register(self):
+        self.assertEqual(self.service.engine.intent_parsers, [])
+        self.assertEqual(self.engine_intents(), ['1:a', '1:b', '2:a', '12:a'])
+        self.assertEqual(self.service.skill_intents['1'], {'1:a', '1:b'})
+
+    def test_detach_intent(self):
+        self.service.handle_detach_intent(
+            Message('detach_intent', {'intent_name': '1:a'}))
+        self.assertEqual(self.engine_intents(), ['1:b', '2:a', '12:a'])
+        self.service.handle_detach_intent(
+            Message('detach_intent', {'intent_names': ['1:b', '2:a']}))
+        self.assertEqual(self.engine_intents(), ['12:a'])
+        self.assertEqual(sorted(self.service.skill_intents), ['12'])
+
+    def test_detach_skill(self):
+        self.service.handle_detach_skill(
+            Message('detach_skill', {'skill_id': '1:'}))
+        self.assertEqual(self.engine_intents(), ['2:a', '12:a'])
+
+    def test_reregister(self):
+        self.engine_intents()
+        self.service.handle_detach_skill(
+            Message('detach_skill', {'skill_id': '1:'}))
+        intent = IntentBuilder('1:a').require('Keyword').build()
+        self.service.handle_register_intent(
+            Message('register_intent', intent.__dict__))
+        self.assertEqual(self.engine_intents(), ['2:a', '12:a', '1:a'])
+
+
+class RegisterVocabBatchTest(unittest.TestCase):
+    def test_batch(self):
+        service = IntentService(MagicMock())
+        service.handle_register_vocab_batch(Message('register_vocab_batch', {
+            'skill_id': 1,
+            'vocab': [{'start': 'weather', 'end': 'WeatherKeyword'},
+                      {'start': 'forecast', 'end': 'WeatherKeyword',
+                       'alias_of': 'weather'}],
+            'regex': ['in (?P<Location>.*)']
+        }))
+        intent = IntentBuilder('1:weather').require('WeatherKeyword') \
+            .optionally('Location').build()
+        service.handle_register_intent(Message('register_intent',
+                                               intent.__dict__))
+        match = service._adapt_intent_match(['forecast in london'], 'en-us')
+        self.assertEqual(match['intent_type'], '1:weather')
+        self.assertEqual(match['Location'], 'london')
+
+    def test_regex_compiled_once(self):
+        service = IntentService(MagicMock())
+        batch = Message('register_vocab_batch', {
+            'skill_id': 1, 'vocab': [], 'regex': ['in (?P<Location>.*)']})
+        service.handle_register_vocab_batch(batch)
+        pattern = service.engine.regular_expressions_entities[0]
+        # A reloaded skill registers the same regexes again
+        service.handle_register_vocab_batch(batch)
+        self.assertEqual(service.engine.regular_expressions_entities,
+                         [pattern])
+        self.assertIs(service.engine.regular_expressions_entities[0],
+                      pattern)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,162 @@
+# Copyright 2018 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from mock import MagicMock, patch
+
+from mycroft.messagebus.message import Message
+from mycroft.skills.lazy_skill import (LazySkill, RecordingBus,
+                                       load_manifest, save_manifest)
+
+REGISTRATIONS = [
+    ['register_vocab', {'start': 'weather', 'end': 'aWeather'}],
+    ['register_intent', {'name': 'a:WeatherIntent', 'requires': []}],
+    ['padatious:register_intent', {'name': 'a:rain.intent',
+                                   'file_name': '/skills/a/rain.intent'}]
+]
+
+
+class ManifestTest(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = mkdtemp()
+        patcher = patch('mycroft.skills.lazy_skill.get_cache_directory',
+                        return_value=self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        rmtree(self.cache_dir)
+
+    def test_save_and_load(self):
+        self.assertIsNone(load_manifest('/skills/a', 1.0))
+        save_manifest('/skills/a', 1.0, 'A', False, REGISTRATIONS)
+        manifest = load_manifest('/skills/a/', 1.0)
+        self.assertEqual(manifest['name'], 'A')
+        self.assertEqual(manifest['registrations'], REGISTRATIONS)
+        # Skill modified since recording the manifest
+        self.assertIsNone(load_manifest('/skills/a', 2.0))
+
+    def test_recording_bus(self):
+        bus = MagicMock()
+        recorder = RecordingBus(bus)
+        data = {'name': 'a:WeatherIntent', 'requires': []}
+        recorder.emit(Message('register_intent', data))
+        recorder.emit(Message('speak', {'utterance': 'hi'}))
+        data['requires'].append('changed')
+        recorder.recording = False
+        recorder.emit(Message('register_vocab', {}))
+        self.assertEqual(bus.emit.call_count, 3)
+        self.assertEqual(recorder.registrations, [
+            ['register_intent', {'name': 'a:WeatherIntent', 'requires': []}]
+        ])
+        recorder.on('speak', print)
+        bus.on.assert_called_once_with('speak', print)
+
+
+class LazySkillTest(unittest.TestCase):
+    def setUp(self):
+        self.bus = MagicMock()
+        self.instance = MagicMock(handler_calls=0)
+        self.load = MagicMock(return_value=self.instance)
+        self.skill = LazySkill(self.bus, 'a', {
+            'name': 'A', 'registrations': REGISTRATIONS}, self.load)
+
+    def emitted(self):
+        return [call[0][0].type for call in self.bus.emit.call_args_list]
+
+    def test_registered_from_manifest(self):
+        self.assertFalse(self.load.called)
+        self.assertEqual(self.emitted(), [r[0] for r in REGISTRATIONS])
+        self.assertEqual(
+            sorted(call[0][0] for call in self.bus.on.call_args_list),
+            ['a:WeatherIntent', 'a:rain.intent'])
+
+    def test_loaded_on_intent(self):
+        self.bus.emit.reset_mock()
+        message = Message('a:WeatherIntent', {'utterance': 'weather'})
+        self.skill.handle_intent(message)
+        self.load.assert_called_once_with()
+        self.assertTrue(self.skill.is_loaded)
+        self.assertEqual(self.bus.remove.call_count, 2)
+        self.bus.emit.assert_called_once_with(message)
+
+        # Messages received while loading are sent again as well
+        self.skill.handle_intent(message)
+        self.load.assert_called_once_with()
+        self.assertEqual(self.bus.emit.call_count, 2)
+
+    def test_failed_load(self):
+        self.load.return_value = None
+        self.bus.emit.reset_mock()
+        self.skill.handle_intent(Message('a:WeatherIntent'))
+        self.assertFalse(self.skill.is_loaded)
+        self.assertFalse(self.bus.remove.called)
+        self.assertFalse(self.bus.emit.called)
+
+    def test_idle_unload(self):
+        self.bus.wait_for_response.return_value = None
+        self.skill.handle_intent(Message('a:WeatherIntent'))
+        self.instance.handler_calls = 1
+        self.skill._check_idle()
+        self.assertTrue(self.skill.is_loaded)
+
+        self.bus.emit.reset_mock()
+        self.skill._check_idle()
+        self.assertFalse(self.skill.is_loaded)
+        self.instance.default_shutdown.assert_called_once_with()
+        self.assertEqual(self.emitted(), [r[0] for r in REGISTRATIONS])
+
+    def test_active_skill_kept(self):
+        self.bus.wait_for_response.return_value = Message(
+            'response', {'skills': [{'skill_id': 'a', 'age': 1.0}]})
+        self.skill.handle_intent(Message('a:WeatherIntent'))
+        self.skill._check_idle()
+        self.assertTrue(self.skill.is_loaded)
+
+    def test_lock_released_while_checking_active(self):
+        self.skill.handle_intent(Message('a:WeatherIntent'))
+
+        def active_skills(message, timeout):
+            # A handler is called while waiting for the intent service
+            self.assertTrue(self.skill.lock.acquire(blocking=False))
+            self.skill.lock.release()
+            self.instance.handler_calls += 1
+            return None
+        self.bus.wait_for_response.side_effect = active_skills
+        self.skill._check_idle()
+        self.assertTrue(self.skill.is_loaded)
+        self.assertEqual(self.skill.handler_calls, 1)
+
+    def test_shutdown_while_checking_active(self):
+        self.skill.handle_intent(Message('a:WeatherIntent'))
+
+        def active_skills(message, timeout):
+            if not self.skill.lock.acquire(timeout=1):
+                self.fail('Lock held while waiting for the response')
+            self.skill.lock.release()
+            self.skill.default_shutdown()
+            return None
+        self.bus.wait_for_response.side_effect = active_skills
+        self.skill._check_idle()
+        self.instance.default_shutdown.assert_called_once_with()
+        self.assertFalse(self.skill.is_loaded)
+
+    def test_shutdown_not_loaded(self):
+        self.bus.emit.reset_mock()
+        self.skill.default_shutdown()
+        self.assertEqual(self.emitted(), ['detach_skill', 'detach_intent'])
+        self.assertEqual(self.bus.remove.call_count, 2)
@@ -0,0 +1,283 @@
+# Copyright 2018 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import time
+import unittest
+from multiprocessing.pool import ThreadPool
+from queue import Queue
+from os.path import abspath, dirname, join
+
+from mock import MagicMock, patch
+
+from mycroft.messagebus.message import Message
+from mycroft.skills import padatious_service
+from mycroft.skills.core import FallbackSkill
+from mycroft.skills.padatious_service import (PadatiousService,
+                                              train_container)
+
+INTENT_FILE = join(abspath(dirname(__file__)), 'intent_file', 'vocab',
+                   'en-us', 'test.intent')
+
+
+class FakeMatch(object):
+    def __init__(self, name, conf):
+        self.name = name
+        self.conf = conf
+        self.matches = {}
+
+
+class FakeContainer(object):
+    """ Records the objects loaded and trained in an IntentContainer. """
+    instances = []
+    failures = 0  # Number of trainings to fail
+
+    def __init__(self, cache_dir):
+        self.intents = {}
+        self.entities = {}
+        self.trained = False
+        FakeContainer.instances.append(self)
+
+    def load_intent(self, name, file_name):
+        self.intents[name] = file_name
+
+    def load_entity(self, name, file_name):
+        self.entities[name] = file_name
+
+    def train(self, single_thread=False):
+        if FakeContainer.failures:
+            FakeContainer.failures -= 1
+            raise RuntimeError('Training failed')
+        self.trained = True
+
+    def calc_intents(self, utt):
+        """ Intents named after the utterance match best. """
+        return [FakeMatch(name, 1.0 if utt in name else 0.6)
+                for name in self.intents]
+
+    def calc_intent(self, utt):
+        return max(self.calc_intents(utt), key=lambda match: match.conf,
+                   default=FakeMatch(None, 0.0))
+
+
+class PadatiousServiceTest(unittest.TestCase):
+    def setUp(self):
+        FakeContainer.instances = []
+        FakeContainer.failures = 0
+        patcher = patch('mycroft.skills.padatious_service.IntentContainer',
+                        FakeContainer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Thread pool matcher, sharing the patched IntentContainer
+        patcher = patch('mycroft.skills.padatious_service.multiprocessing.'
+                        'get_context')
+        patcher.start().return_value.Pool = ThreadPool
+        self.addCleanup(patcher.stop)
+        self.fallback_handlers = dict(FallbackSkill.fallback_handlers)
+
+        self.service = PadatiousService(MagicMock(), MagicMock())
+        self.service.schedule_training = MagicMock()
+        self.service.train_in_subprocess = False
+
+    def tearDown(self):
+        self.service.shutdown()
+        padatious_service._matcher_container = None
+        PadatiousService.instance = None
+        FallbackSkill.fallback_handlers = self.fallback_handlers
+
+    def disable_matcher(self):
+        """ Only count the containers trained in this process. """
+        self.service.shutdown()
+        self.service.matcher = None
+
+    def register(self, name):
+        self.service.register_intent(Message('padatious:register_intent', {
+            'name': name, 'file_name': INTENT_FILE}))
+
+    def test_no_queries_before_training(self):
+        self.register('skill:test.intent')
+        self.assertIsNone(self.service.calc_intent('hello'))
+        self.assertFalse(self.service.handle_fallback(
+            Message('', {'utterance': 'hello'})))
+
+    def test_train_swaps_container(self):
+        self.register('skill:test.intent')
+        self.service.train()
+        trained = self.service.container
+        self.assertTrue(trained.trained)
+        self.assertEqual(trained.intents, {'skill:test.intent': INTENT_FILE})
+
+        # The trained container answers until the next one is trained
+        self.register('skill:other.intent')
+        self.assertEqual(self.service.calc_intent('test').name,
+                         'skill:test.intent')
+        self.assertIs(self.service.container, trained)
+
+        self.service.train()
+        self.assertIsNot(self.service.container, trained)
+        self.assertEqual(sorted(self.service.container.intents),
+                         ['skill:other.intent', 'skill:test.intent'])
+        self.service.service.intent_cache.clear.assert_called_with()
+
+    def test_unchanged_intents_not_retrained(self):
+        self.disable_matcher()
+        self.register('skill:test.intent')
+        self.service.train()
+        self.assertEqual(len(FakeContainer.instances), 1)
+
+        # Reloading a skill detaches and registers the same intents
+        self.service.handle_detach_intent(Message('detach_intent', {
+            'intent_names': ['skill:test.intent']}))
+        self.register('skill:test.intent')
+        self.service.train()
+        self.assertEqual(len(FakeContainer.instances), 1)
+
+    def test_detached_intents_not_matched(self):
+        self.register('skill:test.intent')
+        self.register('skill:other.intent')
+        self.service.train()
+        self.service.service.intent_cache.clear.reset_mock()
+
+        self.service.handle_detach_intent(Message('detach_intent', {
+            'intent_name': 'skill:test.intent'}))
+        self.service.service.intent_cache.clear.assert_called_with()
+        # Still in the container until retrained, but never matched
+        self.assertIn('skill:test.intent', self.service.container.intents)
+        self.assertEqual(self.service.calc_intent('test').name,
+                         'skill:other.intent')
+
+        self.service.handle_detach_intent(Message('detach_intent', {
+            'intent_name': 'skill:other.intent'}))
+        self.assertIsNone(self.service.calc_intent('test'))
+        self.assertFalse(self.service.handle_fallback(
+            Message('', {'utterance': 'test'})))
+
+    def test_changes_schedule_training(self):
+        self.register('skill:test.intent')
+        self.service.handle_detach_intent(Message('detach_intent', {
+            'intent_name': 'skill:unknown.intent'}))
+        self.assertEqual(self.service.schedule_training.call_count, 1)
+        self.service.handle_detach_intent(Message('detach_intent', {
+            'intent_name': 'skill:test.intent'}))
+        self.assertEqual(self.service.schedule_training.call_count, 2)
+
+    def test_training_debounced(self):
+        self.disable_matcher()
+        del self.service.schedule_training  # Use the real method
+        self.service.train_delay = 0.1
+        self.register('skill:test.intent')
+        self.service.train()
+
+        self.register('skill:other.intent')
+        self.register('skill:third.intent')
+        time.sleep(0.5)
+        self.assertEqual(len(FakeContainer.instances), 2)
+        self.assertEqual(len(self.service.container.intents), 3)
+
+    def test_training_reported(self):
+        self.register('skill:test.intent')
+        self.service.train()
+        types = [m[0][0].type for m in self.service.bus.emit.call_args_list]
+        self.assertEqual(types, ['padatious:training.started',
+                                 'padatious:training.complete'])
+        complete = self.service.bus.emit.call_args[0][0]
+        self.assertTrue(complete.data['success'])
+        self.assertEqual(complete.data['intents'], 1)
+
+    def test_failed_subprocess_keeps_model(self):
+        self.register('skill:test.intent')
+        self.service.train()
+        trained = self.service.container
+
+        self.service.train_in_subprocess = True
+        self.service._train_in_subprocess = MagicMock(return_value=False)
+        self.register('skill:other.intent')
+        self.service.train()
+        self.assertIs(self.service.container, trained)
+        complete = self.service.bus.emit.call_args[0][0]
+        self.assertFalse(complete.data['success'])
+
+        # The changes are trained on the next attempt
+        self.service._train_in_subprocess.return_value = True
+        self.service.train()
+        self.assertEqual(len(self.service.container.intents), 2)
+
+    def test_failed_initial_training_retried(self):
+        self.disable_matcher()
+        del self.service.schedule_training  # Use the real method
+        self.service.train_delay = self.service.retry_delay = 0.1
+        FakeContainer.failures = 1
+        self.register('skill:test.intent')
+        self.service.train()
+        self.assertIsNone(self.service.container)
+        self.assertFalse(self.service.finished_initial_train)
+        complete = self.service.bus.emit.call_args[0][0]
+        self.assertEqual(complete.type, 'padatious:training.complete')
+        self.assertFalse(complete.data['success'])
+        self.assertEqual(self.service.retry_delay, 0.2)
+
+        self.assertTrue(self.service.finished_training_event.wait(2))
+        self.assertTrue(self.service.container.trained)
+        self.assertTrue(self.service.finished_initial_train)
+        self.assertEqual(self.service.retry_delay, 0.1)
+
+    def test_train_container(self):
+        progress = Queue()
+        train_container('cache', {'skill:test.intent': (INTENT_FILE, 0)},
+                        {}, True, progress)
+        container = FakeContainer.instances[-1]
+        self.assertTrue(container.trained)
+        self.assertEqual(container.intents, {'skill:test.intent': INTENT_FILE})
+        self.assertEqual([progress.get(), progress.get()],
+                         ['loading', 'training'])
+
+    def test_match_in_matcher(self):
+        self.register('skill:test.intent')
+        self.service.train()
+        self.service.matcher_loaded.wait(1)
+        self.service.calc_intent = MagicMock()
+        matcher = padatious_service._matcher_container
+        self.assertIsNot(matcher, self.service.container)
+        self.assertEqual(matcher.intents, {'skill:test.intent': INTENT_FILE})
+
+        result = self.service.start_calc_intent('test')
+        self.assertEqual(result().name, 'skill:test.intent')
+        self.assertFalse(self.service.calc_intent.called)
+
+    def test_match_before_matcher_loaded(self):
+        self.register('skill:test.intent')
+        self.assertIsNone(self.service.start_calc_intent('test')())
+        self.service.train()
+        self.service.matcher_loaded = MagicMock()
+        self.service.matcher_loaded.ready.return_value = False
+        # Matched in this process until the training is loaded
+        self.assertEqual(self.service.start_calc_intent('test')().name,
+                         'skill:test.intent')
+
+    def test_matcher_skips_detached_intents(self):
+        self.register('skill:test.intent')
+        self.register('skill:other.intent')
+        self.service.train()
+        self.service.matcher_loaded.wait(1)
+        self.service.handle_detach_intent(Message('detach_intent', {
+            'intent_name': 'skill:test.intent'}))
+        self.assertEqual(self.service.start_calc_intent('test')().name,
+                         'skill:other.intent')
+
+    def test_matcher_disabled(self):
+        self.disable_matcher()
+        self.register('skill:test.intent')
+        self.service.train()
+        self.assertIsNone(self.service.matcher_loaded)
+        self.assertEqual(self.service.start_calc_intent('test')().name,
+                         'skill:test.intent')
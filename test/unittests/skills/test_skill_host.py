@@ -0,0 +1,129 @@
+# Copyright 2018 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+
+from mock import MagicMock, patch
+
+from mycroft.messagebus.message import Message
+from mycroft.skills.core import FallbackSkill
+from mycroft.skills.skill_host import (HOST_LOAD, HOST_PING, HostedSkill,
+                                       SkillHost, SkillHostPool)
+
+
+def load_message(host_id, path='/skills/a'):
+    return Message(HOST_LOAD, {'host_id': host_id, 'path': path,
+                               'skill_id': 'a', 'blacklist': []})
+
+
+class SkillHostTest(unittest.TestCase):
+    def setUp(self):
+        self.bus = MagicMock()
+        self.host = SkillHost(1, self.bus)
+        self.skill = MagicMock(skill_id='a', handler_cpu_time=0.5,
+                               handler_calls=2, import_time=0.1)
+        self.skill.name = 'A'
+        patcher = patch('mycroft.skills.skill_host.load_skill',
+                        return_value=self.skill)
+        self.load_skill = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def response(self):
+        return self.bus.emit.call_args[0][0]
+
+    def test_load(self):
+        self.host.handle_load(load_message(0))
+        self.assertFalse(self.load_skill.called)
+
+        self.host.handle_load(load_message(1))
+        self.assertEqual(self.host.skills, {'/skills/a': self.skill})
+        self.assertEqual(self.response().data, {
+            'loaded': True, 'name': 'A', 'fallback': False})
+
+        # Loading again replaces the running instance
+        self.host.handle_load(load_message(1))
+        self.skill.default_shutdown.assert_called_once_with()
+
+    def test_fallback_not_hosted(self):
+        fallback = MagicMock(spec=FallbackSkill)
+        self.load_skill.return_value = fallback
+        self.host.handle_load(load_message(1))
+        fallback.default_shutdown.assert_called_once_with()
+        self.assertEqual(self.host.skills, {})
+        self.assertEqual(self.response().data, {
+            'loaded': False, 'name': None, 'fallback': True})
+
+    def test_ping(self):
+        self.host.handle_load(load_message(1))
+        self.host.handle_ping(Message(HOST_PING, {'host_id': 1}))
+        data = self.response().data
+        self.assertEqual(data['host_id'], 1)
+        self.assertGreater(data['rss_mb'], 0)
+        self.assertEqual(data['skills'], {'/skills/a': {
+            'name': 'A', 'handler_cpu_seconds': 0.5, 'handler_calls': 2,
+            'import_seconds': 0.1}})
+
+    def test_converse(self):
+        self.host.handle_load(load_message(1))
+        self.skill.converse.return_value = True
+        request = Message('skill.converse.request', {
+            'skill_id': 'b', 'utterances': ['hello'], 'lang': 'en-us'},
+            {'request_id': '1234'})
+        self.bus.emit.reset_mock()
+        self.host.handle_converse_request(request)
+        self.assertFalse(self.bus.emit.called)
+
+        request.data['skill_id'] = 'a'
+        self.host.handle_converse_request(request)
+        self.assertEqual(self.response().data,
+                         {'skill_id': 'a', 'result': True})
+        self.assertEqual(self.response().context['request_id'], '1234')
+
+
+class SkillHostPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.bus = MagicMock()
+        self.bus.wait_for_response.side_effect = lambda message, **_: \
+            message.response({'loaded': True, 'name': 'A'})
+        self.pool = SkillHostPool(self.bus, {'processes': 2})
+        self.pool.hosts = {0: MagicMock(), 1: MagicMock()}
+
+    def test_balanced_assignment(self):
+        for path in ('/skills/a', '/skills/b', '/skills/c'):
+            self.pool.load(path, 'id')
+        hosts = [host for host, _ in self.pool.assignments.values()]
+        self.assertEqual(sorted(hosts), [0, 0, 1])
+
+    def test_failed_load_unassigned(self):
+        self.bus.wait_for_response.side_effect = None
+        self.bus.wait_for_response.return_value = None
+        self.assertIsNone(self.pool.load('/skills/a', 'id'))
+        self.assertEqual(self.pool.assignments, {})
+
+    def test_restart_reloads_skills(self):
+        self.pool.load('/skills/a', 'a')
+        self.pool.load('/skills/b', 'b')
+        self.pool._start_host = MagicMock()
+        self.bus.wait_for_response.reset_mock()
+        host_id = self.pool.assignments['/skills/a'][0]
+        self.pool.restart(host_id)
+        self.pool._start_host.assert_called_once_with(host_id)
+        message = self.bus.wait_for_response.call_args[0][0]
+        self.assertEqual(message.data['path'], '/skills/a')
+        self.assertEqual(self.bus.wait_for_response.call_count, 1)
+
+    def test_hosted_skill_shutdown(self):
+        self.pool.load('/skills/a', 'a')
+        HostedSkill(self.pool, '/skills/a', 'A').default_shutdown()
+        self.assertEqual(self.pool.assignments, {})
@@ -0,0 +1,98 @@
+# Copyright 2018 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import time
+import unittest
+from os import mkdir
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from threading import Lock
+
+from mock import MagicMock, patch
+
+from mycroft.skills.skill_manager import SkillManager
+
+
+class SkillLoadingTest(unittest.TestCase):
+    def setUp(self):
+        self.skills_dir = mkdtemp()
+        patcher = patch.object(SkillManager, 'create_msm',
+                               return_value=MagicMock(
+                                   skills_dir=self.skills_dir))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.manager = SkillManager(MagicMock())
+        self.manager._load_or_reload_skill = self.load
+        self.events = []
+        self.lock = Lock()
+
+    def tearDown(self):
+        self.manager.stop()
+        rmtree(self.skills_dir)
+
+    def load(self, skill_path):
+        name = skill_path.split('/')[-1]
+        with self.lock:
+            self.events.append(('start', name))
+        time.sleep(0.1)
+        with self.lock:
+            self.events.append(('end', name))
+        return True
+
+    def create_skill(self, name, requirements=None):
+        path = join(self.skills_dir, name)
+        mkdir(path)
+        if requirements:
+            with open(join(path, 'skill_requirements.txt'), 'w') as f:
+                f.write('\n'.join(requirements))
+        return path
+
+    def test_parallel(self):
+        paths = [self.create_skill('skill-{}.author'.format(i))
+                 for i in range(4)]
+        start = time.monotonic()
+        self.assertTrue(self.manager._load_skills(paths))
+        self.assertLess(time.monotonic() - start, 0.3)
+        self.assertEqual(len(self.events), 8)
+
+    def test_dependencies(self):
+        paths = [
+            self.create_skill('skill-a.author', ['skill-b']),
+            self.create_skill('skill-b.author', [
+                'https://github.com/author/skill-c.git']),
+            self.create_skill('skill-c.author')
+        ]
+        self.manager._load_skills(paths)
+        self.assertEqual(self.events, [
+            ('start', 'skill-c.author'), ('end', 'skill-c.author'),
+            ('start', 'skill-b.author'), ('end', 'skill-b.author'),
+            ('start', 'skill-a.author'), ('end', 'skill-a.author')
+        ])
+
+    def test_priority_first(self):
+        paths = [self.create_skill('skill-a.author'),
+                 self.create_skill('mycroft-pairing.mycroftai')]
+        with patch('mycroft.skills.skill_manager.PRIORITY_SKILLS',
+                   ['mycroft-pairing']):
+            self.manager._load_skills(paths)
+        self.assertEqual(self.events[:2], [
+            ('start', 'mycroft-pairing.mycroftai'),
+            ('end', 'mycroft-pairing.mycroftai')])
+
+    def test_circular_dependencies(self):
+        paths = [self.create_skill('skill-a.author', ['skill-b']),
+                 self.create_skill('skill-b.author', ['skill-a'])]
+        self.manager._load_skills(paths)
+        self.assertEqual(len(self.events), 4)
@@ -0,0 +1,96 @@
+# Copyright 2018 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import time
+import unittest
+from os import mkdir
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from mock import patch
+
+from mycroft.skills import skill_watcher
+from mycroft.skills.skill_watcher import SkillWatcher
+
+
+class FileEvent(object):
+    """ File system event like the ones sent by watchdog. """
+
+    def __init__(self, src_path, event_type='modified', is_directory=False):
+        self.src_path = src_path
+        self.event_type = event_type
+        self.is_directory = is_directory
+
+
+class SkillWatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.watcher = SkillWatcher('/opt/skills/', debounce=0.1)
+
+    def test_skill_path(self):
+        skill_path = self.watcher.skill_path
+        self.assertEqual(skill_path('/opt/skills/weather/__init__.py'),
+                         '/opt/skills/weather')
+        self.assertEqual(skill_path('/opt/skills/weather/vocab/en-us/a.voc'),
+                         '/opt/skills/weather')
+        self.assertEqual(skill_path('/opt/skills/weather'),
+                         '/opt/skills/weather')
+        for ignored in ('/opt/skills', '/opt/other/file.py',
+                        '/opt/skills/.msm',
+                        '/opt/skills/weather/.git/index',
+                        '/opt/skills/weather/settings.json',
+                        '/opt/skills/weather/__init__.pyc',
+                        '/opt/skills/weather/__pycache__/a.cpython-36.pyc'):
+            self.assertIsNone(skill_path(ignored), ignored)
+
+    def test_debounce(self):
+        self.watcher.dispatch(FileEvent('/opt/skills/a/__init__.py'))
+        self.watcher.dispatch(FileEvent('/opt/skills/a/settings.json'))
+        self.watcher.dispatch(FileEvent('/opt/skills/b', 'modified', True))
+        self.assertEqual(self.watcher.wait_for_changes(0), [])
+        start = time.monotonic()
+        self.assertEqual(self.watcher.wait_for_changes(1), ['/opt/skills/a'])
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+        self.assertEqual(self.watcher.wait_for_changes(0.2), [])
+
+    def test_moved(self):
+        event = FileEvent('/opt/skills/a/tmp.py', 'moved')
+        event.dest_path = '/opt/skills/b/__init__.py'
+        self.watcher.dispatch(event)
+        self.assertEqual(sorted(self.watcher.wait_for_changes(1)),
+                         ['/opt/skills/a', '/opt/skills/b'])
+
+    def test_no_watchdog(self):
+        with patch.object(skill_watcher, 'Observer', None):
+            self.assertFalse(self.watcher.start())
+        self.assertFalse(self.watcher.is_watching)
+
+
+@unittest.skipIf(skill_watcher.Observer is None, 'watchdog not installed')
+class SkillWatcherEventsTest(unittest.TestCase):
+    def setUp(self):
+        self.skills_dir = mkdtemp()
+        mkdir(join(self.skills_dir, 'skill'))
+        self.watcher = SkillWatcher(self.skills_dir, debounce=0.1)
+        self.assertTrue(self.watcher.start())
+
+    def tearDown(self):
+        self.watcher.stop()
+        rmtree(self.skills_dir)
+
+    def test_file_changed(self):
+        with open(join(self.skills_dir, 'skill', '__init__.py'), 'w') as f:
+            f.write('pass\n')
+        self.assertEqual(self.watcher.wait_for_changes(5),
+                         [join(self.skills_dir, 'skill')])